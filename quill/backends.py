@@ -0,0 +1,217 @@
+"""
+Execution backends for the SQL evaluator.
+
+A backend knows how to open a database file, load a fixture into it, explain
+and time statements, and reset connection state between timed queries.
+SQLite (the built-in sqlite3 module) is the default; DuckDB is available as an
+embedded columnar engine when the `duckdb` package is installed.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import List
+
+
+class ExecutionBackend:
+    """Base class for execution backends. Subclasses provide connect/load/explain."""
+
+    name = None
+
+    def connect(self, db_path: str, timeout_seconds: int = 30):
+        raise NotImplementedError
+
+    def load_fixture(self, conn, schema: str, source_db_path: str = None):
+        """Create the schema and copy matching tables from the SQLite source database"""
+        raise NotImplementedError
+
+    def collect_statistics(self, conn):
+        """Gather planner statistics for every table"""
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    def explain(self, conn, statement: str) -> List[str]:
+        """Return the query plan as one line of text per plan step"""
+        raise NotImplementedError
+
+    def schema_objects(self, conn) -> dict:
+        """Snapshot of schema objects: {(type, name): (table, sql)}"""
+        raise NotImplementedError
+
+    def execute(self, conn, statement: str):
+        """Execute a setup (DDL/DML) statement without timing it"""
+        conn.execute(statement)
+
+    def reset(self, conn):
+        """Drop connection-level caches so each timed query starts from comparable state"""
+
+    def execute_and_time(self, conn, statement: str, num_runs: int, timeout_seconds: int = 30,
+                         measure_first_row: bool = False):
+        """
+        Fetch the full result once, then time num_runs executions.
+
+        Returns (result, samples, first_row_samples), or (None, None, None) when a
+        run exceeds timeout_seconds. first_row_samples is empty unless
+        measure_first_row is set.
+        """
+        # Get result once with timeout check
+        start = time.perf_counter()
+        result = conn.execute(statement).fetchall()
+        if time.perf_counter() - start > timeout_seconds:
+            return None, None, None
+
+        # Time the SELECT query only
+        times = []
+        for _ in range(num_runs):
+            start_time = time.perf_counter()
+            conn.execute(statement).fetchall()
+            elapsed = time.perf_counter() - start_time
+
+            # Check if this single run exceeded timeout
+            if elapsed > timeout_seconds:
+                return None, None, None
+
+            times.append(elapsed)
+
+        # Time to first row (what a paginated/LIMIT endpoint actually waits for)
+        first_row_times = []
+        if measure_first_row:
+            for _ in range(num_runs):
+                start_time = time.perf_counter()
+                cursor = conn.execute(statement)
+                cursor.fetchone()
+                first_row_times.append(time.perf_counter() - start_time)
+
+        return result, times, first_row_times
+
+    def _copy_rows(self, conn, source_db_path: str, dest_columns: dict):
+        """
+        Copy rows from the SQLite source database into matching destination tables.
+
+        dest_columns maps each destination table to the columns that can be
+        written (generated columns excluded). Columns are matched by name, so
+        destination schemas that add, drop or reorder columns still load.
+        """
+        source = sqlite3.connect(source_db_path)
+        try:
+            source_tables = source.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'"
+            ).fetchall()
+
+            for (table_name,) in source_tables:
+                if table_name not in dest_columns:
+                    continue  # Skip tables that don't exist in destination
+
+                source_columns = {row[1] for row in source.execute(f"PRAGMA table_info({table_name})")}
+                columns = [col for col in dest_columns[table_name] if col in source_columns]
+                if not columns:
+                    continue
+
+                column_list = ', '.join(f'"{col}"' for col in columns)
+                data = source.execute(f"SELECT {column_list} FROM {table_name}").fetchall()
+                if data:
+                    placeholders = ','.join(['?'] * len(columns))
+                    conn.executemany(
+                        f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})",
+                        data
+                    )
+        finally:
+            source.close()
+
+
+class SQLiteBackend(ExecutionBackend):
+    name = "sqlite"
+
+    def connect(self, db_path: str, timeout_seconds: int = 30):
+        conn = sqlite3.connect(db_path, timeout=timeout_seconds)
+        conn.execute(f"PRAGMA busy_timeout = {timeout_seconds * 1000}")
+        return conn
+
+    def load_fixture(self, conn, schema: str, source_db_path: str = None):
+        conn.executescript(schema)
+
+        if source_db_path and Path(source_db_path).exists():
+            dest_tables = [name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )]
+            # table_xinfo's hidden flag is 2/3 for generated columns, which can't be written
+            dest_columns = {
+                table: [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})") if row[6] == 0]
+                for table in dest_tables
+            }
+            self._copy_rows(conn, source_db_path, dest_columns)
+
+        conn.commit()
+
+    def schema_objects(self, conn) -> dict:
+        rows = conn.execute(
+            "SELECT type, name, tbl_name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        return {(obj_type, name): (table, sql) for obj_type, name, table, sql in rows}
+
+    def explain(self, conn, statement: str) -> List[str]:
+        # Rows are (id, parent, notused, detail)
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()]
+
+    def reset(self, conn):
+        conn.execute("PRAGMA shrink_memory")
+
+
+class DuckDBBackend(ExecutionBackend):
+    name = "duckdb"
+
+    def __init__(self):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("DuckDBBackend requires the duckdb package: pip install duckdb") from e
+        self._duckdb = duckdb
+
+    def connect(self, db_path: str, timeout_seconds: int = 30):
+        # DuckDB refuses to open the empty placeholder files tempfile leaves behind
+        path = Path(db_path)
+        if path.exists() and path.stat().st_size == 0:
+            path.unlink()
+        return self._duckdb.connect(str(db_path))
+
+    def load_fixture(self, conn, schema: str, source_db_path: str = None):
+        conn.execute(schema)
+
+        if source_db_path and Path(source_db_path).exists():
+            dest_columns = {}
+            for table, column in conn.execute(
+                "SELECT table_name, column_name FROM information_schema.columns "
+                "WHERE table_schema = 'main' ORDER BY table_name, ordinal_position"
+            ).fetchall():
+                dest_columns.setdefault(table, []).append(column)
+            self._copy_rows(conn, source_db_path, dest_columns)
+
+    def schema_objects(self, conn) -> dict:
+        rows = conn.execute(
+            "SELECT 'table', table_name, table_name, sql FROM duckdb_tables() "
+            "UNION ALL SELECT 'index', index_name, table_name, sql FROM duckdb_indexes()"
+        ).fetchall()
+        return {(obj_type, name): (table, sql) for obj_type, name, table, sql in rows}
+
+    def explain(self, conn, statement: str) -> List[str]:
+        # Rows are (explain_key, explain_value); the value is the rendered plan tree
+        rows = conn.execute(f"EXPLAIN {statement}").fetchall()
+        return [line for (_, plan) in rows for line in plan.splitlines() if line.strip()]
+
+    def collect_statistics(self, conn):
+        conn.execute("ANALYZE")
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "duckdb": DuckDBBackend,
+}
+
+
+def get_backend(backend) -> ExecutionBackend:
+    """Resolve a backend name (or pass through an ExecutionBackend instance)"""
+    if isinstance(backend, ExecutionBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend]()
@@ -0,0 +1,160 @@
+"""
+Append-only training checkpoints.
+
+Instead of re-serializing the whole training set every few iterations, the
+training scripts append one JSON line per accepted example and one per
+finished iteration to a log:
+
+    {"type": "example", "example": {...}}
+    {"type": "iteration", "iteration": 3, "metrics": {...}, "rng_state": {...}}
+
+Each record is flushed as it is written (a crashed process loses nothing);
+fsync, which guards against losing the OS buffers on power loss or a kernel
+crash, is batched: every fsync_every records, after fsync_seconds, and at
+every iteration record. load_checkpoint() rebuilds the accepted examples,
+the iteration counter and the RNG state for resuming.
+
+EvaluationLog appends every evaluation record (accepted or not) the same way
+to a sibling evaluations.jsonl, the input of scripts/rescore_run.py.
+
+Opening either log without resume=True never truncates an existing,
+non-empty file unless overwrite=True is passed as well.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict
+
+import numpy as np
+
+
+def rng_state() -> Dict:
+    """JSON-serializable state of the `random` and global NumPy generators"""
+    version, internal, gauss_next = random.getstate()
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "random": [version, list(internal), gauss_next],
+        "numpy": [name, keys.tolist(), pos, has_gauss, cached_gaussian],
+    }
+
+
+def restore_rng_state(state: Dict):
+    """Restore generator state saved by rng_state()"""
+    version, internal, gauss_next = state["random"]
+    random.setstate((version, tuple(internal), gauss_next))
+    name, keys, pos, has_gauss, cached_gaussian = state["numpy"]
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+
+
+def _drop_torn_line(path: str):
+    """Cut a partial last line (from a crash mid-write) so appended records start on a new line"""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class _AppendLog:
+    """Append-only JSONL file with per-record flush and batched fsync"""
+
+    def __init__(self, path: str, resume: bool = False, overwrite: bool = False,
+                 fsync_every: int = 50, fsync_seconds: float = 5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists and not resume and not overwrite:
+            raise FileExistsError(
+                f"{path} already exists; pass resume=True to continue it or overwrite=True to start over"
+            )
+        if resume and exists:
+            _drop_torn_line(path)
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _append(self, record: Dict, sync: bool = False):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if (sync or self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_seconds):
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            self._sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CheckpointLog(_AppendLog):
+    """Append-only JSONL log of accepted examples and iteration summaries"""
+
+    def log_example(self, example: Dict):
+        """Record one accepted example"""
+        self._append({"type": "example", "example": example})
+
+    def log_iteration(self, iteration: int, metrics: Dict):
+        """Record a finished iteration (1-based) with its metrics and the current RNG state; synced to disk"""
+        self._append({"type": "iteration", "iteration": iteration, "metrics": metrics,
+                      "rng_state": rng_state()}, sync=True)
+
+
+class EvaluationLog(_AppendLog):
+    """Append-only JSONL log of evaluation records (one per evaluated candidate)"""
+
+    def log_evaluation(self, record: Dict):
+        """Record one evaluation (quill.evaluator.evaluation_record)"""
+        self._append(record)
+
+
+def load_checkpoint(path: str) -> Dict:
+    """
+    Read a checkpoint log.
+
+    Returns {"examples", "iteration", "iterations", "rng_state"}: every accepted
+    example (including ones accepted during an iteration that didn't finish),
+    the last finished iteration (0 if none), the per-iteration metrics, and
+    the RNG state at the end of the last finished iteration (None if none).
+    A torn last line from a crash mid-write is ignored.
+    """
+    state = {"examples": [], "iteration": 0, "iterations": [], "rng_state": None}
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            if number == len(lines):
+                break
+            raise
+        if record["type"] == "example":
+            state["examples"].append(record["example"])
+        elif record["type"] == "iteration":
+            state["iteration"] = record["iteration"]
+            state["iterations"].append(record["metrics"])
+            state["rng_state"] = record["rng_state"]
+    return state
@@ -1,14 +1,303 @@
 import sqlite3
+import sys
 import time
+import hashlib
+import math
+import multiprocessing
+import random
+import re
+import shutil
 import tempfile
+import threading
+import warnings
+from collections import Counter
 from pathlib import Path
 import json
+from quill.backends import get_backend
+from quill.plan_diff import diff_plans, classify_optimization, parse_plan
+from quill.sql_tokens import added_columns, split_statements, tokenize
+
+# Timing metrics a reward can be computed against
+REWARD_METRICS = ("mean", "p50", "p95", "p99", "first_row")
+
+
+# Planner statistics regimes: "none" (no sqlite_stat tables), "analyze" (ANALYZE run
+# on the fixture), or "both" (score the candidate under each and keep the worse)
+PLANNER_STATS_MODES = ("none", "analyze", "both")
+
+# What the reward's speedup is: the point estimate, or the bootstrap lower
+# confidence bound computed from the raw timing samples
+REWARD_BASES = ("point", "lower_bound")
+
+# Fresh values for primary-key / UNIQUE columns of replayed writes start here,
+# far above the keys of any fixture row
+SYNTHETIC_KEY_BASE = 1 << 40
+
+# SELECT ... ORDER BY <column> [ASC|DESC] LIMIT <n> [OFFSET <m>]
+PAGINATED_QUERY = re.compile(
+    r'^(?P<body>.*?)\s+ORDER\s+BY\s+(?P<order>[\w.]+)(?:\s+(?P<direction>ASC|DESC))?'
+    r'\s+LIMIT\s+(?P<limit>\d+)(?:\s+OFFSET\s+\d+)?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def offset_to_keyset(query: str, key_column: str = "id") -> dict:
+    """
+    Map an OFFSET-paginated query to its keyset (seek) equivalent.
+
+    Expects `SELECT ... [WHERE ...] ORDER BY <column> [ASC|DESC] LIMIT <n> [OFFSET <m>]`.
+    key_column breaks ties in the sort so both forms page deterministically. Returns
+    {"page_size", "order_column", "key_column", "offset_sql" (one ? for the offset),
+    "first_page_sql", "next_page_sql" (two ?: last row's sort value and key)}.
+    Rows with NULL sort values are not handled by the seek predicate. Subqueries
+    are fine; a top-level GROUP BY, HAVING, WINDOW or compound SELECT raises ValueError.
+    """
+    match = PAGINATED_QUERY.match(query.strip())
+    if not match:
+        raise ValueError("Expected SELECT ... ORDER BY <column> [ASC|DESC] LIMIT <n> [OFFSET <m>]")
+
+    # Find the top-level WHERE on tokens, so a WHERE inside a subquery, string or
+    # comment is never taken for it. Comments are dropped so that a trailing
+    # `--` comment can't swallow the appended seek predicate.
+    parts = []
+    where_at = None
+    depth = 0
+    for token in tokenize(match.group("body").strip()):
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            depth -= 1
+        elif depth == 0 and token.kind == "keyword":
+            if token.upper in ("GROUP", "HAVING", "WINDOW", "UNION", "INTERSECT", "EXCEPT"):
+                raise ValueError("Keyset mapping only supports plain filtered SELECTs")
+            if token.upper == "WHERE":
+                if where_at is not None:
+                    raise ValueError("Keyset mapping only supports plain filtered SELECTs")
+                where_at = len(parts)
+        parts.append(" " if token.kind == "comment" else token.value)
+    if depth != 0:
+        raise ValueError("Unbalanced parentheses in paginated query")
+    body = "".join(parts).strip()
+
+    order = match.group("order")
+    direction = (match.group("direction") or "ASC").upper()
+    page_size = int(match.group("limit"))
+    comparison = "<" if direction == "DESC" else ">"
+
+    if order.split(".")[-1] == key_column.split(".")[-1]:
+        order_by = f"ORDER BY {order} {direction}"
+        seek = f"{order} {comparison} ?"
+    else:
+        order_by = f"ORDER BY {order} {direction}, {key_column} {direction}"
+        seek = f"({order}, {key_column}) {comparison} (?, ?)"
+
+    # AND the seek predicate onto the top-level WHERE (parenthesized so OR binds correctly)
+    if where_at is not None:
+        head, condition = "".join(parts[:where_at]).strip(), "".join(parts[where_at + 1:]).strip()
+        seek_body = f"{head} WHERE ({condition}) AND {seek}"
+    else:
+        seek_body = f"{body} WHERE {seek}"
+
+    return {
+        "page_size": page_size,
+        "order_column": order.split(".")[-1],
+        "key_column": key_column.split(".")[-1],
+        "offset_sql": f"{body} {order_by} LIMIT {page_size} OFFSET ?",
+        "first_page_sql": f"{body} {order_by} LIMIT {page_size}",
+        "next_page_sql": f"{seek_body} {order_by} LIMIT {page_size}"
+    }
+
+
+def _read_proc_io():
+    """Bytes this process has written (Linux /proc/self/io wchar), or None elsewhere"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """
+    Reset the kernel's peak-RSS high-water mark (Linux) and return current RSS in
+    bytes, so a later peak reading isolates what ran in between. Returns None
+    where that isn't possible.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _read_proc_status("VmRSS")
+    except OSError:
+        return None
+
+
+def _read_proc_status(field: str):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def _memory_probe_worker(db_path: str, statement: str, results):
+    """
+    Run one query in a fresh process and report its memory footprint.
+
+    Rows are streamed rather than collected so the peak RSS reflects SQLite's own
+    working memory (sorters, temp B-trees, page cache). temp_store=FILE makes
+    sorter and temp B-tree overflow go to temp files, counted as bytes written.
+    """
+    import resource
+
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA temp_store = FILE")
+        # ru_maxrss is KB on Linux, bytes on macOS
+        rss_unit = 1 if sys.platform == "darwin" else 1024
+
+        rss_before = _reset_peak_rss()
+        resettable = rss_before is not None
+        if not resettable:
+            # No resettable high-water mark: fall back to the lifetime peak, which
+            # may hide allocations smaller than interpreter start-up
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+        io_before = _read_proc_io()
+
+        rows = 0
+        for _ in conn.execute(statement):
+            rows += 1
+
+        if resettable:
+            rss_peak = _read_proc_status("VmHWM")
+        else:
+            rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+        io_after = _read_proc_io()
+        conn.close()
+
+        temp_bytes = io_after - io_before if io_before is not None and io_after is not None else None
+        results.put({
+            "rows": rows,
+            "peak_rss_delta_bytes": rss_peak - rss_before,
+            "temp_bytes_written": temp_bytes,
+            "spilled": bool(temp_bytes) if temp_bytes is not None else None
+        })
+    except Exception as e:
+        results.put({"error": str(e)})
+
+
+def evaluation_record(candidate: dict, result: dict, accepted: bool) -> dict:
+    """
+    Flatten one candidate's evaluation into a self-contained record: the raw
+    timing samples, plan diff and result digests needed to re-score it offline
+    (see quill.scoring.rescore_records) without SQLite or the LLM.
+    """
+    original_timing = result.get("original_timing") or {}
+    optimized_timing = result.get("optimized_timing") or {}
+    # Everything added to / subtracted from the speedup reward
+    adjustment = result.get("readability_bonus") or 0.0
+    adjustment -= (result.get("memory") or {}).get("penalty", 0.0)
+    adjustment -= (result.get("index_storage") or {}).get("penalty", 0.0)
+    adjustment -= (result.get("maintenance") or {}).get("penalty", 0.0)
+
+    return {
+        "schema": candidate.get("schema"),
+        "slow_query": candidate.get("slow_query"),
+        "fast_query": candidate.get("fast_query"),
+        "optimization_type": candidate.get("optimization_type"),
+        "success": result.get("success", False),
+        "error": result.get("error"),
+        "accepted": accepted,
+        "reward": result.get("reward", 0),
+        "speedup": result.get("speedup"),
+        "reward_metric": result.get("reward_metric"),
+        "reward_adjustment": adjustment,
+        "original_samples": original_timing.get("samples"),
+        "optimized_samples": optimized_timing.get("samples"),
+        "original_first_row_samples": original_timing.get("first_row_samples"),
+        "optimized_first_row_samples": optimized_timing.get("first_row_samples"),
+        "original_timed_out": result.get("original_timed_out"),
+        "original_digest": result.get("original_digest"),
+        "optimized_digest": result.get("optimized_digest"),
+        "plan_diff": result.get("plan_diff"),
+        "verified_optimization_type": result.get("verified_optimization_type")
+    }
+
 
 class SQLEvaluator:
-    def __init__(self, test_db_path="data/test.db", use_readability_judge=False):
+    def __init__(self, test_db_path="data/test.db", use_readability_judge=False,
+                 reward_metric="mean", measure_first_row=False,
+                 planner_stats="none", fixture_cache_dir=None, backend="sqlite",
+                 measure_maintenance=False, maintenance_batch_size=200,
+                 measure_memory=False, memory_penalty_per_mb=0.0,
+                 index_space_weight=0.0, maintenance_weight=0.0, writes_per_read=1.0,
+                 build_amortization_reads=1000,
+                 reward_basis="point", confidence=0.95, bootstrap_resamples=2000):
+        if reward_metric not in REWARD_METRICS:
+            raise ValueError(f"reward_metric must be one of {REWARD_METRICS}, got {reward_metric!r}")
+        if planner_stats not in PLANNER_STATS_MODES:
+            raise ValueError(f"planner_stats must be one of {PLANNER_STATS_MODES}, got {planner_stats!r}")
+        if reward_basis not in REWARD_BASES:
+            raise ValueError(f"reward_basis must be one of {REWARD_BASES}, got {reward_basis!r}")
+
         self.test_db_path = test_db_path
+        self.backend = get_backend(backend)
         self.use_readability_judge = use_readability_judge
         self.readability_judge = None
+        self.reward_metric = reward_metric
+        # Time-to-first-row needs its own fetchone() runs, so only pay for them when asked
+        self.measure_first_row = measure_first_row or reward_metric == "first_row"
+        self.planner_stats = planner_stats
+        # Candidates that create indexes, generated columns, triggers, ... get their
+        # per-insert maintenance cost measured on a replayed write batch. Off by
+        # default for evaluate_query(): the training loop never reads it, and the
+        # replay costs a fixture write batch per candidate. evaluate_workload(),
+        # which reports it, measures it unless told not to
+        self.measure_maintenance = measure_maintenance or maintenance_weight > 0
+        self.maintenance_batch_size = maintenance_batch_size
+        # Maintenance-aware reward: subtract weight * the share of the per-read time
+        # saving that maintenance eats, i.e. (writes_per_read * per-insert overhead +
+        # build_time / build_amortization_reads) / time saved per read, capped at 1.
+        # A summary table whose triggers cost as much as it saves loses `weight`
+        self.maintenance_weight = maintenance_weight
+        self.writes_per_read = writes_per_read
+        self.build_amortization_reads = build_amortization_reads
+        # Peak RSS / temp spill of each query, measured in an isolated worker process.
+        # With a penalty set, each MB the optimized query needs beyond the original
+        # (RSS growth + temp bytes) is subtracted from the reward.
+        self.measure_memory = measure_memory or memory_penalty_per_mb > 0
+        self.memory_penalty_per_mb = memory_penalty_per_mb
+        # Space-aware reward: subtract weight * (bytes of new indexes / bytes of the
+        # tables they index), so an index as large as its table at weight 0.2 costs 0.2
+        self.index_space_weight = index_space_weight
+        # With reward_basis="lower_bound", the reward uses the speedup the samples
+        # support at `confidence`, so wins that are within timing noise of a reward
+        # threshold don't flip in and out of the training set. The bound needs
+        # num_runs >= quill.scoring.MIN_BOOTSTRAP_SAMPLES (10) to mean much
+        self.reward_basis = reward_basis
+        self.confidence = confidence
+        self.bootstrap_resamples = bootstrap_resamples
+        self._bootstrap_speedup_interval = None
+        self._min_bootstrap_samples = 0
+
+        # Built fixtures (schema + copied data, optionally ANALYZEd) are cached as
+        # template files and copied per evaluation instead of being rebuilt each time.
+        # Without an explicit directory the cache lives for the life of this evaluator.
+        self._fixture_cache_tmp = None
+        if fixture_cache_dir is None:
+            self._fixture_cache_tmp = tempfile.TemporaryDirectory(prefix="quill_fixtures_")
+            fixture_cache_dir = self._fixture_cache_tmp.name
+        self.fixture_cache_dir = Path(fixture_cache_dir)
+        self.fixture_cache_dir.mkdir(parents=True, exist_ok=True)
+        self._fixture_lock = threading.Lock()
+        self._backend_evaluators = {}
+
+        if reward_basis == "lower_bound":
+            from quill.scoring import MIN_BOOTSTRAP_SAMPLES, bootstrap_speedup_interval
+            self._bootstrap_speedup_interval = bootstrap_speedup_interval
+            self._min_bootstrap_samples = MIN_BOOTSTRAP_SAMPLES
 
         if use_readability_judge:
             from quill.llm_judge import SQLReadabilityJudge
@@ -19,81 +308,238 @@ class SQLEvaluator:
                        original_query: str,
                        optimized_query: str,
                        num_runs: int = 5,
-                       timeout_seconds: int = 30) -> dict:
+                       timeout_seconds: int = 30,
+                       reward_metric: str = None,
+                       planner_stats: str = None) -> dict:
 
-        with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as temp_db_file:
-            temp_db = temp_db_file.name
+        reward_metric = reward_metric or self.reward_metric
+        if reward_metric not in REWARD_METRICS:
+            raise ValueError(f"reward_metric must be one of {REWARD_METRICS}, got {reward_metric!r}")
+        planner_stats = planner_stats or self.planner_stats
+        if planner_stats not in PLANNER_STATS_MODES:
+            raise ValueError(f"planner_stats must be one of {PLANNER_STATS_MODES}, got {planner_stats!r}")
 
-        try:
-            conn = sqlite3.connect(temp_db)
-            conn.executescript(schema)
+        regimes = ("none", "analyze") if planner_stats == "both" else (planner_stats,)
+        regime_results = {}
+        for regime in regimes:
+            regime_results[regime] = self._evaluate_timed(
+                schema, original_query, optimized_query, num_runs, timeout_seconds,
+                reward_metric, with_stats=(regime == "analyze")
+            )
+            if not regime_results[regime]["success"]:
+                result = dict(regime_results[regime])
+                if len(regimes) > 1:
+                    result["error"] = f"{result['error']} (planner_stats={regime})"
+                return result
+
+        # Under "both", the candidate has to hold up in each plan regime: keep the worse one
+        worst = min(regimes, key=lambda regime: regime_results[regime]["reward"])
+        result = dict(regime_results[worst])
+        result["planner_stats"] = worst
+        if len(regimes) > 1:
+            result["planner_stats_regimes"] = regime_results
+
+        readability_bonus = 0.0
+        readability_preference = None
+        readability_reasoning = None
+
+        if self.use_readability_judge and self.readability_judge:
+            try:
+                judge_result = self.readability_judge.judge_readability(
+                    query_a=original_query,
+                    query_b=optimized_query,
+                    schema=schema
+                )
+                readability_preference = judge_result.get("preference")
+                readability_reasoning = judge_result.get("reasoning")
+                confidence = judge_result.get("confidence", "medium")
+                readability_bonus = self.readability_judge.calculate_readability_bonus(
+                    readability_preference,
+                    confidence
+                )
+                result["reward"] = max(0, min(1.0, result["reward"] + readability_bonus))
+            except Exception as e:
+                print(f"Readability judge error: {e}")
+
+        if self.use_readability_judge:
+            result["readability_preference"] = readability_preference
+            result["readability_reasoning"] = readability_reasoning
+            result["readability_bonus"] = readability_bonus
+
+        return result
+
+    def evaluate_across_backends(self,
+                                 schema: str,
+                                 original_query: str,
+                                 optimized_query: str,
+                                 backends=("sqlite", "duckdb"),
+                                 **kwargs) -> dict:
+        """
+        Score the same candidate on several execution backends.
+
+        Returns {backend_name: evaluate_query result}. A backend that can't be
+        loaded (e.g. duckdb not installed) gets a failed result instead of
+        aborting the others.
+        """
+        results = {}
+        for backend in backends:
+            try:
+                evaluator = self._evaluator_for_backend(backend)
+            except (ImportError, ValueError) as e:
+                name = getattr(backend, "name", backend)
+                results[name] = {"success": False, "reward": 0, "error": str(e)}
+                continue
+            results[evaluator.backend.name] = evaluator.evaluate_query(
+                schema, original_query, optimized_query, **kwargs
+            )
+        return results
 
-            if Path(self.test_db_path).exists():
-                self._copy_data(conn)
+    def _evaluator_for_backend(self, backend):
+        """Evaluator sharing this one's settings and fixture cache, on another backend"""
+        backend = get_backend(backend)
+        if backend.name == self.backend.name:
+            return self
+        if backend.name not in self._backend_evaluators:
+            self._backend_evaluators[backend.name] = SQLEvaluator(
+                test_db_path=self.test_db_path,
+                reward_metric=self.reward_metric,
+                measure_first_row=self.measure_first_row,
+                planner_stats=self.planner_stats,
+                fixture_cache_dir=self.fixture_cache_dir,
+                backend=backend,
+                measure_maintenance=self.measure_maintenance,
+                maintenance_batch_size=self.maintenance_batch_size,
+                measure_memory=self.measure_memory,
+                memory_penalty_per_mb=self.memory_penalty_per_mb,
+                index_space_weight=self.index_space_weight,
+                maintenance_weight=self.maintenance_weight,
+                writes_per_read=self.writes_per_read,
+                build_amortization_reads=self.build_amortization_reads,
+                reward_basis=self.reward_basis,
+                confidence=self.confidence,
+                bootstrap_resamples=self.bootstrap_resamples
+            )
+        return self._backend_evaluators[backend.name]
 
-            original_result, original_time = self._run_query(conn, original_query, num_runs, timeout_seconds)
+    def _evaluate_timed(self, schema: str, original_query: str, optimized_query: str,
+                        num_runs: int, timeout_seconds: int, reward_metric: str,
+                        with_stats: bool = False) -> dict:
+        """Time both queries on a fresh copy of the fixture and score the speedup"""
+        measure_first_row = self.measure_first_row or reward_metric == "first_row"
+
+        temp_db = self._new_temp_db()
+
+        try:
+            conn = self._prepare_db(temp_db, schema, with_stats=with_stats)
+
+            original_result, original_samples, original_first_row = self._run_query(
+                conn, original_query, num_runs, timeout_seconds, measure_first_row
+            )
 
             # If original query timed out, use timeout as max time
             original_timed_out = False
             if original_result is None:
                 original_timed_out = True
-                original_time = timeout_seconds
+                original_samples = [timeout_seconds]
+                original_first_row = [timeout_seconds] if measure_first_row else []
 
-            optimized_result, optimized_time = self._run_query(conn, optimized_query, num_runs, timeout_seconds)
+            original_plan = self._explain(conn, original_query)
+
+            measure_memory = self.measure_memory and self.backend.name == "sqlite"
+            if measure_memory:
+                conn.commit()
+                original_memory = self._measure_memory(temp_db, original_query, original_plan, timeout_seconds)
+
+            objects_before = self.backend.schema_objects(conn)
+            pages_before = self._page_count(conn)
+            setup_timings = []
+            optimized_result, optimized_samples, optimized_first_row = self._run_query(
+                conn, optimized_query, num_runs, timeout_seconds, measure_first_row,
+                analyze_after_setup=with_stats, setup_timings=setup_timings
+            )
 
             if optimized_result is None:
                 return {"success": False, "reward": 0, "error": "Optimized query failed or timed out"}
 
+            original_timing = self._timing_stats(original_samples, original_first_row)
+            optimized_timing = self._timing_stats(optimized_samples, optimized_first_row)
+            optimized_plan = self._explain(conn, optimized_query)
+            if measure_memory:
+                conn.commit()
+                optimized_memory = self._measure_memory(temp_db, optimized_query, optimized_plan, timeout_seconds)
+
+            derived_objects = self._derived_objects(objects_before, self.backend.schema_objects(conn))
+            schema_changed = any(obj["change"] == "altered" and obj["type"] == "table" for obj in derived_objects)
+
             # If original timed out, we can't verify correctness, so skip the check
             if not original_timed_out:
+                reference_result = original_result
                 results_match = self._results_equal(original_result, optimized_result)
+                if not results_match and schema_changed and self._reads_added_columns(optimized_query):
+                    # The candidate evolved a table (e.g. added a generated column) and
+                    # its query reads the new columns, which a SELECT * in the original
+                    # now returns too: compare against the original re-run on the
+                    # evolved schema. A query that doesn't touch them must match as is.
+                    _, original_select = self._split_statements(original_query)
+                    reference_result = conn.execute(original_select).fetchall()
+                    results_match = self._results_equal(reference_result, optimized_result)
+
                 if not results_match:
-                    return {"success": False, "reward": 0, "error": "Results do not match"}
-            
-            if optimized_time == 0:
+                    result_diff = self._result_diff(reference_result, optimized_result)
+                    error = "Results do not match"
+                    if self._fts_tables(derived_objects, conn):
+                        # Full-text MATCH works on tokens, LIKE '%...%' on substrings
+                        error += (f" (FTS tokenizer semantics differ from LIKE: {result_diff['missing_rows']} "
+                                  f"rows missing, {result_diff['extra_rows']} extra)")
+                    return {
+                        "success": False,
+                        "reward": 0,
+                        "error": error,
+                        "result_diff": result_diff,
+                        "original_digest": self._result_digest(reference_result),
+                        "optimized_digest": self._result_digest(optimized_result)
+                    }
+
+            original_time = original_timing["mean"]
+            optimized_time = optimized_timing["mean"]
+
+            # Speedup (and therefore reward) is computed on the configured metric
+            original_metric = original_timing[reward_metric]
+            optimized_metric = optimized_timing[reward_metric]
+            if optimized_metric == 0:
                 speedup = 1.0
             else:
-                speedup = original_time / optimized_time
-
-            # Reward scaling optimized for real-world SQL optimizations
-            # Emphasizes common 2-50x speedups over rare 1000x+ edge cases
-            # 2x -> 0.45, 5x -> 0.60, 10x -> 0.70, 50x -> 0.85, 1000x -> 0.95
-            import math
-            if speedup >= 2.0:
-                # Shifted log scale: more reward for realistic speedups
-                log_speedup = math.log10(speedup)
-                reward = min(1.0, 0.3 + (log_speedup / 3.5))
-            elif speedup >= 1.5:
-                # Minor optimizations still valuable
-                reward = 0.25 + (speedup - 1.5) * 0.4  # 1.5x -> 0.25, 2x -> 0.45
-            elif speedup >= 1.1:
-                reward = 0.15
-            else:
-                reward = 0
+                speedup = original_metric / optimized_metric
 
-            readability_bonus = 0.0
-            readability_preference = None
-            readability_reasoning = None
-
-            if self.use_readability_judge and self.readability_judge:
-                try:
-                    judge_result = self.readability_judge.judge_readability(
-                        query_a=original_query,
-                        query_b=optimized_query,
-                        schema=schema
-                    )
-                    readability_preference = judge_result.get("preference")
-                    readability_reasoning = judge_result.get("reasoning")
-                    confidence = judge_result.get("confidence", "medium")
-                    readability_bonus = self.readability_judge.calculate_readability_bonus(
-                        readability_preference,
-                        confidence
+            speedup_interval = None
+            if self.reward_basis == "lower_bound":
+                if reward_metric == "first_row":
+                    samples_pair = (original_first_row, optimized_first_row)
+                else:
+                    samples_pair = (original_samples, optimized_samples)
+                num_samples = min(len(samples) for samples in samples_pair)
+                if num_samples < self._min_bootstrap_samples:
+                    warnings.warn(
+                        f"reward_basis='lower_bound' with {num_samples} timing samples; "
+                        f"use num_runs >= {self._min_bootstrap_samples} for a meaningful bound",
+                        stacklevel=2
                     )
-                    reward = max(0, min(1.0, reward + readability_bonus))
-                except Exception as e:
-                    print(f"Readability judge error: {e}")
+                speedup_interval = self._bootstrap_speedup_interval(
+                    *samples_pair, statistic=reward_metric, confidence=self.confidence,
+                    resamples=self.bootstrap_resamples
+                )
+                reward = self._speedup_reward(speedup_interval[0])
+            else:
+                reward = self._speedup_reward(speedup)
 
-            conn.close()
+            memory = None
+            if measure_memory:
+                memory = {"original": original_memory, "optimized": optimized_memory, "penalty": 0.0}
+                if self.memory_penalty_per_mb and "error" not in original_memory and "error" not in optimized_memory:
+                    extra_bytes = self._memory_footprint(optimized_memory) - self._memory_footprint(original_memory)
+                    if extra_bytes > 0:
+                        memory["penalty"] = self.memory_penalty_per_mb * extra_bytes / (1024 * 1024)
+                        reward = max(0, reward - memory["penalty"])
 
             result = {
                 "success": True,
@@ -101,15 +547,64 @@ class SQLEvaluator:
                 "original_time": original_time,
                 "optimized_time": optimized_time,
                 "speedup": speedup,
+                "reward_metric": reward_metric,
+                "reward_basis": self.reward_basis,
+                "original_timing": original_timing,
+                "optimized_timing": optimized_timing,
                 "results_match": not original_timed_out,
-                "original_timed_out": original_timed_out
+                "original_timed_out": original_timed_out,
+                # Order-insensitive digests of the rows, for auditing runs offline
+                "original_digest": self._result_digest(original_result) if not original_timed_out else None,
+                "optimized_digest": self._result_digest(optimized_result)
             }
 
-            if self.use_readability_judge:
-                result["readability_preference"] = readability_preference
-                result["readability_reasoning"] = readability_reasoning
-                result["readability_bonus"] = readability_bonus
+            if speedup_interval is not None:
+                result["speedup_lower_bound"], result["speedup_upper_bound"] = speedup_interval
+                result["confidence"] = self.confidence
+
+            if memory is not None:
+                result["memory"] = memory
+
+            if original_plan is not None and optimized_plan is not None:
+                plan_diff = diff_plans(original_plan, optimized_plan, original_query, optimized_query)
+                result["original_plan"] = original_plan
+                result["optimized_plan"] = optimized_plan
+                result["plan_diff"] = plan_diff
+                result["verified_optimization_type"] = classify_optimization(
+                    plan_diff, original_query, optimized_query
+                )
+
+            if derived_objects:
+                result["derived_objects"] = derived_objects
+                result["schema_changed"] = schema_changed
+                result["build_time"] = sum(seconds for _, seconds in setup_timings)
+                result["build_timings"] = [{"statement": stmt, "seconds": seconds} for stmt, seconds in setup_timings]
+                # How many executions of the query it takes for the read savings to pay
+                # for building the derived structures (summary tables, indexes, ...)
+                saved_per_read = original_time - optimized_time
+                result["break_even_reads"] = result["build_time"] / saved_per_read if saved_per_read > 0 else None
 
+                fts_tables = self._fts_tables(derived_objects, conn)
+                if fts_tables:
+                    result["fts_indexes"] = self._fts_index_report(conn, fts_tables, setup_timings)
+
+                new_indexes = [obj for obj in derived_objects if obj["type"] == "index" and obj["change"] == "created"]
+                if new_indexes and self.backend.name == "sqlite":
+                    storage = self._index_storage(conn, new_indexes, pages_before)
+                    result["index_storage"] = storage
+                    if self.index_space_weight and storage["table_bytes"]:
+                        storage["penalty"] = self.index_space_weight * storage["total_bytes"] / storage["table_bytes"]
+                        result["reward"] = max(0, result["reward"] - storage["penalty"])
+
+                if self.measure_maintenance and self.backend.name == "sqlite":
+                    base_tables = {name for (obj_type, name) in objects_before if obj_type == "table"}
+                    maintained = sorted({obj["table"] for obj in derived_objects if obj["table"] in base_tables})
+                    if maintained:
+                        result["maintenance"] = self._measure_maintenance(conn, schema, with_stats, maintained)
+                        if self.maintenance_weight:
+                            self._apply_maintenance_penalty(result, original_time - optimized_time)
+
+            conn.close()
             return result
         except Exception as e:
             return {"success": False, "reward": 0, "error": str(e)}
@@ -117,53 +612,969 @@ class SQLEvaluator:
             if Path(temp_db).exists():
                 Path(temp_db).unlink(missing_ok=True)
 
+    def _measure_memory(self, db_path: str, query: str, plan: list, timeout_seconds: int) -> dict:
+        """Memory footprint of the query's SELECT, run alone in a spawned worker"""
+        _, select_statement = self._split_statements(query)
 
-    def _run_query(self, conn, query: str, num_runs: int, timeout_seconds: int = 30):
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        worker = context.Process(target=_memory_probe_worker, args=(db_path, select_statement, results))
+        worker.start()
         try:
-            # Split query into statements
-            statements = [s.strip() for s in query.strip().split(';') if s.strip()]
+            report = results.get(timeout=timeout_seconds)
+        except Exception:
+            report = {"error": f"Memory probe timed out after {timeout_seconds}s"}
+        worker.join(timeout=5)
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
 
-            # Execute all DDL statements (CREATE, ALTER, DROP) first without timing
-            select_statement = None
-            for stmt in statements:
-                stmt_upper = stmt.upper().lstrip()
-                if stmt_upper.startswith('SELECT'):
-                    select_statement = stmt
-                else:
-                    # Execute DDL/DML statements (CREATE INDEX, etc.)
-                    conn.execute(stmt)
+        if plan is not None:
+            report["temp_btrees"] = parse_plan(plan)["temp_btrees"]
+        return report
+
+    @staticmethod
+    def _memory_footprint(report: dict) -> int:
+        return max(0, report["peak_rss_delta_bytes"]) + (report["temp_bytes_written"] or 0)
+
+    def _explain(self, conn, query: str):
+        """Plan of the query's SELECT (setup statements must already be applied), or None"""
+        try:
+            _, select_statement = self._split_statements(query)
+            return self.backend.explain(conn, select_statement)
+        except Exception:
+            return None
+
+    def _fts_tables(self, derived_objects: list, conn) -> list:
+        """Names of FTS5 virtual tables among the derived objects"""
+        if self.backend.name != "sqlite":
+            return []
+        names = []
+        for obj in derived_objects:
+            if obj["type"] != "table" or obj["change"] != "created":
+                continue
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (obj["name"],)).fetchone()
+            if row and row[0] and re.search(r'\bUSING\s+fts5\b', row[0], re.IGNORECASE):
+                names.append(obj["name"])
+        return names
+
+    def _fts_index_report(self, conn, fts_tables: list, setup_timings: list) -> dict:
+        """
+        Build cost and on-disk size of each FTS5 index. The size covers the
+        shadow tables (<name>_data, _idx, _docsize, _config, _content) via dbstat,
+        and is None when SQLite was built without the dbstat virtual table.
+        """
+        report = {}
+        for name in fts_tables:
+            shadow = [f"{name}_{suffix}" for suffix in ("data", "idx", "docsize", "config", "content")]
+            sizes = self._object_sizes(conn, shadow)
+            if sizes is None:
+                size_bytes, pages = None, None
+            else:
+                size_bytes = sum(size for size, _ in sizes.values())
+                pages = sum(count for _, count in sizes.values())
+
+            # Statements that mention the index: CREATE VIRTUAL TABLE, 'rebuild'/INSERT ... SELECT
+            build_time = sum(
+                seconds for stmt, seconds in setup_timings
+                if re.search(rf'\b{re.escape(name)}\b', stmt, re.IGNORECASE)
+            )
+            report[name] = {"build_time": build_time, "bytes": size_bytes, "pages": pages}
+        return report
+
+    def _object_sizes(self, conn, names: list):
+        """
+        {name: (bytes, pages)} for tables/indexes via the dbstat virtual table, or
+        None when SQLite was built without it. Missing names are left out.
+        """
+        if not names:
+            return {}
+        try:
+            rows = conn.execute(
+                f"SELECT name, SUM(pgsize), COUNT(*) FROM dbstat "
+                f"WHERE name IN ({','.join('?' * len(names))}) GROUP BY name",
+                list(names)
+            ).fetchall()
+        except sqlite3.Error:
+            return None
+        return {name: (size_bytes, pages) for name, size_bytes, pages in rows}
+
+    @staticmethod
+    def _page_count(conn):
+        try:
+            return conn.execute("PRAGMA page_count").fetchone()[0]
+        except Exception:
+            return None
+
+    def _index_storage(self, conn, indexes: list, pages_before: int) -> dict:
+        """
+        On-disk size of each index the candidate created, next to the size of the
+        table it indexes. Without dbstat, only the total is known, from the growth
+        of the database's page count.
+        """
+        tables = sorted({obj["table"] for obj in indexes})
+        sizes = self._object_sizes(conn, [obj["name"] for obj in indexes] + tables)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+
+        if sizes is None:
+            pages_after = self._page_count(conn)
+            total_pages = pages_after - pages_before if pages_before is not None else None
+            return {
+                "method": "page_count",
+                "indexes": {obj["name"]: {"table": obj["table"], "bytes": None, "pages": None} for obj in indexes},
+                "total_bytes": total_pages * page_size if total_pages is not None else None,
+                "total_pages": total_pages,
+                "table_bytes": None
+            }
+
+        report = {}
+        for obj in indexes:
+            index_bytes, index_pages = sizes.get(obj["name"], (0, 0))
+            table_bytes = sizes.get(obj["table"], (0, 0))[0]
+            report[obj["name"]] = {
+                "table": obj["table"],
+                "bytes": index_bytes,
+                "pages": index_pages,
+                "table_bytes": table_bytes,
+                "ratio_to_table": index_bytes / table_bytes if table_bytes else None
+            }
 
-            # If no SELECT found, assume the last statement is the query to time
-            if select_statement is None:
-                select_statement = statements[-1]
+        return {
+            "method": "dbstat",
+            "indexes": report,
+            "total_bytes": sum(info["bytes"] for info in report.values()),
+            "total_pages": sum(info["pages"] for info in report.values()),
+            "table_bytes": sum(sizes.get(table, (0, 0))[0] for table in tables)
+        }
 
-            # Set a timeout for the connection
-            conn.execute(f"PRAGMA busy_timeout = {timeout_seconds * 1000}")
+    @staticmethod
+    def _result_digest(rows) -> str:
+        """Order-insensitive SHA-256 of a result set (exact values, no float tolerance)"""
+        digest = hashlib.sha256()
+        for row in sorted(repr(tuple(row)) for row in rows):
+            digest.update(row.encode())
+            digest.update(b"\n")
+        return digest.hexdigest()
 
-            # Get result once with timeout check
+    def _result_diff(self, expected, actual, max_examples: int = 3) -> dict:
+        """Multiset difference between two results, with a few example rows"""
+        expected_counts = Counter(tuple(row) for row in expected)
+        actual_counts = Counter(tuple(row) for row in actual)
+        missing = expected_counts - actual_counts
+        extra = actual_counts - expected_counts
+        return {
+            "expected_rows": len(expected),
+            "actual_rows": len(actual),
+            "missing_rows": sum(missing.values()),
+            "extra_rows": sum(extra.values()),
+            "missing_examples": [list(row) for row in list(missing)[:max_examples]],
+            "extra_examples": [list(row) for row in list(extra)[:max_examples]]
+        }
+
+    def _derived_objects(self, before: dict, after: dict) -> list:
+        """Schema objects the candidate's setup statements created or altered"""
+        derived = []
+        for (obj_type, name), (table, sql) in after.items():
+            if (obj_type, name) not in before:
+                change = "created"
+            elif before[(obj_type, name)][1] != sql:
+                change = "altered"
+            else:
+                continue
+            derived.append({"type": obj_type, "name": name, "table": table, "change": change})
+        return derived
+
+    def _measure_maintenance(self, conn, schema: str, with_stats: bool, tables: list) -> dict:
+        """
+        Per-insert write cost on each table with derived structures, compared to
+        the same write batch replayed against a pristine copy of the fixture.
+        A table whose batch can't be replayed gets {"error": ...} in the report,
+        and a measurement that fails as a whole sets the report's "error".
+        """
+        batch_size = self.maintenance_batch_size
+        report = {"batch_size": batch_size, "tables": {}}
+
+        baseline_db = self._new_temp_db()
+        try:
+            baseline_conn = self._prepare_db(baseline_db, schema, with_stats=with_stats)
+            for table in tables:
+                try:
+                    baseline_batch = self._time_write_batch(baseline_conn, table, batch_size)
+                    derived_batch = self._time_write_batch(conn, table, batch_size)
+                except sqlite3.Error as e:
+                    # A write the replay can't make (CHECK, foreign key, ...) leaves
+                    # this table unmeasured; it says nothing about the candidate
+                    report["tables"][table] = {"error": str(e)}
+                    continue
+                if baseline_batch is None or derived_batch is None:
+                    continue
+                baseline, baseline_rows = baseline_batch
+                derived, derived_rows = derived_batch
+                report["tables"][table] = {
+                    "baseline_per_insert": baseline,
+                    "derived_per_insert": derived,
+                    "overhead_per_insert": derived - baseline,
+                    "overhead_ratio": derived / baseline if baseline else None,
+                    # Rows written per application insert, counting trigger writes
+                    "rows_written_per_insert": derived_rows,
+                    "write_amplification": derived_rows / baseline_rows if baseline_rows else None
+                }
+            baseline_conn.close()
+        except Exception as e:
+            # Never let the maintenance report reject the candidate it describes
+            report["error"] = str(e)
+        finally:
+            Path(baseline_db).unlink(missing_ok=True)
+
+        return report
+
+    def _apply_maintenance_penalty(self, result: dict, saved_per_read: float):
+        """Subtract the maintenance-aware reward term (see maintenance_weight) from result["reward"]"""
+        maintenance = result["maintenance"]
+        overhead_per_insert = sum(
+            max(0.0, table["overhead_per_insert"])
+            for table in maintenance["tables"].values() if "overhead_per_insert" in table
+        )
+        cost_per_read = (self.writes_per_read * overhead_per_insert
+                         + result["build_time"] / self.build_amortization_reads)
+        if saved_per_read > 0:
+            share = min(1.0, cost_per_read / saved_per_read)
+        else:
+            share = 1.0 if cost_per_read > 0 else 0.0
+        maintenance["cost_per_read"] = cost_per_read
+        maintenance["saved_share"] = share
+        maintenance["penalty"] = self.maintenance_weight * share
+        result["reward"] = max(0, result["reward"] - maintenance["penalty"])
+
+    def _time_write_batch(self, conn, table: str, batch_size: int):
+        """
+        Average (seconds, rows written) per insert for a batch of cloned rows.
+        Rows written include changes made by triggers. The batch runs in a
+        savepoint that is rolled back, so the fixture data is left untouched.
+        """
+        clone = self._clone_row_statement(conn, table)
+        if clone is None:
+            return None
+        sql, max_rowid = clone
+
+        # Fixed seed: both databases replay exactly the same rows
+        rng = random.Random(0)
+        params = [{"rowid": rng.randint(1, max_rowid), "salt": SYNTHETIC_KEY_BASE + i} for i in range(batch_size)]
+
+        conn.commit()
+        conn.execute("SAVEPOINT quill_write_batch")
+        try:
+            changes_before = conn.total_changes
             start = time.perf_counter()
-            result = conn.execute(select_statement).fetchall()
-            if time.perf_counter() - start > timeout_seconds:
-                return None, None
+            for row_params in params:
+                conn.execute(sql, row_params)
+            elapsed = time.perf_counter() - start
+            rows_written = conn.total_changes - changes_before
+        finally:
+            conn.execute("ROLLBACK TO quill_write_batch")
+            conn.execute("RELEASE quill_write_batch")
 
-            # Time the SELECT query only
-            times = []
-            for _ in range(num_runs):
-                start_time = time.perf_counter()
-                conn.execute(select_statement).fetchall()
-                elapsed = time.perf_counter() - start_time
+        return elapsed / batch_size, rows_written / batch_size
+
+    def _speedup_reward(self, speedup: float) -> float:
+        # Reward scaling optimized for real-world SQL optimizations
+        # Emphasizes common 2-50x speedups over rare 1000x+ edge cases
+        # 2x -> 0.45, 5x -> 0.60, 10x -> 0.70, 50x -> 0.85, 1000x -> 0.95
+        if speedup >= 2.0:
+            # Shifted log scale: more reward for realistic speedups
+            log_speedup = math.log10(speedup)
+            return min(1.0, 0.3 + (log_speedup / 3.5))
+        elif speedup >= 1.5:
+            # Minor optimizations still valuable
+            return 0.25 + (speedup - 1.5) * 0.4  # 1.5x -> 0.25, 2x -> 0.45
+        elif speedup >= 1.1:
+            return 0.15
+        return 0
+
+    def _timing_stats(self, samples: list, first_row_samples: list = None) -> dict:
+        """Summarize raw timing samples; the samples themselves are kept for later analysis"""
+        ordered = sorted(samples)
+        stats = {
+            "mean": sum(samples) / len(samples),
+            "p50": self._percentile(ordered, 50),
+            "p95": self._percentile(ordered, 95),
+            "p99": self._percentile(ordered, 99),
+            "min": ordered[0],
+            "max": ordered[-1],
+            "samples": list(samples)
+        }
 
-                # Check if this single run exceeded timeout
-                if elapsed > timeout_seconds:
-                    return None, None
+        if first_row_samples:
+            stats["first_row"] = sum(first_row_samples) / len(first_row_samples)
+            stats["first_row_samples"] = list(first_row_samples)
 
-                times.append(elapsed)
+        return stats
 
-            avg_time = sum(times) / num_runs
-            return result, avg_time
+    @staticmethod
+    def _percentile(ordered: list, pct: float) -> float:
+        """Linear-interpolated percentile of an already sorted list"""
+        if len(ordered) == 1:
+            return ordered[0]
+        rank = (len(ordered) - 1) * pct / 100
+        low = math.floor(rank)
+        high = math.ceil(rank)
+        return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+    def _run_query(self, conn, query: str, num_runs: int, timeout_seconds: int = 30,
+                   measure_first_row: bool = False, analyze_after_setup: bool = False,
+                   setup_timings: list = None):
+        """
+        Run setup statements once, then time the SELECT.
+
+        With analyze_after_setup, ANALYZE is re-run after the setup statements so
+        indexes the candidate creates get statistics too, as they would in production.
+
+        Returns (result, samples, first_row_samples), or (None, None, None) on
+        failure/timeout. first_row_samples is empty unless measure_first_row is set.
+        If setup_timings is given, (statement, seconds) is appended per setup statement.
+        """
+        try:
+            setup_statements, select_statement = self._split_statements(query)
+
+            # Execute all DDL statements (CREATE, ALTER, DROP) first without timing
+            for stmt in setup_statements:
+                start_time = time.perf_counter()
+                self.backend.execute(conn, stmt)
+                if setup_timings is not None:
+                    setup_timings.append((stmt, time.perf_counter() - start_time))
+            if analyze_after_setup and setup_statements:
+                self.backend.collect_statistics(conn)
+
+            self.backend.reset(conn)
+            return self.backend.execute_and_time(
+                conn, select_statement, num_runs, timeout_seconds, measure_first_row
+            )
         except Exception as e:
-            return None, None
+            return None, None, None
         
+    def _statements(self, sql: str) -> list:
+        """Split SQL text into individual statements"""
+        return [statement.text for statement in split_statements(sql)]
+
+    def _split_statements(self, query: str):
+        """Split a candidate into (setup statements, SELECT statement to time)"""
+        setup_statements = []
+        select_statement = None
+        for statement in split_statements(query):
+            # WITH ... SELECT counts as the query; WITH ... INSERT is setup
+            if statement.is_query:
+                select_statement = statement.text
+            else:
+                setup_statements.append(statement.text)
+
+        # If no SELECT found, assume the last statement is the query to time
+        if select_statement is None:
+            select_statement = setup_statements.pop()
+
+        return setup_statements, select_statement
+
+    def _reads_added_columns(self, query: str) -> bool:
+        """Whether the query's SELECT names a column its setup adds with ALTER TABLE ... ADD"""
+        setup_statements, select_statement = self._split_statements(query)
+        columns = added_columns(";\n".join(setup_statements))
+        return any(
+            token.kind in ("identifier", "quoted_identifier") and token.name.lower() in columns
+            for token in tokenize(select_statement)
+        )
+
+    def _new_temp_db(self) -> str:
+        with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as temp_db_file:
+            return temp_db_file.name
+
+    def _prepare_db(self, db_path: str, schema: str, with_stats: bool = False):
+        """Copy the cached fixture for this schema to db_path and open it"""
+        template = self._fixture_template(schema, with_stats)
+        shutil.copyfile(template, db_path)
+        return self.backend.connect(db_path)
+
+    def _fixture_template(self, schema: str, with_stats: bool = False) -> Path:
+        """
+        Return the cached template database for a schema, building it on first use.
+
+        The template with planner statistics sits next to the plain one and is
+        built from it by running ANALYZE once. The cache key covers the schema
+        text and the source database's size/mtime, so regenerating test.db
+        invalidates stale templates.
+        """
+        key_source = f"{self.backend.name}\0{schema}"
+        source = Path(self.test_db_path)
+        if source.exists():
+            source_stat = source.stat()
+            key_source += f"\0{source.resolve()}\0{source_stat.st_size}\0{source_stat.st_mtime_ns}"
+        key = hashlib.sha256(key_source.encode()).hexdigest()[:24]
+
+        plain_path = self.fixture_cache_dir / f"{key}.db"
+        stats_path = self.fixture_cache_dir / f"{key}.stats.db"
+
+        with self._fixture_lock:
+            if not plain_path.exists():
+                building = self.fixture_cache_dir / f"{key}.building"
+                building.unlink(missing_ok=True)
+                conn = self.backend.connect(str(building))
+                try:
+                    self.backend.load_fixture(conn, schema, self.test_db_path)
+                finally:
+                    conn.close()
+                building.replace(plain_path)
+
+            if with_stats and not stats_path.exists():
+                building = self.fixture_cache_dir / f"{key}.stats.building"
+                shutil.copyfile(plain_path, building)
+                conn = self.backend.connect(str(building))
+                try:
+                    self.backend.collect_statistics(conn)
+                finally:
+                    conn.close()
+                building.replace(stats_path)
+
+        return stats_path if with_stats else plain_path
+
+    def evaluate_workload(self,
+                          schema: str,
+                          workload: list,
+                          candidate_ddl: str,
+                          num_runs: int = 3,
+                          timeout_seconds: int = 30,
+                          regression_threshold: float = 1.1,
+                          measure_maintenance: bool = True) -> dict:
+        """
+        Score a DDL candidate (e.g. a set of CREATE INDEX statements) by its effect
+        on a weighted workload of queries against one schema.
+
+        workload is a list of {"query": str, "weight": float} (plain strings get
+        weight 1). Every query is timed before and after the DDL and must return
+        the same rows. A query counts as regressed when it gets slower by more than
+        regression_threshold. The reward is computed from the weighted total
+        speedup, so a candidate that helps one query and hurts others is scored on
+        the net effect. The report includes the DDL's per-insert maintenance cost
+        and write amplification unless measure_maintenance is False.
+        """
+        workload = [{"query": item, "weight": 1.0} if isinstance(item, str) else item for item in workload]
+        temp_db = self._new_temp_db()
+
+        try:
+            conn = self._prepare_db(temp_db, schema)
+
+            baselines = []
+            for item in workload:
+                result, samples, first_row = self._run_query(
+                    conn, item["query"], num_runs, timeout_seconds, self.measure_first_row
+                )
+                if result is None:
+                    return {"success": False, "reward": 0, "error": f"Workload query failed or timed out: {item['query']}"}
+                baselines.append((result, self._timing_stats(samples, first_row)))
+
+            objects_before = self.backend.schema_objects(conn)
+            pages_before = self._page_count(conn)
+            build_time = 0.0
+            for stmt in self._statements(candidate_ddl):
+                start_time = time.perf_counter()
+                self.backend.execute(conn, stmt)
+                build_time += time.perf_counter() - start_time
+            conn.commit()
+            derived_objects = self._derived_objects(objects_before, self.backend.schema_objects(conn))
+
+            queries = []
+            total_before = total_after = 0.0
+            for item, (baseline_result, before) in zip(workload, baselines):
+                result, samples, first_row = self._run_query(
+                    conn, item["query"], num_runs, timeout_seconds, self.measure_first_row
+                )
+                if result is None:
+                    return {"success": False, "reward": 0, "error": f"Workload query failed after DDL: {item['query']}"}
+                if not self._results_equal(baseline_result, result):
+                    return {"success": False, "reward": 0, "error": f"Results changed after DDL: {item['query']}"}
+
+                after = self._timing_stats(samples, first_row)
+                weight = item.get("weight", 1.0)
+                before_time = before[self.reward_metric]
+                after_time = after[self.reward_metric]
+                total_before += weight * before_time
+                total_after += weight * after_time
+                queries.append({
+                    "query": item["query"],
+                    "weight": weight,
+                    "before": before_time,
+                    "after": after_time,
+                    "speedup": before_time / after_time if after_time else 1.0,
+                    "weighted_change": weight * (after_time - before_time),
+                    "regressed": after_time > before_time * regression_threshold
+                })
+
+            speedup = total_before / total_after if total_after else 1.0
+            result = {
+                "success": True,
+                "reward": self._speedup_reward(speedup),
+                "reward_metric": self.reward_metric,
+                "workload_speedup": speedup,
+                "weighted_time_before": total_before,
+                "weighted_time_after": total_after,
+                "queries": queries,
+                "regressed_queries": sum(1 for q in queries if q["regressed"]),
+                "derived_objects": derived_objects,
+                "build_time": build_time
+            }
+
+            new_indexes = [obj for obj in derived_objects if obj["type"] == "index" and obj["change"] == "created"]
+            if new_indexes and self.backend.name == "sqlite":
+                result["index_storage"] = self._index_storage(conn, new_indexes, pages_before)
+
+            if measure_maintenance and self.backend.name == "sqlite":
+                base_tables = {name for (obj_type, name) in objects_before if obj_type == "table"}
+                maintained = sorted({obj["table"] for obj in derived_objects if obj["table"] in base_tables})
+                if maintained:
+                    result["maintenance"] = self._measure_maintenance(conn, schema, False, maintained)
+
+            conn.close()
+            return result
+        except Exception as e:
+            return {"success": False, "reward": 0, "error": str(e)}
+        finally:
+            Path(temp_db).unlink(missing_ok=True)
+
+    def evaluate_parameterized(self,
+                               schema: str,
+                               original_query: str,
+                               optimized_query: str,
+                               bindings=None,
+                               binding_spec: dict = None,
+                               num_bindings: int = 20,
+                               num_runs: int = 3,
+                               timeout_seconds: int = 30,
+                               regression_threshold: float = 1.1,
+                               seed: int = 0) -> dict:
+        """
+        Compare two parameterized queries across many literal bindings.
+
+        Queries use named (:age) or positional (?) parameters. Bindings come from
+        either `bindings` (a list of dicts/tuples, or a callable taking the fixture
+        connection and num_bindings) or `binding_spec`, which maps each parameter
+        to a (table, column) whose values are sampled from the fixture, so
+        literals follow the data's real distribution. Statements are re-executed
+        with the same SQL text, so sqlite3's statement cache reuses the prepared
+        statement across bindings.
+
+        Reports the per-binding speedup distribution and the share of bindings
+        where the candidate regresses, i.e. gets slower by more than
+        regression_threshold (the same rule as evaluate_workload, so timing noise
+        around a 1.0x speedup isn't counted). The reward is based on the median
+        speedup.
+        """
+        temp_db = self._new_temp_db()
+
+        try:
+            conn = self._prepare_db(temp_db, schema)
+
+            if callable(bindings):
+                bindings = bindings(conn, num_bindings)
+            elif bindings is None:
+                if not binding_spec:
+                    return {"success": False, "reward": 0, "error": "Need bindings or binding_spec"}
+                bindings = self.sample_bindings(conn, binding_spec, num_bindings, seed)
+            if not bindings:
+                return {"success": False, "reward": 0, "error": "No bindings to evaluate"}
+
+            original_setup, original_select = self._split_statements(original_query)
+            optimized_setup, optimized_select = self._split_statements(optimized_query)
+
+            for stmt in original_setup:
+                self.backend.execute(conn, stmt)
+            original_runs = []
+            for params in bindings:
+                rows, times = self._time_with_params(conn, original_select, params, num_runs)
+                original_runs.append((rows, sum(times) / len(times)))
+
+            for stmt in optimized_setup:
+                self.backend.execute(conn, stmt)
+
+            per_binding = []
+            for params, (original_rows, original_time) in zip(bindings, original_runs):
+                rows, times = self._time_with_params(conn, optimized_select, params, num_runs)
+                optimized_time = sum(times) / len(times)
+                if max(original_time, optimized_time) > timeout_seconds:
+                    return {"success": False, "reward": 0, "error": f"Binding {params!r} exceeded {timeout_seconds}s"}
+                if not self._results_equal(original_rows, rows):
+                    return {
+                        "success": False,
+                        "reward": 0,
+                        "error": f"Results do not match for binding {params!r}",
+                        "result_diff": self._result_diff(original_rows, rows)
+                    }
+                per_binding.append({
+                    "params": params if isinstance(params, dict) else list(params),
+                    "original_time": original_time,
+                    "optimized_time": optimized_time,
+                    "speedup": original_time / optimized_time if optimized_time else 1.0,
+                    "regressed": optimized_time > original_time * regression_threshold
+                })
+
+            conn.close()
+
+            speedups = sorted(b["speedup"] for b in per_binding)
+            median = self._percentile(speedups, 50)
+            return {
+                "success": True,
+                "reward": self._speedup_reward(median),
+                "num_bindings": len(per_binding),
+                "speedup_distribution": {
+                    "min": speedups[0],
+                    "p10": self._percentile(speedups, 10),
+                    "p50": median,
+                    "p90": self._percentile(speedups, 90),
+                    "max": speedups[-1],
+                    "geometric_mean": math.exp(sum(math.log(x) for x in speedups) / len(speedups))
+                },
+                "regression_share": sum(1 for b in per_binding if b["regressed"]) / len(per_binding),
+                "bindings": per_binding
+            }
+        except Exception as e:
+            return {"success": False, "reward": 0, "error": str(e)}
+        finally:
+            Path(temp_db).unlink(missing_ok=True)
+
+    def sample_bindings(self, conn, binding_spec, num_bindings: int = 20, seed: int = 0) -> list:
+        """
+        Sample parameter bindings from the fixture's value distribution.
+
+        binding_spec is {"param": (table, column)} for named parameters, or a list
+        of (table, column) for positional ones. Values are drawn from the column's
+        non-NULL rows, so frequent values are sampled more often.
+        """
+        rng = random.Random(seed)
+        named = isinstance(binding_spec, dict)
+        items = list(binding_spec.items()) if named else list(enumerate(binding_spec))
+
+        samples = {}
+        for name, (table, column) in items:
+            values = [row[0] for row in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL")]
+            if not values:
+                raise ValueError(f"No values to sample for {table}.{column}")
+            samples[name] = rng.choices(values, k=num_bindings)
+
+        if named:
+            return [{name: samples[name][i] for name, _ in items} for i in range(num_bindings)]
+        return [tuple(samples[index][i] for index, _ in items) for i in range(num_bindings)]
+
+    def evaluate_pagination(self,
+                            schema: str,
+                            paginated_query: str,
+                            num_pages: int = 50,
+                            key_column: str = "id",
+                            setup: str = "",
+                            num_runs: int = 3,
+                            timeout_seconds: int = 30) -> dict:
+        """
+        Walk an OFFSET-paginated query page by page next to its keyset equivalent.
+
+        setup (e.g. CREATE INDEX statements) is applied before walking and benefits
+        both forms. Each page is checked for identical contents and timed, giving
+        latency-vs-depth curves that a single-shot SELECT can't show.
+        """
+        try:
+            mapping = offset_to_keyset(paginated_query, key_column)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+        page_size = mapping["page_size"]
+        temp_db = self._new_temp_db()
+
+        try:
+            conn = self._prepare_db(temp_db, schema)
+            for stmt in self._statements(setup):
+                self.backend.execute(conn, stmt)
+
+            pages = []
+            cursor_values = None
+            order_index = key_index = None
+
+            for page in range(num_pages):
+                offset_params = (page * page_size,)
+                if page == 0:
+                    keyset_sql, keyset_params = mapping["first_page_sql"], ()
+                elif mapping["order_column"] == mapping["key_column"]:
+                    keyset_sql, keyset_params = mapping["next_page_sql"], cursor_values[:1]
+                else:
+                    keyset_sql, keyset_params = mapping["next_page_sql"], cursor_values
+
+                offset_rows, offset_times = self._time_with_params(conn, mapping["offset_sql"], offset_params, num_runs)
+                keyset_rows, keyset_times = self._time_with_params(conn, keyset_sql, keyset_params, num_runs)
+
+                if max(offset_times + keyset_times) > timeout_seconds:
+                    return {"success": False, "error": f"Page {page} exceeded {timeout_seconds}s", "pages": pages}
+
+                if offset_rows != keyset_rows:
+                    return {
+                        "success": False,
+                        "error": f"Page {page} contents differ between OFFSET and keyset",
+                        "pages": pages,
+                        "result_diff": self._result_diff(offset_rows, keyset_rows)
+                    }
+
+                if not offset_rows:
+                    break
+
+                offset_time = sum(offset_times) / len(offset_times)
+                keyset_time = sum(keyset_times) / len(keyset_times)
+                pages.append({
+                    "page": page,
+                    "offset": page * page_size,
+                    "offset_time": offset_time,
+                    "keyset_time": keyset_time,
+                    "speedup": offset_time / keyset_time if keyset_time else 1.0
+                })
+
+                if order_index is None:
+                    columns = [desc[0] for desc in conn.execute(mapping["first_page_sql"]).description]
+                    if mapping["order_column"] not in columns or mapping["key_column"] not in columns:
+                        return {
+                            "success": False,
+                            "error": "Keyset pagination needs the ORDER BY column and key column in the SELECT list"
+                        }
+                    order_index = columns.index(mapping["order_column"])
+                    key_index = columns.index(mapping["key_column"])
+
+                last_row = offset_rows[-1]
+                cursor_values = (last_row[order_index], last_row[key_index])
+
+                if len(offset_rows) < page_size:
+                    break
+
+            conn.close()
+
+            return {
+                "success": bool(pages),
+                "page_size": page_size,
+                "pages_walked": len(pages),
+                "offset_sql": mapping["offset_sql"],
+                "keyset_sql": mapping["next_page_sql"],
+                "pages": pages,
+                "deepest_speedup": pages[-1]["speedup"] if pages else None,
+                "mean_speedup": sum(p["speedup"] for p in pages) / len(pages) if pages else None
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            Path(temp_db).unlink(missing_ok=True)
+
+    def _time_with_params(self, conn, sql: str, params, num_runs: int):
+        """Fetch the rows for one set of parameters, then time num_runs executions"""
+        rows = [tuple(row) for row in conn.execute(sql, params).fetchall()]
+        times = []
+        for _ in range(num_runs):
+            start_time = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            times.append(time.perf_counter() - start_time)
+        return rows, times
+
+    def probe_concurrency(self,
+                          schema: str,
+                          original_query: str,
+                          optimized_query: str,
+                          num_readers: int = 4,
+                          duration_seconds: float = 2.0,
+                          writes_per_second: float = 100,
+                          write_tables: list = None,
+                          timeout_seconds: int = 30) -> dict:
+        """
+        Run each query from num_readers threads while a writer inserts into the
+        same tables, with the database in WAL mode.
+
+        Each query is probed on its own copy of the fixture so rows written during
+        the first probe don't leak into the second. Reports QPS and tail latency
+        for readers, and how many writes got through, for both queries. Fails if
+        the writer got no write through in either probe.
+        """
+        if self.backend.name != "sqlite":
+            return {"success": False, "error": f"Concurrency probe needs the sqlite backend, not {self.backend.name}"}
+
+        fixture_db = self._new_temp_db()
+        probe_dbs = []
+
+        try:
+            conn = self._prepare_db(fixture_db, schema)
+            original_setup, original_select = self._split_statements(original_query)
+            optimized_setup, optimized_select = self._split_statements(optimized_query)
+
+            if write_tables is None:
+                table_names = [name for (name,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                )]
+                write_tables = [
+                    name for name in table_names
+                    if re.search(rf'\b{re.escape(name)}\b', original_query + "\n" + optimized_query, re.IGNORECASE)
+                ]
+            conn.close()
+
+            results = {}
+            for label, setup, select in (("original", original_setup, original_select),
+                                         ("optimized", optimized_setup, optimized_select)):
+                probe_db = self._new_temp_db()
+                probe_dbs.append(probe_db)
+                shutil.copyfile(fixture_db, probe_db)
+
+                probe_conn = sqlite3.connect(probe_db)
+                probe_conn.execute("PRAGMA journal_mode=WAL")
+                for stmt in setup:
+                    probe_conn.execute(stmt)
+                probe_conn.commit()
+                probe_conn.close()
+
+                results[label] = self._run_concurrent_load(
+                    probe_db, select, write_tables, num_readers,
+                    duration_seconds, writes_per_second, timeout_seconds
+                )
+
+            original, optimized = results["original"], results["optimized"]
+            # Without writes the probe measured plain read throughput, not contention
+            stalled = [label for label, load in results.items() if write_tables and load["writes"] == 0]
+            if stalled:
+                load = results[stalled[0]]
+                return {
+                    "success": False,
+                    "error": (f"Writer completed no writes during the {stalled[0]} probe "
+                              f"({load['write_errors']} errors: {load['write_error'] or 'no rows to copy'})"),
+                    "write_tables": write_tables,
+                    "original": original,
+                    "optimized": optimized
+                }
+            return {
+                "success": original["reads"] > 0 and optimized["reads"] > 0,
+                "num_readers": num_readers,
+                "duration_seconds": duration_seconds,
+                "write_tables": write_tables,
+                "original": original,
+                "optimized": optimized,
+                "qps_ratio": optimized["qps"] / original["qps"] if original["qps"] else None,
+                "p99_ratio": original["p99"] / optimized["p99"] if optimized["p99"] else None
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            for path in [fixture_db] + probe_dbs:
+                for suffix in ("", "-wal", "-shm"):
+                    Path(path + suffix).unlink(missing_ok=True)
+
+    def _run_concurrent_load(self, db_path: str, select_statement: str, write_tables: list,
+                             num_readers: int, duration_seconds: float,
+                             writes_per_second: float, timeout_seconds: int) -> dict:
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies = []
+        counters = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+        first_write_error = []
+
+        def reader():
+            conn = sqlite3.connect(db_path, timeout=timeout_seconds)
+            local = []
+            errors = 0
+            while not stop.is_set():
+                start_time = time.perf_counter()
+                try:
+                    conn.execute(select_statement).fetchall()
+                    local.append(time.perf_counter() - start_time)
+                except sqlite3.Error:
+                    errors += 1
+            conn.close()
+            with lock:
+                latencies.extend(local)
+                counters["reads"] += len(local)
+                counters["read_errors"] += errors
+
+        def writer():
+            conn = sqlite3.connect(db_path, timeout=timeout_seconds)
+            inserts = []
+            for table in write_tables:
+                insert = self._clone_row_statement(conn, table)
+                if insert:
+                    inserts.append(insert)
+
+            interval = 1.0 / writes_per_second if writes_per_second else 0
+            writes = errors = 0
+            salt = SYNTHETIC_KEY_BASE
+            while inserts and not stop.is_set():
+                sql, max_rowid = random.choice(inserts)
+                salt += 1
+                try:
+                    conn.execute(sql, {"rowid": random.randint(1, max_rowid), "salt": salt})
+                    conn.commit()
+                    writes += 1
+                except sqlite3.Error as e:
+                    errors += 1
+                    if not first_write_error:
+                        first_write_error.append(str(e))
+                if interval:
+                    stop.wait(interval)
+            conn.close()
+            with lock:
+                counters["writes"] += writes
+                counters["write_errors"] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(num_readers)]
+        if write_tables:
+            threads.append(threading.Thread(target=writer))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stop.wait(duration_seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        ordered = sorted(latencies)
+        return {
+            **counters,
+            "write_error": first_write_error[0] if first_write_error else None,
+            "qps": counters["reads"] / elapsed,
+            "writes_per_second": counters["writes"] / elapsed,
+            "mean": sum(ordered) / len(ordered) if ordered else None,
+            "p50": self._percentile(ordered, 50) if ordered else None,
+            "p95": self._percentile(ordered, 95) if ordered else None,
+            "p99": self._percentile(ordered, 99) if ordered else None
+        }
+
+    def _clone_row_statement(self, conn, table: str):
+        """
+        Build an INSERT that copies an existing row (found by :rowid) as a new row.
+
+        Columns of the primary key and of UNIQUE constraints can't be copied
+        verbatim, so they get a fresh value derived from :salt, which the caller
+        makes unique per insert (numbers become the salt itself, text gets it
+        appended; NULLs stay NULL). Returns (sql, max_rowid), or None if the
+        table is empty.
+        """
+        columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        pk_columns = [col for col in columns if col[5]]
+        # An INTEGER PRIMARY KEY aliases rowid, so leave it out and let SQLite assign one
+        skip = {pk_columns[0][1]} if len(pk_columns) == 1 and pk_columns[0][2].upper() == "INTEGER" else set()
+
+        unique = {col[1] for col in pk_columns} - skip
+        for _, index_name, is_unique, *_ in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            if is_unique:
+                unique.update(name for _, _, name in conn.execute(f"PRAGMA index_info('{index_name}')") if name)
+
+        names = [col[1] for col in columns if col[1] not in skip]
+        values = [
+            f"CASE WHEN typeof({name}) IN ('integer', 'real') THEN :salt "
+            f"WHEN {name} IS NULL THEN NULL ELSE {name} || '~' || :salt END"
+            if name in unique else name
+            for name in names
+        ]
+
+        max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+        if not max_rowid:
+            return None
+
+        sql = (f"INSERT INTO {table} ({', '.join(names)}) SELECT {', '.join(values)} "
+               f"FROM {table} WHERE rowid >= :rowid LIMIT 1")
+        return sql, max_rowid
+
     def _results_equal(self, result1, result2) -> bool:
         if len(result1) != len(result2):
             return False
@@ -171,38 +1582,22 @@ class SQLEvaluator:
         sorted1 = sorted([tuple(row) for row in result1])
         sorted2 = sorted([tuple(row) for row in result2])
         
-        return sorted1 == sorted2
-    
-    def _copy_data(self, conn):
-        source = sqlite3.connect(self.test_db_path)
-
-        # Get tables from source database
-        source_tables = source.execute(
-            "SELECT name FROM sqlite_master WHERE type='table'"
-        ).fetchall()
-
-        # Get tables from destination database
-        dest_tables = conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table'"
-        ).fetchall()
-        dest_table_names = {name for (name,) in dest_tables}
-
-        # Only copy tables that exist in both databases
-        for (table_name,) in source_tables:
-            if table_name not in dest_table_names:
-                continue  # Skip tables that don't exist in destination
-
-            data = source.execute(f"SELECT * FROM {table_name}").fetchall()
-
-            if data:
-                placeholders = ','.join(['?'] * len(data[0]))
-                conn.executemany(
-                    f"INSERT INTO {table_name} VALUES ({placeholders})",
-                    data
-                )
+        if sorted1 == sorted2:
+            return True
 
-        conn.commit()
-        source.close()
+        # Aggregates maintained incrementally (summary tables kept up to date by
+        # triggers) add floats in a different order than a full scan does
+        return all(
+            len(row1) == len(row2) and all(self._values_equal(a, b) for a, b in zip(row1, row2))
+            for row1, row2 in zip(sorted1, sorted2)
+        )
+
+    @staticmethod
+    def _values_equal(a, b) -> bool:
+        if isinstance(a, float) or isinstance(b, float):
+            if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+                return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+        return a == b
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""
+Query fingerprinting.
+
+Two queries that differ only in whitespace, comments, keyword/identifier case
+or literal values normalize to the same text and therefore the same
+fingerprint, e.g.
+
+    select *  from Users where age > 30   -- adults
+    SELECT * FROM users WHERE age > 65
+
+both normalize to "SELECT * FROM users WHERE age > ?". The fingerprint is a
+hash of that text that is stable across processes and runs, so it can be used
+for deduplication, diversity stats and cache keys.
+"""
+
+import hashlib
+from functools import lru_cache
+
+from quill.sql_tokens import INSIGNIFICANT, split_statements
+
+# Tokens replaced by a placeholder
+LITERALS = ("string", "number", "parameter")
+
+# No space is needed around these when rebuilding the normalized text
+TIGHT_BEFORE = {")", ",", ".", ";"}
+TIGHT_AFTER = {"(", "."}
+
+
+def _ends_operand(part: str) -> bool:
+    """Whether a normalized token can end an operand (so a following +/- is binary)"""
+    if part in ("?", ")", "END"):
+        return True
+    # Identifiers are lower-cased, keywords and operators are not
+    return not part.isupper() and (part[0].isalnum() or part[0] == "_")
+
+
+def _normalize_statement(statement) -> str:
+    tokens = [t for t in statement.tokens if t.kind not in INSIGNIFICANT]
+    parts = []
+    for token in tokens:
+        if token.kind in LITERALS:
+            value = "?"
+            # A unary sign is part of the literal: -5 and 5 normalize alike
+            if parts and parts[-1] in ("-", "+") and (len(parts) == 1 or not _ends_operand(parts[-2])):
+                parts.pop()
+        elif token.kind == "keyword" or (token.kind == "identifier" and token.upper in ("NULL", "TRUE", "FALSE")):
+            value = token.upper
+        elif token.kind in ("identifier", "quoted_identifier"):
+            value = token.name.lower()
+        else:
+            value = token.value
+
+        # IN (?, ?, ?) -> IN (?): list length doesn't change the query's shape
+        if value == "?" and len(parts) >= 2 and parts[-1] == "," and parts[-2] == "?":
+            parts.pop()
+            continue
+        parts.append(value)
+
+    text = ""
+    for i, part in enumerate(parts):
+        if i and part not in TIGHT_BEFORE and parts[i - 1] not in TIGHT_AFTER:
+            text += " "
+        text += part
+    return text
+
+
+@lru_cache(maxsize=8192)
+def normalize_query(sql: str) -> str:
+    """
+    Normalize SQL text: comments and extra whitespace dropped, keywords upper
+    case, identifiers lower case, literals and bind parameters replaced by ?,
+    IN lists collapsed. Statements are joined with "; ".
+    """
+    return "; ".join(_normalize_statement(statement) for statement in split_statements(sql or ""))
+
+
+@lru_cache(maxsize=8192)
+def fingerprint(sql: str) -> str:
+    """Stable hex fingerprint of the normalized query"""
+    return hashlib.sha1(normalize_query(sql).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def example_fingerprint(example: dict) -> str:
+    """Fingerprint of a training example's (slow query, optimized query) pair"""
+    return fingerprint(example.get("slow_query") or "") + fingerprint(example.get("fast_query") or "")
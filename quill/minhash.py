@@ -0,0 +1,124 @@
+"""
+MinHash signatures and LSH for near-duplicate SQL detection.
+
+Queries are compared as sets of word shingles of their normalized text
+(quill.fingerprint.normalize_query), so formatting and literal values don't
+matter, and a query that adds one column or predicate is still close to the
+original. MinHash estimates the Jaccard similarity of two shingle sets from
+fixed-size signatures; LSH banding finds the signatures likely to be above a
+similarity threshold with a handful of dictionary lookups, independent of how
+many queries are indexed.
+"""
+
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from quill.fingerprint import normalize_query
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(sql: str, size: int = 3) -> Set[str]:
+    """Word shingles of the normalized query (the whole query if it is shorter than size)"""
+    words = normalize_query(sql or "").split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash32(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _choose_bands(threshold: float, num_perm: int, recall: float = 0.95) -> Tuple[int, int]:
+    """
+    (bands, rows) with the most rows per band (fewest false candidates) that
+    still make a pair at exactly the threshold a candidate with probability
+    >= recall. False candidates are filtered out on the full signature.
+    """
+    for rows in range(num_perm, 0, -1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+class MinHashLSH:
+    """
+    Incremental MinHash LSH index: insert(key, text), query(text) -> near-duplicate keys.
+
+    Similarity is the Jaccard similarity of shingle sets, estimated from
+    num_perm-value signatures; matches are verified against the threshold on
+    the full signature, so band collisions below it are not reported.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(threshold, num_perm)
+
+        # Hash functions (a*h + b mod p) truncated to 32 bits; a*h wraps modulo
+        # 2^64 in uint64 arithmetic, which is fine for mixing
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's shingles"""
+        hashes = np.array([_hash32(s) for s in shingles(text, self.shingle_size)], dtype=np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        permuted = ((np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def insert(self, key: Hashable, text: str = None, signature: np.ndarray = None):
+        """Index text (or a precomputed signature) under key (no-op if key is already indexed)"""
+        if key in self._signatures:
+            return
+        if signature is None:
+            signature = self.signature(text)
+        with self._lock:
+            if key in self._signatures:
+                return
+            self._signatures[key] = signature
+            for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                bucket[band_key].append(key)
+
+    def query(self, text: str = None, signature: np.ndarray = None) -> List[Tuple[Hashable, float]]:
+        """Indexed keys with estimated similarity >= threshold, most similar first"""
+        if signature is None:
+            signature = self.signature(text)
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band_key, ()))
+            if not candidates:
+                return []
+            keys = list(candidates)
+            signatures = np.stack([self._signatures[key] for key in keys])
+        similarities = (signatures == signature).mean(axis=1)
+        matches = [(key, float(sim)) for key, sim in zip(keys, similarities) if sim >= self.threshold]
+        return sorted(matches, key=lambda match: -match[1])
+
+    def nearest(self, text: str = None, signature: np.ndarray = None) -> Optional[Tuple[Hashable, float]]:
+        """The most similar indexed key at or above the threshold, or None"""
+        matches = self.query(text, signature)
+        return matches[0] if matches else None
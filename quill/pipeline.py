@@ -0,0 +1,161 @@
+"""
+Pipelined generate → evaluate loop for the ReSTEM optimizers.
+
+Generation is network-bound and evaluation CPU-bound, so instead of generating
+a whole batch and then evaluating it, candidates stream through a bounded
+queue: generator threads call the LLM, evaluator threads run the timings, and
+each accepted candidate joins the training set (and so the few-shot pool)
+as soon as it is accepted.
+
+Backpressure: a new LLM request is only started when there is room for its
+candidates, i.e. fewer than queue_size requests are in flight or have
+candidates waiting to be evaluated. When evaluators fall behind, generation
+(and LLM spend) stops until they catch up.
+"""
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from quill.fingerprint import example_fingerprint
+
+_DONE = object()
+
+
+def run_pipeline(optimizer, num_candidates: int, num_runs: int = 3, timeout_seconds: int = 10,
+                 queue_size: int = 8, num_evaluators: int = 1) -> dict:
+    """
+    Stream num_candidates generation tasks (one prompt each, yielding one
+    candidate or, with samples_per_prompt > 1, several) through generation and
+    evaluation.
+
+    optimizer is a ReSTEMOptimizer or ReSTEMOptimizerV2: generation uses its
+    _candidate_task() and max_in_flight, evaluation its evaluate_candidate(),
+    and accepted candidates go to augment_training_set() one at a time.
+    Exact duplicates (by fingerprint) and near-duplicates (the optimizer's
+    _check_near_duplicate(), with slow queries checked once per task by
+    _check_slow_query()) are skipped before evaluation.
+    More than one evaluator runs timings concurrently, which adds noise to
+    them; the default of 1 still overlaps evaluation with generation.
+
+    Returns {"generated", "failed", "duplicates", "near_duplicates", "evaluated",
+    "accepted", "errors", "generation_stall_seconds", "elapsed_seconds"}; errors
+    counts candidates whose dedup check or training-set update raised (the
+    evaluator thread logs them and carries on).
+    """
+    queue_size = max(1, queue_size)
+    candidates = queue.Queue(maxsize=queue_size)
+    # One permit per task being generated or waiting (as a batch) in the queue
+    capacity = threading.Semaphore(queue_size)
+    lock = threading.Lock()
+    # Same slow + optimized query up to literals/formatting: nothing new to learn
+    # (candidates seen in this run; existing examples are in optimizer.example_fingerprints)
+    seen = set()
+    stats = {"generated": 0, "failed": 0, "duplicates": 0, "near_duplicates": 0, "evaluated": 0,
+             "accepted": 0, "errors": 0, "generation_stall_seconds": 0.0}
+    start = time.perf_counter()
+
+    def generate(task):
+        try:
+            result = task[0](*task[1:])
+        except Exception as e:
+            capacity.release()
+            with lock:
+                stats["failed"] += 1
+            print(f"  Generation ✗ Error: {e}")
+            return
+        # A task returns one candidate, or a list of them (n completions of one prompt)
+        batch = result if isinstance(result, list) else [result]
+        with lock:
+            stats["generated"] += len(batch)
+        candidates.put(batch)
+
+    def process(candidate, slow_query_reason):
+        key = example_fingerprint(candidate)
+        with lock:
+            duplicate = key in seen or key in optimizer.example_fingerprints
+            seen.add(key)
+            if duplicate:
+                near_duplicate = None
+            elif slow_query_reason:
+                near_duplicate = slow_query_reason
+                optimizer.near_duplicates_skipped += 1
+            else:
+                near_duplicate = optimizer._check_near_duplicate(candidate, check_slow_query=False)
+            if duplicate:
+                stats["duplicates"] += 1
+            elif near_duplicate:
+                stats["near_duplicates"] += 1
+            else:
+                stats["evaluated"] += 1
+                label = f"[{stats['evaluated']}]"
+        if duplicate:
+            print("  ⏭️  Duplicate of an existing example, skipped")
+            return
+        if near_duplicate:
+            print(f"  ⏭️  Near-duplicate skipped: {near_duplicate}")
+            return
+
+        try:
+            accepted = optimizer.evaluate_candidate(candidate, num_runs, timeout_seconds, label=label)
+        except Exception as e:
+            print(f"{label} Evaluating candidate... ✗ Error: {e}")
+            return
+        if accepted:
+            with lock:
+                optimizer.augment_training_set([candidate])
+                stats["accepted"] += 1
+
+    def evaluate():
+        while True:
+            batch = candidates.get()
+            if batch is _DONE:
+                return
+            capacity.release()
+            # An evaluator that died would leave the queue undrained and the
+            # generation loop blocked on capacity, so no error may escape
+            try:
+                # Slow queries are checked before any candidate of the task is accepted:
+                # completions of one prompt share a slow query, and accepting the first
+                # indexes it, which would reject its siblings (the batch loop only
+                # indexes after evaluating the whole batch)
+                with lock:
+                    slow_query_reasons = [optimizer._check_slow_query(candidate) for candidate in batch]
+            except Exception as e:
+                with lock:
+                    stats["errors"] += len(batch)
+                print(f"  ✗ Error processing candidates: {e!r}")
+                continue
+            for candidate, slow_query_reason in zip(batch, slow_query_reasons):
+                try:
+                    process(candidate, slow_query_reason)
+                except Exception as e:
+                    with lock:
+                        stats["errors"] += 1
+                    print(f"  ✗ Error processing candidate: {e!r}")
+
+    evaluators = [threading.Thread(target=evaluate, daemon=True) for _ in range(max(1, num_evaluators))]
+    for thread in evaluators:
+        thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=optimizer.max_in_flight) as generators:
+            for _ in range(num_candidates):
+                waited = time.perf_counter()
+                capacity.acquire()
+                stats["generation_stall_seconds"] += time.perf_counter() - waited
+                # Sampled now rather than up front, so bases include examples accepted so far
+                with lock:
+                    base = random.choice(optimizer.training_examples)
+                generators.submit(generate, optimizer._candidate_task(base))
+    finally:
+        # Stop the evaluators even if submitting failed, after they drain the queue
+        for _ in evaluators:
+            candidates.put(_DONE)
+        for thread in evaluators:
+            thread.join()
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    return stats
@@ -0,0 +1,191 @@
+"""
+Query plan diffing and optimization classification.
+
+Compares the EXPLAIN QUERY PLAN output of the original and optimized query and
+derives which optimization actually happened, instead of trusting the
+optimization_type the LLM claims.
+"""
+
+import re
+from typing import Dict, List
+
+from quill.sql_tokens import table_aliases
+
+# Access lines, in the current format (tables named by alias when there is one)
+#   SCAN u / SEARCH u USING COVERING INDEX idx_users_age (age>?) / SCAN docs VIRTUAL TABLE INDEX 0:M1
+# and the pre-3.36 one
+#   SCAN TABLE users AS u / SEARCH TABLE users AS u USING INDEX idx_users_age (age>?)
+PLAN_ACCESS = re.compile(
+    r'^(?P<op>SCAN|SEARCH)\s+(?:TABLE\s+)?(?P<table>\S+)(?:\s+AS\s+(?P<alias>\S+))?(?P<rest>.*)$',
+    re.IGNORECASE
+)
+PLAN_USING = re.compile(r'\bUSING\s+(?P<using>.*?)(?:\s+\(.*\))?$', re.IGNORECASE)
+PLAN_INDEX = re.compile(r'(?P<kind>(?:AUTOMATIC\s+)?(?:PARTIAL\s+)?(?:COVERING\s+)?)INDEX\s+(?P<name>\S+)', re.IGNORECASE)
+# Virtual table (e.g. FTS5) access through its own index: idxNum / idxStr other than 0 / empty
+PLAN_VIRTUAL_INDEX = re.compile(r'\bVIRTUAL TABLE INDEX\s+(?P<num>\d+):(?P<str>\S*)', re.IGNORECASE)
+PLAN_SUBQUERY = re.compile(r'\b(?:CORRELATED\s+)?(?:SCALAR|LIST)\s+SUBQUERY\b', re.IGNORECASE)
+PLAN_TEMP_BTREE = re.compile(r'\bUSE TEMP B-TREE\b', re.IGNORECASE)
+
+
+def parse_plan(plan: List[str], aliases: Dict[str, str] = None) -> Dict:
+    """
+    Summarize plan lines: per-table access, indexes used, temp B-trees, subqueries.
+
+    aliases maps lower-cased aliases to table names (quill.sql_tokens.table_aliases),
+    so plans of queries that alias a table differently still line up.
+    """
+    aliases = aliases or {}
+    access = {}
+    indexes = {}
+    virtual_indexes = set()
+    temp_btrees = 0
+    subqueries = 0
+
+    for line in plan:
+        line = line.strip()
+        if PLAN_TEMP_BTREE.search(line):
+            temp_btrees += 1
+        if PLAN_SUBQUERY.search(line):
+            subqueries += 1
+
+        match = PLAN_ACCESS.match(line)
+        if not match or line.upper().startswith("SCAN CONSTANT ROW"):
+            continue
+
+        # Old format: "TABLE users AS u" names the table; new format names the alias
+        table = match.group("table")
+        if not match.group("alias"):
+            table = aliases.get(table.lower(), table)
+        rest = match.group("rest")
+        using = PLAN_USING.search(rest)
+        index_match = PLAN_INDEX.search(using.group("using")) if using else None
+        virtual = PLAN_VIRTUAL_INDEX.search(rest)
+
+        # A table that is scanned anywhere counts as scanned
+        if access.get(table) != "SCAN":
+            access[table] = match.group("op").upper()
+        if index_match:
+            kind = index_match.group("kind").upper()
+            indexes[index_match.group("name")] = {
+                "table": table,
+                "covering": "COVERING" in kind,
+                "automatic": "AUTOMATIC" in kind
+            }
+        if virtual and (virtual.group("num") != "0" or virtual.group("str")):
+            virtual_indexes.add(table)
+
+    return {
+        "access": access,
+        "indexes": indexes,
+        "virtual_indexes": sorted(virtual_indexes),
+        "temp_btrees": temp_btrees,
+        "subqueries": subqueries,
+        "steps": len(plan)
+    }
+
+
+def diff_plans(before: List[str], after: List[str], original_sql: str = "", optimized_sql: str = "") -> Dict:
+    """
+    Structured diff between two query plans (pass the queries to resolve
+    table aliases).
+
+    Returns {"scan_to_search": [tables], "search_to_scan": [tables],
+    "new_indexes": [names], "new_covering_indexes": [names],
+    "automatic_indexes_removed": [names], "new_virtual_index_searches": [tables],
+    "uses_index": bool, "temp_btrees_removed": int, "subqueries_flattened": int,
+    "steps_removed": int, "changes": [str]}. uses_index: the new plan reads
+    through a (non-automatic) index, the rowid / primary key, or a virtual
+    table's index.
+    """
+    old = parse_plan(before, table_aliases(original_sql or ""))
+    new = parse_plan(after, table_aliases(optimized_sql or ""))
+
+    scan_to_search = sorted(t for t, op in new["access"].items() if op == "SEARCH" and old["access"].get(t) == "SCAN")
+    search_to_scan = sorted(t for t, op in new["access"].items() if op == "SCAN" and old["access"].get(t) == "SEARCH")
+    new_indexes = sorted(
+        name for name, info in new["indexes"].items()
+        if name not in old["indexes"] and not info["automatic"]
+    )
+    new_covering = sorted(
+        name for name, info in new["indexes"].items()
+        if info["covering"] and not info["automatic"] and not old["indexes"].get(name, {}).get("covering")
+    )
+    automatic_removed = sorted(
+        name for name, info in old["indexes"].items()
+        if info["automatic"] and name not in new["indexes"]
+    )
+    new_virtual = sorted(set(new["virtual_indexes"]) - set(old["virtual_indexes"]))
+    uses_index = (any(not info["automatic"] for info in new["indexes"].values())
+                  or "SEARCH" in new["access"].values() or bool(new["virtual_indexes"]))
+    temp_btrees_removed = old["temp_btrees"] - new["temp_btrees"]
+    subqueries_flattened = old["subqueries"] - new["subqueries"]
+    steps_removed = old["steps"] - new["steps"]
+
+    changes = [f"SCAN→SEARCH {table}" for table in scan_to_search]
+    changes += [f"SEARCH→SCAN {table}" for table in search_to_scan]
+    changes += [f"new covering index {name}" for name in new_covering]
+    changes += [f"new index {name}" for name in new_indexes if name not in new_covering]
+    changes += [f"automatic index {name} no longer needed" for name in automatic_removed]
+    changes += [f"virtual table index used on {table}" for table in new_virtual]
+    if temp_btrees_removed > 0:
+        changes.append(f"{temp_btrees_removed} temp B-tree(s) eliminated")
+    elif temp_btrees_removed < 0:
+        changes.append(f"{-temp_btrees_removed} temp B-tree(s) added")
+    if subqueries_flattened > 0:
+        changes.append(f"{subqueries_flattened} subquery(s) flattened")
+
+    return {
+        "scan_to_search": scan_to_search,
+        "search_to_scan": search_to_scan,
+        "new_indexes": new_indexes,
+        "new_covering_indexes": new_covering,
+        "automatic_indexes_removed": automatic_removed,
+        "new_virtual_index_searches": new_virtual,
+        "uses_index": uses_index,
+        "temp_btrees_removed": temp_btrees_removed,
+        "subqueries_flattened": subqueries_flattened,
+        "steps_removed": steps_removed,
+        "changes": changes
+    }
+
+
+def classify_optimization(diff: Dict, original_sql: str = "", optimized_sql: str = "") -> str:
+    """
+    Derive the optimization class from a plan diff, in the same vocabulary the
+    optimizers ask the LLM for: indexing|join|projection|limit|redundancy
+    (or "unknown" when the plan shows nothing attributable).
+
+    "indexing" needs index evidence in the new plan: a SCAN that became a
+    SEARCH, a new or newly covering index, an automatic index replaced by a
+    real one, or a virtual table (FTS) index. A sort or grouping B-tree that
+    merely disappeared (a precomputed summary table, a dropped ORDER BY) is
+    "redundancy".
+    """
+    if diff["subqueries_flattened"] > 0:
+        return "join"
+
+    if (diff["scan_to_search"] or diff["new_indexes"] or diff["new_covering_indexes"]
+            or diff.get("new_virtual_index_searches")
+            or (diff["automatic_indexes_removed"] and diff.get("uses_index"))):
+        return "indexing"
+
+    has_limit = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+    if has_limit.search(optimized_sql) and not has_limit.search(original_sql):
+        return "limit"
+
+    select_star = re.compile(r'\bSELECT\s+(?:DISTINCT\s+)?\*', re.IGNORECASE)
+    if select_star.search(original_sql) and not select_star.search(optimized_sql):
+        return "projection"
+
+    if diff["temp_btrees_removed"] > 0 or diff["steps_removed"] > 0:
+        return "redundancy"
+
+    return "unknown"
+
+
+def effective_optimization_type(example: Dict) -> str:
+    """The plan-verified optimization type of an example or record, falling back to the claimed one"""
+    verified = example.get("verified_optimization_type")
+    if verified and verified != "unknown":
+        return verified
+    return example.get("optimization_type") or "unknown"
@@ -0,0 +1,73 @@
+"""
+Prompt layout and token accounting for the optimizers.
+
+Providers cache prompt prefixes: when consecutive requests start with the same
+tokens (OpenAI: at least 1024 of them), the cached part is billed at a
+discount and processed faster. The "classic" layout opens every prompt with
+freshly chosen few-shot examples, so no two prompts share a prefix. The
+"prefix_stable" layout puts everything that doesn't change first (system
+message, instructions, a fixed versioned block of examples, response format)
+and the schema and query last.
+"""
+
+import threading
+from typing import Dict, List
+
+PROMPT_LAYOUTS = ("classic", "prefix_stable")
+
+
+def default_example_block(examples: List[Dict], size: int = 5) -> List[Dict]:
+    """
+    Deterministic example block: the first example of each optimization type
+    (in file order), then further examples in order, up to size.
+    """
+    block = []
+    seen_types = set()
+    for example in examples:
+        opt_type = example.get('optimization_type')
+        if opt_type not in seen_types:
+            seen_types.add(opt_type)
+            block.append(example)
+        if len(block) == size:
+            return block
+    for example in examples:
+        if len(block) == size:
+            break
+        if example not in block:
+            block.append(example)
+    return block
+
+
+class TokenUsage:
+    """Thread-safe running totals of API token usage, split into cached and uncached input"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, response):
+        """Add a chat completion response's usage (missing fields count as 0)"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.cached_prompt_tokens += cached
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'cached_prompt_tokens': self.cached_prompt_tokens,
+                'uncached_prompt_tokens': self.prompt_tokens - self.cached_prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'cache_hit_rate': self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            }
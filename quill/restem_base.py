@@ -0,0 +1,551 @@
+"""
+Shared machinery of the ReSTEM optimizers: seed loading, optimization prompts,
+few-shot retrieval, candidate evaluation and deduplication, the training set
+and its stats, and the batch / pipelined loops.
+
+ReSTEMOptimizer and ReSTEMOptimizerV2 differ in what a generation task is
+(re-optimizing an existing slow query vs. writing a new one first), which
+they define in _candidate_task().
+"""
+
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict
+from openai import OpenAI
+from dotenv import load_dotenv
+from quill.evaluator import SQLEvaluator, evaluation_record
+from quill.fingerprint import example_fingerprint, fingerprint
+from quill.minhash import MinHashLSH
+from quill.pipeline import run_pipeline
+from quill.plan_diff import effective_optimization_type
+from quill.prompts import PROMPT_LAYOUTS, TokenUsage, default_example_block
+from quill.retrieval import ExampleIndex
+
+load_dotenv()
+
+FEW_SHOT_STRATEGIES = ("similar", "random")
+
+
+class ReSTEMBase:
+    """Base class of the ReSTEM optimizers; subclasses implement _candidate_task()"""
+
+    # Name shown in iteration headers
+    name = "ReSTEM"
+    # Also skip candidates whose slow query is a near-duplicate of an example's
+    # (V2, whose point is new slow queries; V1 re-optimizes existing ones)
+    reject_near_duplicate_slow_queries = False
+
+    def __init__(self, test_db_path="data/test.db", seed_data_path="data/seed_data.json",
+                 reward_threshold=0.5, model="gpt-4o-mini", max_in_flight=8,
+                 few_shot_strategy="similar", prompt_layout="classic", samples_per_prompt=1,
+                 near_duplicate_threshold=0.85, evaluator_kwargs=None):
+        # evaluator_kwargs: further SQLEvaluator options (reward_metric, reward_basis,
+        # confidence, planner_stats, measure_maintenance, ...)
+        self.evaluator = SQLEvaluator(test_db_path=test_db_path, **(evaluator_kwargs or {}))
+        self.seed_data_path = seed_data_path
+        self.reward_threshold = reward_threshold
+        self.training_examples = []
+        self.successful_optimizations = []
+        # One record per evaluated candidate (accepted or not), for offline re-scoring
+        self.evaluation_log = []
+        # Optional quill.checkpoint.CheckpointLog: accepted examples are appended as they are added
+        self.checkpoint_log = None
+        # Optional quill.checkpoint.EvaluationLog: evaluation records are appended as they are made
+        self.evaluation_log_file = None
+
+        self.model = model
+        # Concurrent LLM requests per iteration (1 = one candidate at a time)
+        self.max_in_flight = max(1, max_in_flight)
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+        # "similar": retrieve the most relevant examples; "random": sample uniformly
+        if few_shot_strategy not in FEW_SHOT_STRATEGIES:
+            raise ValueError(f"few_shot_strategy must be one of {FEW_SHOT_STRATEGIES}, got {few_shot_strategy!r}")
+        self.few_shot_strategy = few_shot_strategy
+
+        # "prefix_stable": static instructions + fixed example block first, so the
+        # provider can cache the prompt prefix (see quill/prompts.py)
+        if prompt_layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"prompt_layout must be one of {PROMPT_LAYOUTS}, got {prompt_layout!r}")
+        self.prompt_layout = prompt_layout
+        self.token_usage = TokenUsage()
+        # Completions requested per optimization prompt (the API's n); each one is a candidate
+        self.samples_per_prompt = max(1, samples_per_prompt)
+
+        self._load_seed_data()
+        self.example_index = ExampleIndex(self.training_examples)
+        self.example_block = default_example_block(self.training_examples)
+        self.example_block_version = 1
+
+        # Running totals behind get_stats(), kept up to date by augment_training_set()
+        self.type_counts = {}
+        self.reward_total = 0.0
+        self.example_fingerprints = set()
+        self.slow_query_fingerprints = set()
+        for example in self.training_examples:
+            self._count_example(example)
+
+        # Near-duplicate detection (quill/minhash.py): candidates whose slow +
+        # optimized query is this similar to an example or an already evaluated
+        # candidate (and, with reject_near_duplicate_slow_queries, whose slow
+        # query is this similar to an example's) are skipped before evaluation.
+        # None disables the check.
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.near_duplicates_skipped = 0
+        self.pair_index = MinHashLSH(threshold=near_duplicate_threshold or 0.85)
+        self.slow_query_index = MinHashLSH(threshold=near_duplicate_threshold or 0.85)
+        self.near_unique_slow_queries = 0
+        for example in self.training_examples:
+            self._index_near_duplicates(example)
+
+    def _load_seed_data(self):
+        with open(self.seed_data_path, 'r') as f:
+            self.training_examples = json.load(f)
+        print(f"Loaded {len(self.training_examples)} seed examples")
+
+    def generate_optimization(self, schema: str, slow_query: str, num_examples: int = 3) -> dict:
+        """
+        Generate an optimized SQL query using LLM with few-shot examples.
+
+        Returns:
+            {
+                "schema": str,
+                "slow_query": str,
+                "fast_query": str,
+                "explanation": str,
+                "optimization_type": str
+            }
+        """
+        return self.generate_optimizations(schema, slow_query, num_examples, n=1)[0]
+
+    def generate_optimizations(self, schema: str, slow_query: str, num_examples: int = 3,
+                               n: int = None) -> List[Dict]:
+        """
+        Request n completions (default: samples_per_prompt) for one optimization
+        prompt, so the prompt's input tokens are paid once. Returns one candidate
+        per distinct parseable completion (duplicates up to literals/formatting
+        and malformed JSON are dropped).
+        """
+        n = n or self.samples_per_prompt
+        if self.prompt_layout == "prefix_stable":
+            prompt = self._build_prefix_stable_prompt(schema, slow_query)
+        else:
+            few_shot_examples = self._get_few_shot_examples(num_examples, schema, slow_query)
+            prompt = self._build_optimization_prompt(schema, slow_query, few_shot_examples)
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are an expert SQL optimizer specializing in performance tuning."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            n=n
+        )
+        self.token_usage.record(response)
+
+        candidates = []
+        seen = set()
+        errors = []
+        for choice in response.choices:
+            try:
+                result = json.loads(choice.message.content)
+            except (TypeError, ValueError) as e:
+                errors.append(e)
+                continue
+            candidate = {
+                "schema": schema,
+                "slow_query": slow_query,
+                "fast_query": result.get("optimized_query"),
+                "explanation": result.get("explanation"),
+                "optimization_type": result.get("optimization_type", "unknown")
+            }
+            if not candidate["fast_query"]:
+                continue
+            key = example_fingerprint(candidate)
+            if key not in seen:
+                seen.add(key)
+                candidates.append(candidate)
+
+        if not candidates and errors:
+            raise errors[0]
+        if not candidates:
+            raise ValueError("No completion contained an optimized query")
+        return candidates
+
+    def _candidate_task(self, base: Dict) -> tuple:
+        """
+        Generation task for one prompt, built from a training example: a
+        (function, *args) tuple whose call returns one candidate or a list of them
+        """
+        raise NotImplementedError
+
+    def _generate_concurrently(self, tasks: List[tuple]) -> List[Dict]:
+        """
+        Run (function, *args) generation tasks with up to max_in_flight concurrent
+        LLM requests. Returns the candidates that were generated, in task order
+        (a task may return one candidate or a list of them).
+        """
+        results = [None] * len(tasks)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = {pool.submit(task[0], *task[1:]): i for i, task in enumerate(tasks)}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[future]] = future.result()
+                    print(f"  [{done}/{len(tasks)}] ✓")
+                except Exception as e:
+                    print(f"  [{done}/{len(tasks)}] ✗ Error: {e}")
+        candidates = []
+        for result in results:
+            if isinstance(result, list):
+                candidates.extend(result)
+            elif result is not None:
+                candidates.append(result)
+        return candidates
+
+    def _get_few_shot_examples(self, num_examples: int = 3, schema: str = None, slow_query: str = "",
+                               pool: int = None) -> List[Dict]:
+        """
+        Pick few-shot examples for a prompt: the most similar to the schema/slow
+        query (few_shot_strategy="similar"), or a random sample ("random").
+        Examples with the same slow query are never shown for that query.
+        """
+        if len(self.training_examples) <= num_examples:
+            return self.training_examples
+        if self.few_shot_strategy == "similar" and schema is not None:
+            return self.example_index.top_k(
+                schema, slow_query, num_examples, pool=pool,
+                exclude_fingerprint=fingerprint(slow_query) if slow_query else None
+            )
+        return random.sample(self.training_examples, num_examples)
+
+    def _build_optimization_prompt(self, schema: str, slow_query: str, examples: List[Dict]) -> str:
+        """Build prompt with few-shot examples for SQL optimization"""
+
+        examples_text = self._format_examples(examples)
+
+        prompt = f"""You are optimizing SQL queries for performance. Learn from these examples:
+
+{examples_text}
+
+Now optimize this query:
+
+Schema:
+{schema}
+
+Slow Query:
+{slow_query}
+
+Generate an optimized version of this query. Apply techniques like:
+- Adding indexes (CREATE INDEX IF NOT EXISTS)
+- Replacing subqueries with JOINs
+- Using IN instead of multiple ORs
+- Adding LIMIT when appropriate
+- Composite indexes for multi-column filters
+- Avoiding functions in WHERE clauses
+
+Respond in this exact JSON format:
+{{
+    "optimized_query": "The optimized SQL query (can include CREATE INDEX statements before the SELECT)",
+    "explanation": "Brief explanation of the optimization (1-2 sentences)",
+    "optimization_type": "indexing|join|projection|limit|redundancy"
+}}
+
+Make sure the optimized query produces the same results as the original.
+"""
+        return prompt
+
+    def _format_examples(self, examples: List[Dict]) -> str:
+        examples_text = ""
+        for i, ex in enumerate(examples, 1):
+            examples_text += f"""
+Example {i}:
+Schema: {ex['schema']}
+Slow Query: {ex['slow_query']}
+Optimized Query: {ex['fast_query']}
+Explanation: {ex['explanation']}
+Type: {ex['optimization_type']}
+"""
+        return examples_text
+
+    def _build_prefix_stable_prompt(self, schema: str, slow_query: str) -> str:
+        """
+        Same instructions as _build_optimization_prompt, reordered so everything
+        before "Now optimize this query" is identical across calls until the
+        example block changes.
+        """
+        examples_text = self._format_examples(self.example_block)
+
+        prompt = f"""You are optimizing SQL queries for performance. Learn from these examples (example set v{self.example_block_version}):
+
+{examples_text}
+
+Optimize the query given at the end. Apply techniques like:
+- Adding indexes (CREATE INDEX IF NOT EXISTS)
+- Replacing subqueries with JOINs
+- Using IN instead of multiple ORs
+- Adding LIMIT when appropriate
+- Composite indexes for multi-column filters
+- Avoiding functions in WHERE clauses
+
+Respond in this exact JSON format:
+{{
+    "optimized_query": "The optimized SQL query (can include CREATE INDEX statements before the SELECT)",
+    "explanation": "Brief explanation of the optimization (1-2 sentences)",
+    "optimization_type": "indexing|join|projection|limit|redundancy"
+}}
+
+Make sure the optimized query produces the same results as the original.
+
+Now optimize this query:
+
+Schema:
+{schema}
+
+Slow Query:
+{slow_query}
+"""
+        return prompt
+
+    def set_example_block(self, examples: List[Dict]):
+        """Replace the fixed examples of the prefix-stable layout (bumps the block version)"""
+        self.example_block = list(examples)
+        self.example_block_version += 1
+
+    def get_token_usage(self) -> Dict:
+        """API token totals so far, with cached vs uncached input tokens and the cache hit rate"""
+        usage = self.token_usage.summary()
+        usage['prompt_layout'] = self.prompt_layout
+        usage['example_block_version'] = self.example_block_version
+        return usage
+
+    @staticmethod
+    def _pair_text(example: Dict) -> str:
+        return f"{example.get('slow_query') or ''};\n{example.get('fast_query') or ''}"
+
+    def _index_near_duplicates(self, example: Dict):
+        """Add a training example to the near-duplicate indexes"""
+        self.pair_index.insert(example_fingerprint(example), self._pair_text(example))
+        slow_query = example.get('slow_query') or ''
+        signature = self.slow_query_index.signature(slow_query)
+        if self.slow_query_index.nearest(signature=signature) is None:
+            self.near_unique_slow_queries += 1
+        self.slow_query_index.insert(fingerprint(slow_query), signature=signature)
+
+    def _check_slow_query(self, candidate: Dict) -> str:
+        """
+        Why the candidate's slow query is too close to an existing example's,
+        or None (only with reject_near_duplicate_slow_queries). The caller
+        counts the skip in near_duplicates_skipped.
+        """
+        if not (self.near_duplicate_threshold and self.reject_near_duplicate_slow_queries):
+            return None
+        match = self.slow_query_index.nearest(candidate.get('slow_query') or '')
+        if match is None:
+            return None
+        return f"Slow query {match[1]:.0%} similar to an existing example's"
+
+    def _check_near_duplicate(self, candidate: Dict, check_slow_query: bool = True) -> str:
+        """
+        Why the candidate should be skipped as a near-duplicate, or None. A
+        candidate that passes is indexed, so a near-identical one generated
+        later (e.g. in the same batch) is not evaluated as well.
+
+        check_slow_query=False leaves out _check_slow_query(), for a caller
+        that checked it earlier (the pipeline checks once per generation task,
+        since accepting one completion indexes the slow query its siblings share).
+        """
+        if not self.near_duplicate_threshold:
+            return None
+        if check_slow_query:
+            reason = self._check_slow_query(candidate)
+            if reason:
+                self.near_duplicates_skipped += 1
+                return reason
+        signature = self.pair_index.signature(self._pair_text(candidate))
+        match = self.pair_index.nearest(signature=signature)
+        if match is not None:
+            self.near_duplicates_skipped += 1
+            return f"{match[1]:.0%} similar to an existing example or earlier candidate"
+        self.pair_index.insert(example_fingerprint(candidate), signature=signature)
+        return None
+
+    def evaluate_and_filter(self, candidates: List[Dict], num_runs: int = 3, timeout_seconds: int = 10) -> List[Dict]:
+        """Evaluate candidates and filter by reward threshold"""
+        successful = []
+        # Same slow + optimized query up to literals/formatting: nothing new to learn
+        seen = set()
+
+        for i, candidate in enumerate(candidates):
+            key = example_fingerprint(candidate)
+            if key in seen or key in self.example_fingerprints:
+                print(f"[{i+1}/{len(candidates)}] ⏭️  Duplicate of an existing example, skipped")
+                continue
+            seen.add(key)
+            reason = self._check_near_duplicate(candidate)
+            if reason:
+                print(f"[{i+1}/{len(candidates)}] ⏭️  Near-duplicate skipped: {reason}")
+                continue
+
+            if self.evaluate_candidate(candidate, num_runs, timeout_seconds, label=f"[{i+1}/{len(candidates)}]"):
+                successful.append(candidate)
+
+        return successful
+
+    def evaluate_candidate(self, candidate: Dict, num_runs: int = 3, timeout_seconds: int = 10,
+                           label: str = "") -> bool:
+        """Evaluate one candidate, record it, and annotate it with its timings if accepted"""
+        result = self.evaluator.evaluate_query(
+            schema=candidate['schema'],
+            original_query=candidate['slow_query'],
+            optimized_query=candidate['fast_query'],
+            num_runs=num_runs,
+            timeout_seconds=timeout_seconds
+        )
+
+        accepted = result['success'] and result['reward'] >= self.reward_threshold
+        record = evaluation_record(candidate, result, accepted)
+        self.evaluation_log.append(record)
+        if self.evaluation_log_file is not None:
+            self.evaluation_log_file.log_evaluation(record)
+
+        if accepted:
+            speedup = result['speedup']
+            reward = result['reward']
+            print(f"{label} Evaluating candidate... ✅ {speedup:.2f}x speedup, reward: {reward:.2f}")
+
+            candidate['speedup'] = speedup
+            candidate['reward'] = reward
+            candidate['original_time'] = result['original_time']
+            candidate['optimized_time'] = result['optimized_time']
+            # Keep the LLM's claimed type, but record what the query plan shows
+            # (an "unknown" plan classification says nothing, so the claim stands)
+            if result.get('verified_optimization_type') not in (None, 'unknown'):
+                candidate['verified_optimization_type'] = result['verified_optimization_type']
+                candidate['plan_changes'] = result['plan_diff']['changes']
+        else:
+            error = result.get('error', 'Low reward')
+            print(f"{label} Evaluating candidate... ❌ {error}")
+
+        return accepted
+
+    def augment_training_set(self, new_examples: List[Dict]):
+        """Add successful optimizations to training set"""
+        for example in new_examples:
+            if 'id' not in example:
+                example['id'] = len(self.training_examples) + 1
+            if 'description' not in example:
+                opt_type = example.get('optimization_type', 'optimization')
+                example['description'] = f"Generated {opt_type} optimization"
+
+        self.training_examples.extend(new_examples)
+        self.successful_optimizations.extend(new_examples)
+        for example in new_examples:
+            self._count_example(example)
+            self.reward_total += example.get('reward', 0)
+            self.example_index.add(example)
+            self._index_near_duplicates(example)
+            if self.checkpoint_log is not None:
+                self.checkpoint_log.log_example(example)
+        print(f"Added {len(new_examples)} new examples (total: {len(self.training_examples)})")
+
+    def _count_example(self, example: Dict):
+        """Add one training example to the running get_stats() totals"""
+        opt_type = effective_optimization_type(example)
+        self.type_counts[opt_type] = self.type_counts.get(opt_type, 0) + 1
+        self.example_fingerprints.add(example_fingerprint(example))
+        self.slow_query_fingerprints.add(fingerprint(example.get('slow_query', '')))
+
+    def save_training_data(self, output_path: str, clean_format=True):
+        """Save augmented training data"""
+        data_to_save = self.training_examples
+
+        if clean_format:
+            data_to_save = []
+            for ex in self.training_examples:
+                clean_ex = {
+                    'id': ex.get('id'),
+                    'description': ex.get('description'),
+                    'schema': ex.get('schema'),
+                    'slow_query': ex.get('slow_query'),
+                    'fast_query': ex.get('fast_query'),
+                    'explanation': ex.get('explanation'),
+                    'optimization_type': ex.get('optimization_type'),
+                    'verified_optimization_type': ex.get('verified_optimization_type')
+                }
+                data_to_save.append(clean_ex)
+
+        with open(output_path, 'w') as f:
+            json.dump(data_to_save, f, indent=2)
+        print(f"Saved {len(data_to_save)} examples to {output_path}")
+
+    def get_stats(self) -> Dict:
+        """Get training statistics (from running totals, so cheap to call every iteration)"""
+        total = len(self.training_examples)
+
+        avg_reward = 0
+        if self.successful_optimizations:
+            avg_reward = self.reward_total / len(self.successful_optimizations)
+
+        return {
+            'total_examples': total,
+            'seed_examples': total - len(self.successful_optimizations),
+            'generated_examples': len(self.successful_optimizations),
+            'by_type': dict(self.type_counts),
+            'avg_reward': avg_reward,
+            'near_duplicates_skipped': self.near_duplicates_skipped
+        }
+
+    def restem_iteration(self, num_candidates: int = 5, num_runs: int = 3, timeout_seconds: int = 10):
+        """
+        Run one ReSTEM iteration:
+        1. Generate candidates (see _candidate_task)
+        2. Evaluate and filter
+        3. Add successful ones to training set
+
+        num_candidates is the number of generation prompts; with
+        samples_per_prompt > 1 each can yield several candidates.
+        Returns (accepted, generated) candidate counts.
+        """
+        print(f"\n{'='*70}")
+        print(f"{self.name} Iteration - Generating {num_candidates} candidates")
+        print(f"{'='*70}\n")
+
+        # Random existing examples to base the new candidates on
+        base_examples = random.sample(self.training_examples, min(num_candidates, len(self.training_examples)))
+
+        print(f"Generating {len(base_examples)} candidates ({self.max_in_flight} in flight)...")
+        candidates = self._generate_concurrently([self._candidate_task(base) for base in base_examples])
+
+        if not candidates:
+            print("No candidates generated.")
+            return 0, 0
+
+        print(f"\nGenerated {len(candidates)} candidates. Evaluating...\n")
+        successful = self.evaluate_and_filter(candidates, num_runs, timeout_seconds)
+
+        if successful:
+            self.augment_training_set(successful)
+
+        return len(successful), len(candidates)
+
+    def restem_pipeline(self, num_candidates: int = 5, num_runs: int = 3, timeout_seconds: int = 10,
+                        queue_size: int = 8, num_evaluators: int = 1):
+        """
+        Streaming variant of restem_iteration: candidates are evaluated as soon as
+        they are generated and accepted ones join the few-shot pool immediately.
+        See quill.pipeline.run_pipeline. Returns (accepted, generated) candidate counts.
+        """
+        print(f"\n{'='*70}")
+        print(f"{self.name} Pipeline - Streaming {num_candidates} candidates")
+        print(f"{'='*70}\n")
+
+        stats = run_pipeline(self, num_candidates, num_runs=num_runs, timeout_seconds=timeout_seconds,
+                             queue_size=queue_size, num_evaluators=num_evaluators)
+        print(f"\nGenerated {stats['generated']}, evaluated {stats['evaluated']}, accepted {stats['accepted']} "
+              f"(generation waited {stats['generation_stall_seconds']:.1f}s for queue room)")
+
+        return stats['accepted'], stats['generated']
@@ -0,0 +1,170 @@
+"""
+Few-shot example retrieval.
+
+A small incremental TF-IDF index over training examples. Each example is
+described by sparse terms: the tables in its schema, the tables its slow
+query touches, the SQL constructs it uses (JOIN, GROUP BY, subqueries,
+SELECT *, functions, ...) and word bigrams of its normalized (fingerprint)
+text. Retrieval scores candidates through an inverted index (postings kept
+in growable NumPy arrays), so only examples sharing a term with the query
+are looked at, and each term is scored in one vectorized step.
+"""
+
+import math
+import random
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+from quill.fingerprint import fingerprint, normalize_query
+from quill.sql_tokens import referenced_tables, split_statements, table_names
+
+# Constructs worth matching on (everything else is too common to tell examples apart)
+CONSTRUCT_KEYWORDS = {"JOIN", "LEFT", "GROUP", "HAVING", "ORDER", "DISTINCT", "LIKE", "IN", "EXISTS",
+                      "LIMIT", "OFFSET", "UNION", "CASE", "BETWEEN", "OR", "OVER", "WITH", "INDEX"}
+
+# Terms present in more than this share of examples are ignored at query time
+MAX_DOCUMENT_FREQUENCY = 0.5
+
+
+def example_terms(schema: str, query: str = "") -> Counter:
+    """Sparse term counts describing a schema and (optionally) a query on it"""
+    terms = Counter(f"schema:{name.lower()}" for name in table_names(schema or ""))
+    if not query:
+        return terms
+
+    terms.update(f"table:{name}" for name in referenced_tables(query))
+    selects = 0
+    for statement in split_statements(query):
+        significant = statement.significant()
+        for i, token in enumerate(significant):
+            if token.kind == "keyword":
+                if token.upper == "SELECT":
+                    selects += 1
+                    following = significant[i + 1] if i + 1 < len(significant) else None
+                    if following is not None and following.value == "*":
+                        terms["sql:SELECT *"] += 1
+                elif token.upper in CONSTRUCT_KEYWORDS:
+                    terms[f"sql:{token.upper}"] += 1
+            elif (token.kind == "identifier" and i + 1 < len(significant)
+                  and significant[i + 1].value == "("):
+                terms[f"fn:{token.value.lower()}"] += 1
+    if selects > 1:
+        terms["sql:SUBQUERY"] += selects - 1
+
+    words = normalize_query(query).split()
+    terms.update(f"ngram:{a} {b}" for a, b in zip(words, words[1:]))
+    return terms
+
+
+class _Postings:
+    """Append-only (example position, weight) arrays for one term"""
+
+    __slots__ = ("positions", "weights", "size")
+
+    def __init__(self):
+        self.positions = np.empty(8, dtype=np.int64)
+        self.weights = np.empty(8, dtype=np.float64)
+        self.size = 0
+
+    def append(self, position: int, weight: float):
+        if self.size == len(self.positions):
+            self.positions = np.resize(self.positions, 2 * self.size)
+            self.weights = np.resize(self.weights, 2 * self.size)
+        self.positions[self.size] = position
+        self.weights[self.size] = weight
+        self.size += 1
+
+
+class ExampleIndex:
+    """Incremental TF-IDF index of training examples, keyed on schema and slow query"""
+
+    def __init__(self, examples: List[Dict] = ()):
+        self.examples = []
+        self._fingerprints = []
+        self._by_fingerprint = defaultdict(list)  # slow-query fingerprint -> positions
+        self._postings = defaultdict(_Postings)  # term -> positions and normalized tf
+        self._lock = threading.Lock()
+        for example in examples:
+            self.add(example)
+
+    def __len__(self):
+        return len(self.examples)
+
+    def add(self, example: Dict):
+        """Index one example (O(terms in the example))"""
+        terms = example_terms(example.get("schema", ""), example.get("slow_query", ""))
+        norm = math.sqrt(sum(count * count for count in terms.values())) or 1.0
+        slow_fingerprint = fingerprint(example.get("slow_query") or "")
+
+        with self._lock:
+            position = len(self.examples)
+            self.examples.append(example)
+            self._fingerprints.append(slow_fingerprint)
+            self._by_fingerprint[slow_fingerprint].append(position)
+            for term, count in terms.items():
+                self._postings[term].append(position, count / norm)
+
+    def top_k(self, schema: str, query: str = "", k: int = 3, pool: int = None,
+              exclude_fingerprint: str = None) -> List[Dict]:
+        """
+        The k examples most similar to the schema/query, best first (at most one
+        per distinct slow query).
+
+        With pool > k, k examples are sampled from the `pool` best instead (in no
+        particular order), which keeps prompts varied when many examples are
+        equally relevant. Examples whose slow query has exclude_fingerprint are
+        skipped. Falls back to random examples when fewer than k share a term.
+        """
+        terms = example_terms(schema, query)
+        size = max(k, pool or k)
+
+        with self._lock:
+            total = len(self.examples)
+            if total == 0:
+                return []
+
+            scores = np.zeros(total)
+            for term, count in terms.items():
+                postings = self._postings.get(term)
+                if postings is None or postings.size > MAX_DOCUMENT_FREQUENCY * total and total > 1:
+                    continue
+                idf = math.log((1 + total) / (1 + postings.size)) + 1.0
+                # Positions are unique within a term, so plain fancy-index += is safe
+                scores[postings.positions[:postings.size]] += count * idf * idf * postings.weights[:postings.size]
+
+            if exclude_fingerprint in self._by_fingerprint:
+                scores[self._by_fingerprint[exclude_fingerprint]] = 0.0
+
+            # Rank a few extra so repeats of one query can be skipped; random
+            # tie-breaking so equally similar examples rotate
+            matched = np.flatnonzero(scores)
+            shortlist = 4 * size
+            if len(matched) > shortlist:
+                jittered = scores[matched] + np.random.random(len(matched)) * 1e-9
+                top = np.argpartition(-jittered, shortlist - 1)[:shortlist]
+                matched = matched[top[np.argsort(-jittered[top])]]
+            else:
+                matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+            best = []
+            shown = set()
+            for position in matched:
+                if self._fingerprints[position] not in shown:
+                    shown.add(self._fingerprints[position])
+                    best.append(int(position))
+                    if len(best) == size:
+                        break
+
+            # Top up with random examples when too few share a term with the query
+            for _ in range(4 * (k - len(best))):
+                if len(best) >= k:
+                    break
+                position = random.randrange(total)
+                if self._fingerprints[position] not in shown and self._fingerprints[position] != exclude_fingerprint:
+                    shown.add(self._fingerprints[position])
+                    best.append(position)
+            chosen = random.sample(best, min(k, len(best))) if size > k else best[:k]
+            return [self.examples[p] for p in chosen]
@@ -0,0 +1,153 @@
+"""
+Vectorized scoring helpers (NumPy).
+
+Bootstrap confidence bounds on speedups from raw timing samples, so rewards can
+be based on a speedup that is robust to timing noise rather than on a single
+averaged ratio; and offline re-scoring of stored evaluation records, so a new
+reward curve or threshold can be applied to a whole historical run at once.
+"""
+
+import warnings
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Percentile used for each timing statistic the evaluator can reward on
+STATISTIC_PERCENTILES = {"p50": 50, "p95": 95, "p99": 99}
+
+# Fewest timing samples per query for a meaningful bootstrap bound. With n
+# samples there are only C(2n-1, n) distinct resamples (10 at n=3, 126 at n=5),
+# so below this the "lower bound" is little more than the worst sample ratio
+MIN_BOOTSTRAP_SAMPLES = 10
+
+
+def _resampled_statistic(samples: np.ndarray, indices: np.ndarray, statistic: str) -> np.ndarray:
+    resampled = samples[indices]  # (resamples, n)
+    if statistic in STATISTIC_PERCENTILES:
+        return np.percentile(resampled, STATISTIC_PERCENTILES[statistic], axis=1)
+    return resampled.mean(axis=1)
+
+
+def bootstrap_speedup_interval(original_samples: Sequence[float],
+                               optimized_samples: Sequence[float],
+                               statistic: str = "mean",
+                               confidence: float = 0.95,
+                               resamples: int = 2000,
+                               seed: int = 0) -> Tuple[float, float]:
+    """
+    One-sided bootstrap bounds on speedup = statistic(original) / statistic(optimized).
+
+    Both sample sets are resampled with replacement `resamples` times in a single
+    vectorized draw. Returns (lower, upper): the speedup is above `lower` with
+    the given confidence, and below `upper` with the same confidence.
+    statistic is "mean", "p50", "p95" or "p99" (anything else is treated as mean).
+    Needs MIN_BOOTSTRAP_SAMPLES (10) or more samples per side to mean much.
+    """
+    original = np.asarray(original_samples, dtype=float)
+    optimized = np.asarray(optimized_samples, dtype=float)
+
+    rng = np.random.default_rng(seed)
+    original_idx = rng.integers(0, len(original), size=(resamples, len(original)))
+    optimized_idx = rng.integers(0, len(optimized), size=(resamples, len(optimized)))
+
+    original_stat = _resampled_statistic(original, original_idx, statistic)
+    optimized_stat = _resampled_statistic(optimized, optimized_idx, statistic)
+    ratios = original_stat / np.maximum(optimized_stat, np.finfo(float).tiny)
+
+    alpha = 1.0 - confidence
+    lower, upper = np.quantile(ratios, [alpha, 1.0 - alpha])
+    return float(lower), float(upper)
+
+
+def speedup_rewards(speedups) -> np.ndarray:
+    """Vectorized SQLEvaluator._speedup_reward over an array of speedups"""
+    speedups = np.asarray(speedups, dtype=float)
+    log_reward = 0.3 + np.log10(np.maximum(speedups, 2.0)) / 3.5
+    return np.select(
+        [speedups >= 2.0, speedups >= 1.5, speedups >= 1.1],
+        [np.minimum(1.0, log_reward), 0.25 + (speedups - 1.5) * 0.4, 0.15],
+        default=0.0
+    )
+
+
+def timing_statistic(sample_lists: Sequence[Sequence[float]], statistic: str = "mean") -> np.ndarray:
+    """
+    Apply a timing statistic to each sample list at once.
+
+    Lists may have different lengths (they are NaN-padded); empty or missing
+    lists give NaN. Percentiles interpolate linearly, like the evaluator's.
+    """
+    width = max((len(samples) for samples in sample_lists if samples), default=1)
+    padded = np.full((len(sample_lists), width), np.nan)
+    for row, samples in enumerate(sample_lists):
+        if samples:
+            padded[row, :len(samples)] = samples
+
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+        if statistic in STATISTIC_PERCENTILES:
+            return np.nanpercentile(padded, STATISTIC_PERCENTILES[statistic], axis=1)
+        return np.nanmean(padded, axis=1)
+
+
+def rescore_records(records: List[Dict], reward_threshold: float = 0.5, metric: str = "mean",
+                    basis: str = "point", confidence: float = 0.95, resamples: int = 2000) -> Dict:
+    """
+    Recompute speedups, rewards and acceptance for stored evaluation records
+    (see quill.evaluator.evaluation_record) from their raw timing samples.
+
+    metric is "mean", "p50", "p95", "p99" or "first_row" (mean time to first
+    row); basis is "point" or "lower_bound" (bootstrap lower bound, per record).
+    Records that failed (error, result mismatch) or lack the samples for the
+    chosen metric keep reward 0 and are never accepted. Stored reward
+    adjustments (readability bonus, memory/storage penalties) are re-applied.
+
+    Returns {"speedups", "rewards", "accepted"} arrays aligned with records and
+    a "summary" comparing the new acceptance with the stored one.
+    """
+    if metric == "first_row":
+        original = [r.get("original_first_row_samples") for r in records]
+        optimized = [r.get("optimized_first_row_samples") for r in records]
+        statistic = "mean"
+    else:
+        original = [r.get("original_samples") for r in records]
+        optimized = [r.get("optimized_samples") for r in records]
+        statistic = metric
+
+    succeeded = np.array([bool(r.get("success")) for r in records], dtype=bool)
+    has_samples = np.array([bool(o) and bool(n) for o, n in zip(original, optimized)], dtype=bool)
+    scorable = succeeded & has_samples
+
+    original_stat = timing_statistic(original, statistic)
+    optimized_stat = timing_statistic(optimized, statistic)
+    with np.errstate(all="ignore"):
+        speedups = np.where(optimized_stat > 0, original_stat / optimized_stat, 1.0)
+    speedups = np.where(scorable, speedups, np.nan)
+
+    if basis == "lower_bound":
+        basis_speedups = np.full(len(records), np.nan)
+        for i in np.flatnonzero(scorable):
+            basis_speedups[i], _ = bootstrap_speedup_interval(
+                original[i], optimized[i], statistic=statistic,
+                confidence=confidence, resamples=resamples
+            )
+    else:
+        basis_speedups = speedups
+
+    adjustments = np.array([r.get("reward_adjustment") or 0.0 for r in records], dtype=float)
+    rewards = np.clip(speedup_rewards(np.nan_to_num(basis_speedups)) + adjustments, 0.0, 1.0)
+    rewards = np.where(scorable, rewards, 0.0)
+    accepted = scorable & (rewards >= reward_threshold)
+
+    previously_accepted = np.array([bool(r.get("accepted")) for r in records], dtype=bool)
+    summary = {
+        "records": len(records),
+        "scorable": int(scorable.sum()),
+        "previously_accepted": int(previously_accepted.sum()),
+        "accepted": int(accepted.sum()),
+        "newly_accepted": int((accepted & ~previously_accepted).sum()),
+        "newly_rejected": int((previously_accepted & ~accepted).sum()),
+        "avg_reward_accepted": float(rewards[accepted].mean()) if accepted.any() else 0.0,
+        "median_speedup": float(np.nanmedian(speedups)) if scorable.any() else None
+    }
+    return {"speedups": speedups, "rewards": rewards, "accepted": accepted, "summary": summary}
@@ -0,0 +1,371 @@
+"""
+SQL tokenizer and statement splitter.
+
+One lossless pass over the SQL text (joining token values gives back the
+input), aware of string literals, quoted identifiers, comments and trigger
+bodies, so a ';' inside any of them never ends a statement. Parses are
+cached in a small LRU keyed by a hash of the text: the evaluator, the
+optimizers and the dataset scripts see the same queries over and over.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<whitespace>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>[xX]?'(?:[^']|'')*(?:'|\Z))
+  | (?P<quoted_identifier>"(?:[^"]|"")*(?:"|\Z)|`(?:[^`]|``)*(?:`|\Z)|\[[^\]]*(?:\]|\Z))
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<parameter>\?\d*|[:@$][A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<operator>\|\||<<|>>|<=|>=|==|!=|<>|->>|->|[-+*/%<>=~&|])
+  | (?P<punctuation>[(),;.])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Reserved words are classified as keywords; every other word is an identifier
+# (type names like TEXT or TIMESTAMP double as column names in practice)
+KEYWORDS = frozenset("""
+    ABORT ADD ALL ALTER ANALYZE AND AS ASC ATTACH AUTOINCREMENT BEFORE BEGIN BETWEEN BY
+    CASCADE CASE CAST CHECK COLLATE COLUMN COMMIT CONFLICT CONSTRAINT CREATE CROSS
+    CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP DEFAULT DEFERRABLE DELETE DESC DETACH
+    DISTINCT DO DROP EACH ELSE END ESCAPE EXCEPT EXISTS EXPLAIN FILTER FOR FOREIGN FROM
+    FULL GLOB GROUP HAVING IF IGNORE IN INDEX INDEXED INNER INSERT INSTEAD INTERSECT INTO
+    IS ISNULL JOIN KEY LEFT LIKE LIMIT MATCH MATERIALIZED NATURAL NO NOT NOTHING NOTNULL
+    NULL NULLS OF OFFSET ON OR ORDER OUTER OVER PARTITION PLAN PRAGMA PRIMARY QUERY
+    RECURSIVE REFERENCES REGEXP REINDEX RELEASE RENAME REPLACE RESTRICT RETURNING RIGHT
+    ROLLBACK SAVEPOINT SELECT SET TABLE TEMP TEMPORARY THEN TO TRANSACTION TRIGGER UNION
+    UNIQUE UPDATE USING VACUUM VALUES VIEW VIRTUAL WHEN WHERE WINDOW WITH WITHOUT
+""".split())
+
+# Whitespace and comments don't change what a statement means
+INSIGNIFICANT = ("whitespace", "comment")
+
+# Words after which the next name is a table
+TABLE_CONTEXT = {"FROM", "JOIN", "INTO", "UPDATE", "TABLE"}
+
+CACHE_SIZE = 4096
+
+
+class Token(NamedTuple):
+    kind: str    # keyword, identifier, quoted_identifier, string, number, parameter,
+                 # operator, punctuation, comment, whitespace or other
+    value: str
+    start: int   # Offset into the source text
+
+    @property
+    def upper(self) -> str:
+        return self.value.upper()
+
+    @property
+    def name(self) -> str:
+        """Identifier name with any quoting removed"""
+        if self.kind == "quoted_identifier":
+            quote = self.value[0]
+            inner = self.value[1:-1]
+            return inner if quote == "[" else inner.replace(quote * 2, quote)
+        return self.value
+
+
+class Statement:
+    """One SQL statement: its text (without the trailing ';'), tokens and kind"""
+
+    __slots__ = ("text", "tokens", "kind")
+
+    def __init__(self, text: str, tokens: Tuple[Token, ...]):
+        self.text = text
+        self.tokens = tokens
+        self.kind = statement_kind(tokens)
+
+    @property
+    def is_query(self) -> bool:
+        """True for statements that return rows to time (SELECT, including WITH ... SELECT)"""
+        return self.kind == "SELECT"
+
+    def significant(self) -> List[Token]:
+        return [t for t in self.tokens if t.kind not in INSIGNIFICANT]
+
+    def keywords(self) -> List[str]:
+        return [t.upper for t in self.tokens if t.kind == "keyword"]
+
+    def __repr__(self):
+        return f"Statement({self.kind}, {self.text!r})"
+
+
+class _ParseCache:
+    """Thread-safe LRU of parse results keyed by a digest of the SQL text"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+_cache = _ParseCache()
+
+
+def _digest(sql: str) -> bytes:
+    return hashlib.blake2b(sql.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _tokenize(sql: str) -> Tuple[Token, ...]:
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "word":
+            kind = "keyword" if value.upper() in KEYWORDS else "identifier"
+        tokens.append(Token(kind, value, match.start()))
+    return tuple(tokens)
+
+
+def tokenize(sql: str) -> Tuple[Token, ...]:
+    """Tokenize SQL text (cached). Joining the token values gives back the input."""
+    return _cache.get((_digest(sql), "tokens"), lambda: _tokenize(sql))
+
+
+def _split(sql: str) -> Tuple[Statement, ...]:
+    statements = []
+    current = []
+    trigger = False      # Inside CREATE TRIGGER: ';' only ends it after BEGIN ... END
+    in_body = False
+    case_depth = 0
+
+    def flush():
+        significant = [i for i, t in enumerate(current) if t.kind not in INSIGNIFICANT]
+        if significant:
+            # Drop leading comments/whitespace and trailing whitespace, keep inner comments
+            first = significant[0]
+            last = len(current) - 1
+            while current[last].kind == "whitespace":
+                last -= 1
+            body = tuple(current[first:last + 1])
+            text = sql[body[0].start:body[-1].start + len(body[-1].value)]
+            statements.append(Statement(text, body))
+        current.clear()
+
+    for token in tokenize(sql):
+        if token.kind == "punctuation" and token.value == ";" and not in_body:
+            flush()
+            trigger = in_body = False
+            case_depth = 0
+            continue
+
+        current.append(token)
+        if token.kind != "keyword":
+            continue
+
+        word = token.upper
+        if word == "TRIGGER" and not trigger and _leading_words(current)[:1] == ["CREATE"]:
+            trigger = True
+        elif trigger and word == "BEGIN":
+            in_body = True
+        elif in_body and word == "CASE":
+            case_depth += 1
+        elif in_body and word == "END":
+            if case_depth:
+                case_depth -= 1
+            else:
+                in_body = False
+
+    flush()
+    return tuple(statements)
+
+
+def split_statements(sql: str) -> Tuple[Statement, ...]:
+    """Split SQL text into statements (cached); empty statements are dropped"""
+    return _cache.get((_digest(sql), "statements"), lambda: _split(sql))
+
+
+def _leading_words(tokens) -> List[str]:
+    return [t.upper for t in tokens if t.kind in ("keyword", "identifier")][:4]
+
+
+def statement_kind(tokens) -> str:
+    """
+    The statement's verb: SELECT, INSERT, CREATE TABLE, CREATE INDEX, ...
+
+    A WITH clause is skipped, so WITH ... SELECT is a SELECT and
+    WITH ... INSERT an INSERT. Returns "" for statements without a verb.
+    """
+    significant = [t for t in tokens if t.kind not in INSIGNIFICANT]
+    if not significant:
+        return ""
+
+    position = 0
+    if significant[0].upper == "WITH":
+        # Skip "name [(columns)] AS [NOT] [MATERIALIZED] (...)" definitions at depth 0
+        depth = 0
+        for position, token in enumerate(significant[1:], start=1):
+            if token.value == "(":
+                depth += 1
+            elif token.value == ")":
+                depth -= 1
+            elif depth == 0 and token.kind == "keyword" and token.upper in (
+                    "SELECT", "VALUES", "INSERT", "REPLACE", "UPDATE", "DELETE"):
+                break
+        else:
+            return "WITH"
+
+    verb = significant[position].upper
+    if verb == "VALUES":
+        return "SELECT"
+    if verb == "CREATE":
+        # CREATE [TEMP] [UNIQUE|VIRTUAL] TABLE/INDEX/VIEW/TRIGGER
+        for token in significant[position + 1:position + 4]:
+            if token.upper in ("TABLE", "INDEX", "VIEW", "TRIGGER"):
+                return f"CREATE {token.upper}"
+    return verb
+
+
+def table_names(sql: str) -> List[str]:
+    """Names of the tables created by CREATE [VIRTUAL] TABLE statements, in order"""
+    names = []
+    for statement in split_statements(sql):
+        if statement.kind != "CREATE TABLE":
+            continue
+        significant = statement.significant()
+        index = next(i for i, t in enumerate(significant) if t.upper == "TABLE") + 1
+        while index < len(significant) and significant[index].upper in ("IF", "NOT", "EXISTS"):
+            index += 1
+        if index < len(significant):
+            names.append(significant[index].name)
+    return names
+
+
+def referenced_tables(sql: str) -> Set[str]:
+    """
+    Lower-cased names of the tables a query reads or writes: names after
+    FROM / JOIN / INTO / UPDATE / TABLE (plus comma-separated FROM lists) and
+    the table of CREATE INDEX ... ON. Names defined by a WITH clause are excluded.
+    """
+    tables = set()
+    ctes = set()
+    for statement in split_statements(sql):
+        significant = statement.significant()
+        if statement.kind == "CREATE INDEX":
+            on = next((i for i, t in enumerate(significant) if t.upper == "ON"), None)
+            if on is not None and on + 1 < len(significant):
+                tables.add(significant[on + 1].name.lower())
+            continue
+
+        expect_table = False
+        in_from_list = False
+        depth = 0
+        for i, token in enumerate(significant):
+            if token.value == "(":
+                depth += 1
+            elif token.value == ")":
+                depth -= 1
+
+            if token.kind == "keyword":
+                word = token.upper
+                if word in ("IF", "NOT", "EXISTS") and expect_table:
+                    continue
+                expect_table = word in TABLE_CONTEXT
+                in_from_list = word in ("FROM", "JOIN")
+                if word == "AS" and i > 0 and i + 1 < len(significant) and significant[i + 1].value == "(":
+                    ctes.add(significant[i - 1].name.lower())
+                continue
+
+            if token.kind in ("identifier", "quoted_identifier") and expect_table:
+                # schema.table: skip the schema part
+                if i + 2 < len(significant) and significant[i + 1].value == ".":
+                    continue
+                tables.add(token.name.lower())
+                expect_table = False
+            elif token.value == "," and in_from_list:
+                expect_table = True
+            elif token.value != ".":
+                expect_table = False
+
+    return tables - ctes
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """
+    Lower-cased alias -> table name for every `FROM/JOIN table [AS] alias` in
+    the SQL (each table also maps to itself). Query plans name tables by alias.
+    """
+    aliases = {}
+    for statement in split_statements(sql):
+        significant = statement.significant()
+        in_from_list = False
+        for i, token in enumerate(significant):
+            if token.kind == "keyword":
+                in_from_list = token.upper in ("FROM", "JOIN") or (in_from_list and token.upper == "AS")
+                if token.upper not in ("FROM", "JOIN"):
+                    continue
+            elif not (in_from_list and token.value == ","):
+                continue
+
+            position = i + 1
+            if position >= len(significant) or significant[position].kind not in ("identifier", "quoted_identifier"):
+                continue
+            # schema.table: take the table part
+            if position + 2 < len(significant) and significant[position + 1].value == ".":
+                position += 2
+            table = significant[position].name.lower()
+            aliases.setdefault(table, table)
+            position += 1
+            if position < len(significant) and significant[position].upper == "AS":
+                position += 1
+            if position < len(significant) and significant[position].kind in ("identifier", "quoted_identifier"):
+                aliases[significant[position].name.lower()] = table
+    return aliases
+
+
+def added_columns(sql: str) -> Set[str]:
+    """Lower-cased names of the columns added by ALTER TABLE ... ADD [COLUMN] statements"""
+    columns = set()
+    for statement in split_statements(sql):
+        significant = statement.significant()
+        words = [t.upper for t in significant[:2]]
+        if words != ["ALTER", "TABLE"]:
+            continue
+        add = next((i for i, t in enumerate(significant) if t.upper == "ADD"), None)
+        if add is None:
+            continue
+        position = add + 1
+        if position < len(significant) and significant[position].upper == "COLUMN":
+            position += 1
+        if position < len(significant) and significant[position].kind in ("identifier", "quoted_identifier"):
+            columns.add(significant[position].name.lower())
+    return columns
+
+
+def cache_info() -> dict:
+    """Hit/miss counts of the shared parse cache"""
+    return _cache.info()
+
+
+def clear_cache():
+    _cache.clear()
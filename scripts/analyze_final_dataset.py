@@ -2,9 +2,38 @@
 Analyze the final augmented dataset
 """
 
+import sys
+sys.path.insert(0, '..')
+
 import json
 from collections import Counter
 
+from quill.fingerprint import fingerprint
+from quill.sql_tokens import split_statements, table_names
+
+
+def sql_patterns(sql: str) -> set:
+    """Patterns present in the SQL's tokens (string literals and comments don't count)"""
+    found = set()
+    for statement in split_statements(sql):
+        if statement.kind == 'CREATE INDEX':
+            found.add('CREATE INDEX')
+        significant = statement.significant()
+        for i, token in enumerate(significant):
+            word = token.upper if token.kind == 'keyword' else None
+            following = significant[i + 1] if i + 1 < len(significant) else None
+            if word in ('JOIN', 'WHERE', 'DISTINCT'):
+                found.add(word)
+            elif word == 'GROUP' and following is not None and following.upper == 'BY':
+                found.add('GROUP BY')
+            elif word == 'SELECT' and following is not None:
+                # SELECT * / SELECT DISTINCT *
+                if following.upper == 'DISTINCT' and i + 2 < len(significant):
+                    following = significant[i + 2]
+                if following.value == '*':
+                    found.add('SELECT *')
+    return found
+
 def analyze_dataset(path):
     print("=" * 70)
     print(f"Analyzing Dataset: {path}")
@@ -15,9 +44,9 @@ def analyze_dataset(path):
 
     print(f"\n📊 Dataset Size: {len(data)} examples")
 
-    # Unique queries
-    unique_slow = len(set(ex.get('slow_query', '').strip() for ex in data))
-    unique_fast = len(set(ex.get('fast_query', '').strip() for ex in data))
+    # Unique queries (by fingerprint: literal/formatting variants count once)
+    unique_slow = len(set(fingerprint(ex.get('slow_query', '')) for ex in data))
+    unique_fast = len(set(fingerprint(ex.get('fast_query', '')) for ex in data))
 
     print(f"\n🔍 Diversity:")
     print(f"  Unique slow queries: {unique_slow} ({unique_slow/len(data)*100:.1f}%)")
@@ -33,12 +62,8 @@ def analyze_dataset(path):
     # Tables mentioned
     tables_mentioned = Counter()
     for ex in data:
-        schema = ex.get('schema', '').lower()
-        for table in ['users', 'orders', 'posts', 'comments', 'employees',
-                      'events', 'articles', 'tags', 'customers', 'purchases',
-                      'accounts', 'members', 'transactions', 'sales']:
-            if table in schema:
-                tables_mentioned[table] += 1
+        for table in set(name.lower() for name in table_names(ex.get('schema', ''))):
+            tables_mentioned[table] += 1
 
     print(f"\n📋 Tables Represented (top 10):")
     for table, count in tables_mentioned.most_common(10):
@@ -55,10 +80,8 @@ def analyze_dataset(path):
     }
 
     for ex in data:
-        fast_query = ex.get('fast_query', '').upper()
-        for pattern in patterns:
-            if pattern in fast_query:
-                patterns[pattern] += 1
+        for pattern in sql_patterns(ex.get('fast_query', '')):
+            patterns[pattern] += 1
 
     print(f"\n🔧 SQL Patterns in Optimized Queries:")
     for pattern, count in sorted(patterns.items(), key=lambda x: x[1], reverse=True):
@@ -73,8 +96,6 @@ def analyze_dataset(path):
     print("=" * 70)
 
 if __name__ == "__main__":
-    import sys
-
     if len(sys.argv) > 1:
         path = sys.argv[1]
     else:
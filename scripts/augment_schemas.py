@@ -3,10 +3,15 @@ Schema Augmentation - 4x Data Multiplication
 Generates variations with different table/column names
 """
 
+import sys
+sys.path.insert(0, '..')
+
 import json
 import re
 from typing import Dict, List
 
+from quill.sql_tokens import INSIGNIFICANT, tokenize
+
 # Schema name mappings (4 variations per table)
 SCHEMA_VARIANTS = {
     # E-commerce
@@ -77,39 +82,72 @@ COLUMN_VARIANTS = {
 }
 
 
+def _rename_index(name: str, table_mapping: Dict[str, str], column_mapping: Dict[str, str]) -> str:
+    """Fix index names: idx_<table>_<columns> parts are renamed like the objects they name"""
+    mapping = {**column_mapping, **table_mapping}
+    pattern = '|'.join(re.escape(old) for old in sorted(mapping, key=len, reverse=True))
+    return re.sub(rf'(?<=_)(?:{pattern})(?=_|$)', lambda m: mapping[m.group(0)], name)
+
+
 def apply_schema_mapping(text: str, table_mapping: Dict[str, str], column_mapping: Dict[str, str]) -> str:
-    """Apply table and column name mappings to SQL text"""
-
-    # Replace table names (case-insensitive, word boundaries)
-    for old_table, new_table in table_mapping.items():
-        # Match table names in various contexts
-        patterns = [
-            (rf'\bFROM\s+{old_table}\b', f'FROM {new_table}'),
-            (rf'\bJOIN\s+{old_table}\b', f'JOIN {new_table}'),
-            (rf'\b{old_table}\s+\w+\s+ON\b', lambda m: m.group(0).replace(old_table, new_table)),
-            (rf'\bON\s+{old_table}(\.\w+)', f'ON {new_table}\\1'),
-            (rf'\b{old_table}\.', f'{new_table}.'),
-            (rf'\bCREATE\s+TABLE\s+{old_table}\b', f'CREATE TABLE {new_table}'),
-            (rf'\bINTO\s+{old_table}\b', f'INTO {new_table}'),
-            (rf'idx_{old_table}_', f'idx_{new_table}_'),  # Fix index names
-        ]
-
-        for pattern, replacement in patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-
-    # Replace column names
-    for old_col, new_col in column_mapping.items():
-        # Match column names in various contexts
-        patterns = [
-            (rf'\b{old_col}\b(?!\s*\()', new_col),  # Not followed by ( to avoid function names
-            (rf'\({old_col}\)', f'({new_col})'),
-            (rf'idx_\w*_{old_col}', lambda m: m.group(0).replace(old_col, new_col)),
-        ]
-
-        for pattern, replacement in patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE | re.MULTILINE)
-
-    return text
+    """
+    Apply table and column name mappings to SQL text.
+
+    Works on tokens, so only identifiers are renamed (never string literals,
+    comments, keywords or column types), in a single pass: a table renamed to
+    a name that is itself mapped (posts -> articles -> documents) is renamed once.
+    """
+    table_mapping = {old.lower(): new for old, new in table_mapping.items() if old != new}
+    column_mapping = {old.lower(): new for old, new in column_mapping.items() if old != new}
+
+    tokens = tokenize(text)
+    parts = []
+    create_table = False   # Inside a CREATE TABLE column list
+    depth = 0
+    column_position = False  # Next identifier is a column name, not its type
+    previous_keyword = None
+
+    for i, token in enumerate(tokens):
+        value = token.value
+        if token.kind == 'punctuation':
+            if value == ';':
+                create_table = False
+            elif value == '(':
+                depth += 1
+            elif value == ')':
+                depth -= 1
+            column_position = create_table and depth == 1 and value in ('(', ',')
+        elif token.kind == 'keyword':
+            if token.upper == 'TABLE' and previous_keyword in ('CREATE', 'TEMP', 'TEMPORARY', 'VIRTUAL'):
+                create_table = True
+                depth = 0
+            previous_keyword = token.upper
+            column_position = False
+        elif token.kind in ('identifier', 'quoted_identifier'):
+            name = token.name.lower()
+            renamed = None
+            if name in table_mapping:
+                renamed = table_mapping[name]
+            elif name in column_mapping:
+                j = i + 1
+                while j < len(tokens) and tokens[j].kind in INSIGNIFICANT:
+                    j += 1
+                is_call = j < len(tokens) and tokens[j].value == '('
+                is_type = create_table and depth == 1 and not column_position
+                # Not followed by ( to avoid function names, and not a column type (TEXT)
+                if not is_call and not is_type:
+                    renamed = column_mapping[name]
+            elif name.startswith('idx_'):
+                renamed = _rename_index(name, table_mapping, column_mapping)
+            column_position = False
+
+            if renamed is not None and renamed != name:
+                parts.append(f'"{renamed}"' if token.kind == 'quoted_identifier' else renamed)
+                continue
+
+        parts.append(value)
+
+    return ''.join(parts)
 
 
 def generate_variants(example: Dict, variant_index: int) -> Dict:
@@ -239,8 +277,6 @@ def augment_combined_dataset():
 
 
 if __name__ == "__main__":
-    import sys
-
     if len(sys.argv) > 1:
         # Augment specific file
         input_file = sys.argv[1]
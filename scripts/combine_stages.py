@@ -2,9 +2,14 @@
 Combine Stage 1 and Stage 2 training data
 """
 
+import sys
+sys.path.insert(0, '..')
+
 import json
 import os
 
+from quill.fingerprint import example_fingerprint, fingerprint
+
 def combine_stages():
     print("=" * 70)
     print("Combining Stage 1 and Stage 2 Data")
@@ -33,11 +38,19 @@ def combine_stages():
         print(f"❌ Stage 2 data not found at {stage2_path}")
         return
 
-    # Combine data
-    combined_data = stage1_data + stage2_data
+    # Combine data, dropping examples that repeat an earlier (slow, fast) pair
+    # up to literals and formatting
+    combined_data = []
+    seen = set()
+    for ex in stage1_data + stage2_data:
+        key = example_fingerprint(ex)
+        if key not in seen:
+            seen.add(key)
+            combined_data.append(ex)
+    duplicates = len(stage1_data) + len(stage2_data) - len(combined_data)
 
     # Calculate statistics
-    unique_slow_queries = len(set(ex.get('slow_query', '').strip() for ex in combined_data))
+    unique_slow_queries = len(set(fingerprint(ex.get('slow_query', '')) for ex in combined_data))
     diversity = unique_slow_queries / len(combined_data) if combined_data else 0
 
     # Count optimization types
@@ -52,6 +65,7 @@ def combine_stages():
     print(f"Total examples: {len(combined_data)}")
     print(f"  - From Stage 1: {len(stage1_data)}")
     print(f"  - From Stage 2: {len(stage2_data)}")
+    print(f"  - Duplicates dropped: {duplicates}")
     print(f"\nUnique slow queries: {unique_slow_queries}")
     print(f"Diversity: {diversity:.1%}")
     print(f"\nOptimization types:")
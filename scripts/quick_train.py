@@ -15,5 +15,7 @@ if __name__ == "__main__":
         reward_threshold=0.5,
         num_runs=3,
         timeout_seconds=10,
+        resume="--resume" in sys.argv,
+        overwrite="--overwrite" in sys.argv,
         output_dir="data"
     )
@@ -0,0 +1,81 @@
+"""
+Re-score a historical training run offline from its stored evaluation records.
+
+Recomputes speedups, rewards and acceptance from the raw per-run timings in
+evaluations.jsonl (written by the training scripts), without SQLite or the LLM.
+
+Usage: python rescore_run.py [evaluations.jsonl] [reward_threshold] [metric] [basis]
+"""
+
+import sys
+sys.path.insert(0, '..')
+
+import json
+from collections import Counter
+
+import numpy as np
+
+from quill.plan_diff import effective_optimization_type
+from quill.scoring import rescore_records
+
+
+def rescore_run(evaluations_path="data/stage2/evaluations.jsonl", reward_threshold=0.5,
+                metric="mean", basis="point"):
+    """Re-score every record and print how acceptance changes"""
+
+    with open(evaluations_path, 'r') as f:
+        lines = [line for line in f if line.strip()]
+    records = []
+    for number, line in enumerate(lines, 1):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # A torn last line from a run that crashed mid-write
+            if number == len(lines):
+                break
+            raise
+
+    print(f"\n{'='*70}")
+    print(f"Offline Re-scoring")
+    print(f"{'='*70}")
+    print(f"Records: {len(records)} from {evaluations_path}")
+    print(f"Threshold: {reward_threshold}, metric: {metric}, basis: {basis}\n")
+
+    rescored = rescore_records(records, reward_threshold=reward_threshold, metric=metric, basis=basis)
+    summary = rescored['summary']
+
+    print(f"Scorable (succeeded with samples): {summary['scorable']}")
+    print(f"Accepted before: {summary['previously_accepted']}")
+    print(f"Accepted now: {summary['accepted']}")
+    print(f"  Newly accepted: {summary['newly_accepted']}")
+    print(f"  Newly rejected: {summary['newly_rejected']}")
+    print(f"Avg reward (accepted): {summary['avg_reward_accepted']:.3f}")
+    if summary['median_speedup'] is not None:
+        print(f"Median speedup: {summary['median_speedup']:.2f}x")
+
+    accepted_types = Counter(
+        effective_optimization_type(record)
+        for record, accepted in zip(records, rescored['accepted']) if accepted
+    )
+    if accepted_types:
+        print(f"\nAccepted by type:")
+        for opt_type, count in accepted_types.most_common():
+            print(f"  {opt_type:15s}: {count}")
+
+    rewards = rescored['rewards'][rescored['accepted']]
+    if len(rewards):
+        print(f"\nReward distribution (accepted):")
+        for low, high in [(0.0, 0.5), (0.5, 0.7), (0.7, 0.9), (0.9, 1.01)]:
+            count = int(np.sum((rewards >= low) & (rewards < high)))
+            print(f"  {low:.1f}-{min(high, 1.0):.1f}: {count}")
+
+    return rescored
+
+
+if __name__ == "__main__":
+    evaluations_path = sys.argv[1] if len(sys.argv) > 1 else "data/stage2/evaluations.jsonl"
+    reward_threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    metric = sys.argv[3] if len(sys.argv) > 3 else "mean"
+    basis = sys.argv[4] if len(sys.argv) > 4 else "point"
+
+    rescore_run(evaluations_path, reward_threshold, metric, basis)
@@ -23,6 +23,7 @@ optimizer, metrics = run_stage2_training(
     reward_threshold=0.25,
     num_runs=2,
     timeout_seconds=10,
+    overwrite=True,  # throwaway test run: always start over
     output_dir="data/test_stage2"
 )
 
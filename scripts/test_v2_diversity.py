@@ -24,7 +24,7 @@ print(f"\nInitial seed examples: {len(optimizer.training_examples)}")
 print("\nRunning 3 test iterations...")
 for i in range(3):
     print(f"\n--- Iteration {i+1} ---")
-    num_added = optimizer.restem_iteration(num_candidates=2)
+    num_added, _ = optimizer.restem_iteration(num_candidates=2)
     print(f"Added: {num_added}")
 
 # Analyze diversity
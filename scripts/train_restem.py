@@ -1,14 +1,18 @@
 """
 Multi-iteration ReSTEM training loop with metrics tracking
 Runs multiple iterations to build a large, high-quality training dataset
+
+Usage: python train_restem.py [--resume | --overwrite]
 """
 
 import sys
 sys.path.insert(0, '..')
 
 import json
+import os
 import time
 from datetime import datetime
+from quill.checkpoint import CheckpointLog, EvaluationLog, load_checkpoint, restore_rng_state
 from quill.restem_optimizer import ReSTEMOptimizer
 
 
@@ -18,6 +22,14 @@ def run_training(
     reward_threshold=0.5,
     num_runs=3,
     timeout_seconds=10,
+    max_in_flight=8,
+    pipeline=False,
+    queue_size=8,
+    prompt_layout="classic",
+    samples_per_prompt=1,
+    resume=False,
+    overwrite=False,
+    evaluator_kwargs=None,
     output_dir="data"
 ):
     """
@@ -25,10 +37,19 @@ def run_training(
 
     Args:
         num_iterations: Number of ReSTEM iterations to run
-        candidates_per_iteration: Candidates to generate per iteration
+        candidates_per_iteration: Generation prompts per iteration (each yields up to samples_per_prompt candidates)
         reward_threshold: Minimum reward to accept a candidate
         num_runs: Number of timing runs for evaluation
         timeout_seconds: Query timeout limit
+        max_in_flight: Concurrent LLM requests while generating candidates
+        pipeline: Stream candidates from generation into evaluation (restem_pipeline)
+        queue_size: Candidates generated ahead of evaluation in pipeline mode
+        prompt_layout: "classic" or "prefix_stable" (cacheable prompt prefix)
+        samples_per_prompt: Completions (candidates) requested per optimization prompt
+        resume: Continue from {output_dir}/checkpoint.jsonl instead of starting over
+        overwrite: Start over even if {output_dir} already has a checkpoint / evaluation log
+        evaluator_kwargs: Extra SQLEvaluator options, e.g. {"reward_basis": "lower_bound",
+            "confidence": 0.95}; the lower bound needs num_runs >= 10 to mean much
         output_dir: Where to save results
     """
 
@@ -43,7 +64,11 @@ def run_training(
     optimizer = ReSTEMOptimizer(
         test_db_path=f"{output_dir}/test.db",
         seed_data_path=f"{output_dir}/seed_data.json",
-        reward_threshold=reward_threshold
+        reward_threshold=reward_threshold,
+        max_in_flight=max_in_flight,
+        prompt_layout=prompt_layout,
+        samples_per_prompt=samples_per_prompt,
+        evaluator_kwargs=evaluator_kwargs
     )
 
     metrics = {
@@ -53,7 +78,15 @@ def run_training(
             'candidates_per_iteration': candidates_per_iteration,
             'reward_threshold': reward_threshold,
             'num_runs': num_runs,
-            'timeout_seconds': timeout_seconds
+            'timeout_seconds': timeout_seconds,
+            'max_in_flight': max_in_flight,
+            'pipeline': pipeline,
+            'queue_size': queue_size,
+            'prompt_layout': prompt_layout,
+            'samples_per_prompt': samples_per_prompt,
+            'resume': resume,
+            'overwrite': overwrite,
+            'evaluator_kwargs': evaluator_kwargs
         },
         'iterations': [],
         'initial_stats': optimizer.get_stats()
@@ -65,27 +98,59 @@ def run_training(
 
     total_generated = 0
     total_candidates = 0
+    start_iteration = 0
+
+    # Accepted examples and iteration summaries are appended as they happen
+    checkpoint_path = f"{output_dir}/checkpoint.jsonl"
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path)
+        if checkpoint['examples']:
+            optimizer.augment_training_set(checkpoint['examples'])
+        if checkpoint['rng_state'] is not None:
+            restore_rng_state(checkpoint['rng_state'])
+        start_iteration = checkpoint['iteration']
+        metrics['iterations'] = checkpoint['iterations']
+        total_generated = sum(m['successful'] for m in checkpoint['iterations'])
+        total_candidates = sum(m['candidates_generated'] for m in checkpoint['iterations'])
+        print(f"Resumed from {checkpoint_path}: {len(checkpoint['examples'])} examples, "
+              f"{start_iteration} iterations done\n")
+    # Existing logs are only replaced with overwrite=True (FileExistsError otherwise)
+    optimizer.checkpoint_log = CheckpointLog(checkpoint_path, resume=resume, overwrite=overwrite)
+    # Raw timings for every evaluated candidate (re-score with scripts/rescore_run.py)
+    evaluations_path = f"{output_dir}/evaluations.jsonl"
+    optimizer.evaluation_log_file = EvaluationLog(evaluations_path, resume=resume, overwrite=overwrite)
+
     start_time = time.time()
 
-    for i in range(num_iterations):
+    for i in range(start_iteration, num_iterations):
         iteration_start = time.time()
 
-        num_added = optimizer.restem_iteration(
-            num_candidates=candidates_per_iteration,
-            num_runs=num_runs,
-            timeout_seconds=timeout_seconds
-        )
+        if pipeline:
+            num_added, num_generated = optimizer.restem_pipeline(
+                num_candidates=candidates_per_iteration,
+                num_runs=num_runs,
+                timeout_seconds=timeout_seconds,
+                queue_size=queue_size
+            )
+        else:
+            num_added, num_generated = optimizer.restem_iteration(
+                num_candidates=candidates_per_iteration,
+                num_runs=num_runs,
+                timeout_seconds=timeout_seconds
+            )
 
         iteration_time = time.time() - iteration_start
         total_generated += num_added
-        total_candidates += candidates_per_iteration
-        success_rate = num_added / candidates_per_iteration if candidates_per_iteration > 0 else 0
+        # Candidates actually generated: up to samples_per_prompt per prompt, minus failures
+        total_candidates += num_generated
+        success_rate = num_added / num_generated if num_generated > 0 else 0
 
         current_stats = optimizer.get_stats()
 
         iteration_metrics = {
             'iteration': i + 1,
-            'candidates_generated': candidates_per_iteration,
+            'prompts': candidates_per_iteration,
+            'candidates_generated': num_generated,
             'successful': num_added,
             'success_rate': success_rate,
             'time_seconds': iteration_time,
@@ -95,24 +160,22 @@ def run_training(
         }
 
         metrics['iterations'].append(iteration_metrics)
+        optimizer.checkpoint_log.log_iteration(i + 1, iteration_metrics)
 
         print(f"\nIteration {i+1}/{num_iterations} Summary:")
-        print(f"  Success rate: {success_rate:.1%} ({num_added}/{candidates_per_iteration})")
+        print(f"  Success rate: {success_rate:.1%} ({num_added}/{num_generated} candidates)")
         print(f"  Total examples: {current_stats['total_examples']}")
         print(f"  Avg reward: {current_stats['avg_reward']:.2f}")
         print(f"  Time: {iteration_time:.1f}s")
 
-        # Save checkpoint every 10 iterations
-        if (i + 1) % 10 == 0:
-            checkpoint_path = f"{output_dir}/checkpoint_iter_{i+1}.json"
-            optimizer.save_training_data(checkpoint_path)
-            print(f"  Checkpoint saved: {checkpoint_path}")
-
+    optimizer.checkpoint_log.close()
+    optimizer.evaluation_log_file.close()
     total_time = time.time() - start_time
 
     metrics['end_time'] = datetime.now().isoformat()
     metrics['total_time_seconds'] = total_time
     metrics['final_stats'] = optimizer.get_stats()
+    metrics['token_usage'] = optimizer.get_token_usage()
     metrics['summary'] = {
         'total_candidates': total_candidates,
         'total_successful': total_generated,
@@ -134,6 +197,9 @@ def run_training(
     print(f"Total time: {total_time/60:.1f} minutes")
     print(f"Total candidates: {total_candidates}")
     print(f"Successful: {total_generated} ({metrics['summary']['overall_success_rate']:.1%})")
+    usage = metrics['token_usage']
+    print(f"Prompt tokens: {usage['prompt_tokens']:,} ({usage['cached_prompt_tokens']:,} cached, "
+          f"{usage['cache_hit_rate']:.1%} hit rate)")
     print(f"Final dataset size: {metrics['final_stats']['total_examples']}")
     print(f"Examples gained: {metrics['summary']['examples_gained']}")
     print(f"\nBy optimization type:")
@@ -142,6 +208,8 @@ def run_training(
     print(f"\nAverage reward: {metrics['final_stats']['avg_reward']:.2f}")
     print(f"\nData saved to: {final_data_path}")
     print(f"Metrics saved to: {metrics_path}")
+    print(f"Checkpoint log: {checkpoint_path}")
+    print(f"Evaluation log: {evaluations_path}")
     print(f"{'='*70}\n")
 
     return optimizer, metrics
@@ -153,5 +221,7 @@ if __name__ == "__main__":
         candidates_per_iteration=5,
         reward_threshold=0.5,
         num_runs=3,
-        timeout_seconds=10
+        timeout_seconds=10,
+        resume="--resume" in sys.argv,
+        overwrite="--overwrite" in sys.argv
     )
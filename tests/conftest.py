@@ -0,0 +1,88 @@
+"""
+Shared fixtures: a small on-disk SQLite database shaped like data/test.db
+(users / orders / posts, and the content platform's articles / tags /
+article_tags with their UNIQUE and composite-primary-key constraints),
+built deterministically once per test session.
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+from quill.evaluator import SQLEvaluator
+
+SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER, city TEXT, created_at TEXT);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, amount REAL, status TEXT, created_at TEXT);
+CREATE TABLE posts (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, content TEXT, likes INTEGER, created_at TEXT);
+CREATE TABLE articles (id INTEGER PRIMARY KEY, author_id INTEGER, title TEXT, content TEXT, views INTEGER, published_at TEXT);
+CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE article_tags (article_id INTEGER, tag_id INTEGER, PRIMARY KEY (article_id, tag_id));
+"""
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet",
+         "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango"]
+CITIES = ["Berlin", "Lagos", "Lima", "Osaka", "Perth", "Quito", "Seoul", "Tunis"]
+STATUSES = ["pending", "paid", "shipped", "cancelled"]
+
+
+def _date(rng):
+    return f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build_fixture_db(path):
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)", [
+        (i, f"user{i}", f"user{i}@example.com", rng.randint(18, 80), rng.choice(CITIES), _date(rng))
+        for i in range(1, 2001)
+    ])
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", [
+        (i, rng.randint(1, 2000), round(rng.uniform(1, 500), 2), rng.choice(STATUSES), _date(rng))
+        for i in range(1, 10001)
+    ])
+    conn.executemany("INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?)", [
+        (i, rng.randint(1, 2000), _text(rng, 4), _text(rng, 30), rng.randint(0, 1000), _date(rng))
+        for i in range(1, 3001)
+    ])
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?)", [
+        (i, rng.randint(1, 200), _text(rng, 6), _text(rng, 40), rng.randint(0, 100000), _date(rng))
+        for i in range(1, 2001)
+    ])
+    conn.executemany("INSERT INTO tags VALUES (?, ?)", [(i, f"tag{i}") for i in range(1, 101)])
+    conn.executemany("INSERT INTO article_tags VALUES (?, ?)", [
+        (article_id, tag_id)
+        for article_id in range(1, 2001)
+        for tag_id in rng.sample(range(1, 101), rng.randint(1, 5))
+    ])
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def fixture_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("fixture") / "test.db"
+    build_fixture_db(str(path))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def schema():
+    return SCHEMA
+
+
+@pytest.fixture
+def make_evaluator(fixture_db, tmp_path_factory):
+    """SQLEvaluator factory on the fixture database, sharing one fixture cache per session"""
+    cache_dir = tmp_path_factory.getbasetemp() / "fixture_cache"
+
+    def make(**kwargs):
+        return SQLEvaluator(test_db_path=fixture_db, fixture_cache_dir=str(cache_dir), **kwargs)
+
+    return make
@@ -0,0 +1,75 @@
+"""Pluggable execution backends (user-029)."""
+
+import pytest
+
+from quill.backends import DuckDBBackend, SQLiteBackend, get_backend
+
+ORIGINAL = "SELECT * FROM orders WHERE user_id = 42"
+OPTIMIZED = "CREATE INDEX idx_orders_user ON orders(user_id); " + ORIGINAL
+
+
+class CountingBackend(SQLiteBackend):
+    """SQLite under another name, counting timed statements"""
+
+    name = "counting"
+
+    def __init__(self):
+        self.timed = []
+
+    def execute_and_time(self, conn, statement, num_runs, timeout_seconds=30, measure_first_row=False):
+        self.timed.append(statement)
+        return super().execute_and_time(conn, statement, num_runs, timeout_seconds, measure_first_row)
+
+
+def test_get_backend():
+    assert isinstance(get_backend("sqlite"), SQLiteBackend)
+    backend = CountingBackend()
+    assert get_backend(backend) is backend
+    with pytest.raises(ValueError):
+        get_backend("oracle")
+
+
+def test_sqlite_fixture_load_skips_generated_columns(fixture_db, tmp_path):
+    backend = SQLiteBackend()
+    conn = backend.connect(str(tmp_path / "load.db"))
+    backend.load_fixture(conn, "CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT UNIQUE, "
+                               "upper_name TEXT GENERATED ALWAYS AS (upper(name)) VIRTUAL);", fixture_db)
+    assert conn.execute("SELECT COUNT(*), MAX(upper_name) FROM tags").fetchone() == (100, "TAG99")
+    assert ("table", "tags") in backend.schema_objects(conn)
+    assert any("sqlite_autoindex_tags" in step for step in backend.explain(conn, "SELECT id FROM tags WHERE name = 'tag1'"))
+    conn.close()
+
+
+def test_custom_backend_times_candidates(make_evaluator, schema):
+    backend = CountingBackend()
+    result = make_evaluator(backend=backend).evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=2)
+    assert result["success"], result.get("error")
+    assert backend.timed == [ORIGINAL, ORIGINAL]
+
+
+def test_across_backends_reports_unavailable_engines(make_evaluator, schema):
+    results = make_evaluator().evaluate_across_backends(
+        schema, ORIGINAL, OPTIMIZED, backends=("sqlite", CountingBackend(), "oracle"), num_runs=2
+    )
+    assert results["sqlite"]["success"] and results["counting"]["success"]
+    assert not results["oracle"]["success"]
+    assert "Unknown backend" in results["oracle"]["error"]
+
+
+def test_missing_duckdb_is_a_failed_result(make_evaluator, schema):
+    try:
+        import duckdb  # noqa: F401
+        pytest.skip("duckdb is installed")
+    except ImportError:
+        pass
+    with pytest.raises(ImportError):
+        DuckDBBackend()
+    result = make_evaluator().evaluate_across_backends(schema, ORIGINAL, ORIGINAL, backends=("duckdb",), num_runs=1)
+    assert "pip install duckdb" in result["duckdb"]["error"]
+
+
+def test_duckdb_backend(make_evaluator, schema):
+    pytest.importorskip("duckdb")
+    result = make_evaluator(backend="duckdb").evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=2)
+    assert result["success"], result.get("error")
+    assert result["speedup"] > 0
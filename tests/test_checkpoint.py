@@ -0,0 +1,87 @@
+"""Append-only checkpoint and evaluation logs with crash-safe resume (user-050)."""
+
+import json
+import random
+
+import numpy as np
+import pytest
+
+from quill.checkpoint import CheckpointLog, EvaluationLog, load_checkpoint, restore_rng_state, rng_state
+
+
+def _write_run(path, examples, iterations):
+    with CheckpointLog(str(path), overwrite=True) as log:
+        for i in range(iterations):
+            for example in examples[i]:
+                log.log_example(example)
+            log.log_iteration(i + 1, {"successful": len(examples[i])})
+
+
+def test_load_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    _write_run(path, [[{"id": 1}], [{"id": 2}, {"id": 3}]], 2)
+    state = load_checkpoint(str(path))
+    assert [example["id"] for example in state["examples"]] == [1, 2, 3]
+    assert state["iteration"] == 2
+    assert state["iterations"] == [{"successful": 1}, {"successful": 2}]
+
+
+def test_resume_after_torn_last_line(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    _write_run(path, [[{"id": 1}]], 1)
+    with open(path, "a") as f:
+        f.write('{"type": "example", "exam')  # crash mid-write
+
+    state = load_checkpoint(str(path))
+    assert [example["id"] for example in state["examples"]] == [1]
+    assert state["iteration"] == 1
+
+    with CheckpointLog(str(path), resume=True) as log:
+        log.log_example({"id": 2})
+        log.log_iteration(2, {"successful": 1})
+    state = load_checkpoint(str(path))
+    assert [example["id"] for example in state["examples"]] == [1, 2]
+    assert state["iteration"] == 2
+
+
+def test_torn_line_in_the_middle_is_an_error(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    path.write_text('{"type": "exam\n{"type": "iteration", "iteration": 1, "metrics": {}, "rng_state": null}\n')
+    with pytest.raises(ValueError):
+        load_checkpoint(str(path))
+
+
+def test_rng_state_restores_random_and_numpy(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    random.seed(7)
+    np.random.seed(7)
+    with CheckpointLog(str(path)) as log:
+        log.log_iteration(1, {})
+    expected = (random.random(), np.random.rand())
+
+    random.seed(99)
+    np.random.seed(99)
+    restore_rng_state(load_checkpoint(str(path))["rng_state"])
+    assert (random.random(), np.random.rand()) == expected
+
+
+def test_rng_state_is_json_round_trippable():
+    state = rng_state()
+    restore_rng_state(json.loads(json.dumps(state)))
+    assert rng_state() == state
+
+
+def test_existing_log_is_not_truncated_implicitly(tmp_path):
+    path = tmp_path / "evaluations.jsonl"
+    with EvaluationLog(str(path)) as log:
+        log.log_evaluation({"accepted": True})
+    with pytest.raises(FileExistsError):
+        EvaluationLog(str(path))
+    assert path.read_text().count("\n") == 1
+
+    with EvaluationLog(str(path), resume=True) as log:
+        log.log_evaluation({"accepted": False})
+    assert path.read_text().count("\n") == 2
+
+    EvaluationLog(str(path), overwrite=True).close()
+    assert path.read_text() == ""
@@ -0,0 +1,29 @@
+"""WAL-mode concurrent read/write probe (user-027)."""
+
+
+def test_probe_writes_to_unique_tables(make_evaluator, schema):
+    query = "SELECT * FROM article_tags WHERE tag_id = 3"
+    result = make_evaluator().probe_concurrency(
+        schema, query, f"CREATE INDEX idx_article_tags_tag ON article_tags(tag_id); {query}",
+        num_readers=2, duration_seconds=0.3
+    )
+    assert result["success"], result.get("error")
+    assert result["write_tables"] == ["article_tags"]
+    for label in ("original", "optimized"):
+        assert result[label]["reads"] > 0
+        assert result[label]["writes"] > 0
+        assert result[label]["write_errors"] == 0
+    assert result["qps_ratio"] > 0
+
+
+def test_probe_fails_when_no_write_gets_through(make_evaluator, schema):
+    query = "SELECT name FROM tags WHERE id < 10"
+    reject_writes = ("CREATE TRIGGER tags_frozen BEFORE INSERT ON tags "
+                     "BEGIN SELECT RAISE(ABORT, 'tags are frozen'); END; ")
+    result = make_evaluator().probe_concurrency(
+        schema, query, reject_writes + query, num_readers=1, duration_seconds=0.3
+    )
+    assert not result["success"]
+    assert "no writes during the optimized probe" in result["error"]
+    assert "tags are frozen" in result["error"]
+    assert result["original"]["writes"] > 0
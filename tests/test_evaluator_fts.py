@@ -0,0 +1,44 @@
+"""FTS5 candidates replacing LIKE '%term%' scans (user-032)."""
+
+import sqlite3
+
+import pytest
+
+
+def _has_fts5():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(body)")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not _has_fts5(), reason="SQLite built without FTS5")
+
+FTS_SETUP = ("CREATE VIRTUAL TABLE posts_fts USING fts5(content, content='posts', content_rowid='id'); "
+             "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild'); ")
+
+
+def _fts_candidate(term):
+    return FTS_SETUP + f"SELECT id, title FROM posts WHERE id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH '{term}')"
+
+
+def test_whole_word_match_is_accepted_and_sized(make_evaluator, schema):
+    original = "SELECT id, title FROM posts WHERE content LIKE '%foxtrot%'"
+    result = make_evaluator().evaluate_query(schema, original, _fts_candidate("foxtrot"), num_runs=2)
+    assert result["success"], result.get("error")
+    report = result["fts_indexes"]["posts_fts"]
+    assert report["build_time"] > 0
+    if report["bytes"] is not None:
+        assert report["bytes"] > 0 and report["pages"] > 0
+
+
+def test_substring_semantics_difference_is_explained(make_evaluator, schema):
+    # LIKE matches 'ang' inside 'tango'; FTS5 only matches whole tokens
+    original = "SELECT id, title FROM posts WHERE content LIKE '%ang%'"
+    result = make_evaluator().evaluate_query(schema, original, _fts_candidate("ang"), num_runs=1)
+    assert not result["success"]
+    assert "FTS tokenizer semantics differ from LIKE" in result["error"]
+    diff = result["result_diff"]
+    assert diff["missing_rows"] > 0 and diff["extra_rows"] == 0
+    assert result["original_digest"] != result["optimized_digest"]
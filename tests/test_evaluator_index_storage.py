@@ -0,0 +1,69 @@
+"""Index storage overhead measured via dbstat, and the space penalty (user-036)."""
+
+import sqlite3
+
+import pytest
+
+from quill.evaluator import evaluation_record
+from quill.scoring import rescore_records
+
+QUERY = "SELECT id, amount FROM orders WHERE user_id = 42"
+TWO_INDEXES = ("CREATE INDEX idx_orders_user ON orders(user_id); "
+               "CREATE INDEX idx_orders_user_amount ON orders(user_id, amount, status, created_at); " + QUERY)
+
+
+def _has_dbstat():
+    try:
+        sqlite3.connect(":memory:").execute("SELECT COUNT(*) FROM dbstat")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+needs_dbstat = pytest.mark.skipif(not _has_dbstat(), reason="SQLite built without the dbstat virtual table")
+
+
+@needs_dbstat
+def test_each_new_index_is_sized_against_its_table(make_evaluator, schema):
+    result = make_evaluator().evaluate_query(schema, QUERY, TWO_INDEXES, num_runs=2)
+    assert result["success"], result.get("error")
+    storage = result["index_storage"]
+    assert storage["method"] == "dbstat"
+    narrow, wide = storage["indexes"]["idx_orders_user"], storage["indexes"]["idx_orders_user_amount"]
+    for info in (narrow, wide):
+        assert info["table"] == "orders"
+        assert info["pages"] > 0
+        assert info["bytes"] > 0
+        assert info["ratio_to_table"] == pytest.approx(info["bytes"] / info["table_bytes"])
+    # A covering index on four columns is bigger than one on a single integer
+    assert wide["bytes"] > narrow["bytes"]
+    assert storage["total_bytes"] == narrow["bytes"] + wide["bytes"]
+    assert storage["total_pages"] == narrow["pages"] + wide["pages"]
+    assert storage["table_bytes"] == narrow["table_bytes"]
+    assert "penalty" not in storage
+
+
+def test_page_count_fallback_without_dbstat(make_evaluator, schema, monkeypatch):
+    evaluator = make_evaluator()
+    monkeypatch.setattr(evaluator, "_object_sizes", lambda conn, names: None)
+    result = evaluator.evaluate_query(schema, QUERY, TWO_INDEXES, num_runs=2)
+    storage = result["index_storage"]
+    assert storage["method"] == "page_count"
+    assert storage["total_pages"] > 0
+    assert storage["indexes"]["idx_orders_user"]["bytes"] is None
+    assert storage["table_bytes"] is None
+
+
+@needs_dbstat
+def test_space_penalty_lowers_reward_and_survives_rescoring(make_evaluator, schema):
+    evaluator = make_evaluator(index_space_weight=0.5)
+    weighted = evaluator.evaluate_query(schema, QUERY, TWO_INDEXES, num_runs=2)
+    assert weighted["success"], weighted.get("error")
+    storage = weighted["index_storage"]
+    assert storage["penalty"] == pytest.approx(0.5 * storage["total_bytes"] / storage["table_bytes"])
+    assert storage["penalty"] > 0
+    assert weighted["reward"] == pytest.approx(max(0, evaluator._speedup_reward(weighted["speedup"]) - storage["penalty"]))
+
+    record = evaluation_record({"schema": schema, "slow_query": QUERY, "fast_query": TWO_INDEXES}, weighted, True)
+    assert record["reward_adjustment"] == pytest.approx(-storage["penalty"])
+    assert rescore_records([record], reward_threshold=0.0)["rewards"][0] == pytest.approx(weighted["reward"], abs=1e-9)
@@ -0,0 +1,90 @@
+"""Derived structures and their write maintenance cost (user-030)."""
+
+import sqlite3
+
+import pytest
+
+from quill.evaluator import SYNTHETIC_KEY_BASE
+
+
+@pytest.fixture
+def evaluator(make_evaluator):
+    return make_evaluator(measure_maintenance=True)
+
+
+@pytest.mark.parametrize("table, query, setup", [
+    # Composite primary key
+    ("article_tags", "SELECT * FROM article_tags WHERE tag_id = 5", "CREATE INDEX idx_at_tag ON article_tags(tag_id)"),
+    # UNIQUE column
+    ("tags", "SELECT * FROM tags WHERE name = 'tag5'", "CREATE INDEX idx_tags_name_id ON tags(name, id)"),
+])
+def test_maintenance_replays_writes_on_unique_tables(evaluator, schema, table, query, setup):
+    result = evaluator.evaluate_query(schema, query, f"{setup}; {query}", num_runs=2)
+    assert result["success"], result.get("error")
+    report = result["maintenance"]["tables"][table]
+    assert "error" not in report
+    assert report["rows_written_per_insert"] == 1.0
+
+
+def test_failed_replay_is_reported_not_rejected(evaluator, schema):
+    query = "SELECT * FROM users WHERE age > 70"
+    optimized = ("CREATE TABLE audit (delta INTEGER CHECK (delta > 0)); "
+                 "CREATE TRIGGER users_audit AFTER INSERT ON users BEGIN INSERT INTO audit VALUES (-1); END; "
+                 f"CREATE INDEX idx_users_age ON users(age); {query}")
+    result = evaluator.evaluate_query(schema, query, optimized, num_runs=2)
+    assert result["success"], result.get("error")
+    assert "CHECK constraint failed" in result["maintenance"]["tables"]["users"]["error"]
+
+
+def test_maintenance_is_off_by_default(make_evaluator, schema):
+    query = "SELECT * FROM orders WHERE status = 'paid'"
+    result = make_evaluator().evaluate_query(
+        schema, query, f"CREATE INDEX idx_orders_status ON orders(status); {query}", num_runs=2
+    )
+    assert result["success"]
+    assert "maintenance" not in result
+
+
+def test_clone_statement_synthesizes_unique_values(evaluator, fixture_db):
+    conn = sqlite3.connect(fixture_db)
+    try:
+        sql, max_rowid = evaluator._clone_row_statement(conn, "tags")
+        conn.execute("SAVEPOINT clone")
+        for i in range(3):
+            conn.execute(sql, {"rowid": 1, "salt": SYNTHETIC_KEY_BASE + i})
+        names = [name for (name,) in conn.execute("SELECT name FROM tags WHERE id > ?", (max_rowid,))]
+        conn.execute("ROLLBACK TO clone")
+    finally:
+        conn.close()
+    assert len(set(names)) == 3
+
+
+GENERATED_DAY = ("ALTER TABLE orders ADD COLUMN day TEXT GENERATED ALWAYS AS (substr(created_at, 9, 2)) VIRTUAL; "
+                 "CREATE INDEX idx_orders_day ON orders(day); ")
+
+
+@pytest.mark.parametrize("optimized, accepted", [
+    # Same columns as the original returned, filtered through the generated column
+    ("SELECT id, user_id, amount, status, created_at FROM orders WHERE day = '05'", True),
+    # Reads the new column, so SELECT * on both sides returns it
+    ("SELECT * FROM orders WHERE day = '05'", True),
+    # Doesn't use the new column but returns it: a visible change
+    ("SELECT * FROM orders WHERE substr(created_at, 9, 2) = '05'", False),
+    ("SELECT id, user_id, amount, status, created_at FROM orders WHERE day = '06'", False),
+])
+def test_generated_column_results_compare_against_original(make_evaluator, schema, optimized, accepted):
+    original = "SELECT * FROM orders WHERE substr(created_at, 9, 2) = '05'"
+    result = make_evaluator().evaluate_query(schema, original, GENERATED_DAY + optimized, num_runs=2)
+    assert result["success"] is accepted, result.get("error")
+    if accepted:
+        assert result["schema_changed"]
+
+
+def test_fixture_copy_survives_reordered_columns(make_evaluator, schema):
+    reordered = schema.replace(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER, city TEXT, created_at TEXT);",
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, city TEXT, age INTEGER, name TEXT, email TEXT, created_at TEXT, "
+        "name_lower TEXT GENERATED ALWAYS AS (lower(name)) VIRTUAL);"
+    )
+    query = "SELECT name, age FROM users WHERE age > 60"
+    assert make_evaluator().evaluate_query(reordered, query, query, num_runs=2)["success"]
@@ -0,0 +1,47 @@
+"""Per-query memory and temp-spill measurement in a worker process (user-035)."""
+
+import pytest
+
+from quill.evaluator import SQLEvaluator, evaluation_record
+
+ORIGINAL = "SELECT id, amount FROM orders ORDER BY amount"
+OPTIMIZED = "CREATE INDEX idx_orders_amount ON orders(amount); " + ORIGINAL
+
+
+def test_footprint_counts_rss_growth_and_spills():
+    assert SQLEvaluator._memory_footprint({"peak_rss_delta_bytes": 4096, "temp_bytes_written": 1024}) == 5120
+    # RSS can shrink while the query runs; temp bytes are unknown off Linux
+    assert SQLEvaluator._memory_footprint({"peak_rss_delta_bytes": -100, "temp_bytes_written": None}) == 0
+
+
+def test_reports_both_queries_and_their_temp_btrees(make_evaluator, schema):
+    result = make_evaluator(measure_memory=True).evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=1)
+    assert result["success"], result.get("error")
+    memory = result["memory"]
+    for side in ("original", "optimized"):
+        report = memory[side]
+        assert "error" not in report, report
+        assert report["rows"] == 10000
+        assert {"peak_rss_delta_bytes", "temp_bytes_written", "spilled"} <= set(report)
+    # The sort needs a temp B-tree; the index delivers rows in order
+    assert memory["original"]["temp_btrees"] >= 1
+    assert memory["optimized"]["temp_btrees"] == 0
+    assert memory["penalty"] == 0.0
+
+
+def test_penalty_per_mb_is_recorded(make_evaluator, schema):
+    evaluator = make_evaluator(memory_penalty_per_mb=10.0)
+    assert evaluator.measure_memory
+    result = evaluator.evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=1)
+    assert result["success"], result.get("error")
+    memory = result["memory"]
+    extra = evaluator._memory_footprint(memory["optimized"]) - evaluator._memory_footprint(memory["original"])
+    assert memory["penalty"] == pytest.approx(10.0 * max(0, extra) / (1024 * 1024))
+    assert result["reward"] == pytest.approx(max(0, evaluator._speedup_reward(result["speedup"]) - memory["penalty"]))
+
+    record = evaluation_record({"schema": schema, "slow_query": ORIGINAL, "fast_query": OPTIMIZED}, result, True)
+    assert record["reward_adjustment"] == pytest.approx(-memory["penalty"])
+
+
+def test_off_by_default(make_evaluator, schema):
+    assert "memory" not in make_evaluator().evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=1)
@@ -0,0 +1,67 @@
+"""OFFSET vs keyset pagination across page depths (user-033)."""
+
+import pytest
+
+from quill.evaluator import offset_to_keyset
+
+
+def test_mapping_with_tie_breaking_key():
+    mapping = offset_to_keyset("SELECT id, created_at FROM orders ORDER BY created_at DESC LIMIT 20 OFFSET 40")
+    assert mapping["page_size"] == 20
+    assert (mapping["order_column"], mapping["key_column"]) == ("created_at", "id")
+    assert mapping["offset_sql"] == "SELECT id, created_at FROM orders ORDER BY created_at DESC, id DESC LIMIT 20 OFFSET ?"
+    assert mapping["first_page_sql"] == "SELECT id, created_at FROM orders ORDER BY created_at DESC, id DESC LIMIT 20"
+    assert mapping["next_page_sql"] == ("SELECT id, created_at FROM orders WHERE (created_at, id) < (?, ?) "
+                                        "ORDER BY created_at DESC, id DESC LIMIT 20")
+
+
+def test_mapping_on_the_key_itself():
+    mapping = offset_to_keyset("SELECT * FROM users ORDER BY id LIMIT 10")
+    assert mapping["next_page_sql"] == "SELECT * FROM users WHERE id > ? ORDER BY id ASC LIMIT 10"
+
+
+def test_seek_predicate_goes_on_the_top_level_where():
+    mapping = offset_to_keyset(
+        "SELECT id, amount FROM orders WHERE user_id IN (SELECT id FROM users WHERE city = 'Lima') "
+        "OR status = 'paid' -- recent\nORDER BY amount LIMIT 5"
+    )
+    assert mapping["next_page_sql"].startswith(
+        "SELECT id, amount FROM orders WHERE (user_id IN (SELECT id FROM users WHERE city = 'Lima') "
+        "OR status = 'paid') AND (amount, id) > (?, ?)"
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT status, COUNT(*) AS n FROM orders GROUP BY status ORDER BY n LIMIT 2",
+    "SELECT id FROM orders ORDER BY id",
+    "SELECT id FROM users UNION SELECT id FROM orders ORDER BY id LIMIT 5",
+])
+def test_unsupported_queries_raise(query):
+    with pytest.raises(ValueError):
+        offset_to_keyset(query)
+
+
+def test_offset_and_keyset_pages_match(make_evaluator, schema):
+    result = make_evaluator().evaluate_pagination(
+        schema, "SELECT id, user_id, created_at FROM orders WHERE status = 'paid' ORDER BY created_at DESC LIMIT 50",
+        num_pages=10, setup="CREATE INDEX idx_orders_status_created ON orders(status, created_at, id)", num_runs=1
+    )
+    assert result["success"], result.get("error")
+    assert result["pages_walked"] == 10
+    assert [page["offset"] for page in result["pages"]] == list(range(0, 500, 50))
+    assert result["deepest_speedup"] == result["pages"][-1]["speedup"]
+
+
+def test_walk_stops_at_the_last_page(make_evaluator, schema):
+    # 100 tags in pages of 30: three full pages and a partial one
+    result = make_evaluator().evaluate_pagination(schema, "SELECT id, name FROM tags ORDER BY id LIMIT 30",
+                                                  num_pages=10, num_runs=1)
+    assert result["success"], result.get("error")
+    assert result["pages_walked"] == 4
+
+
+def test_sort_column_must_be_selected(make_evaluator, schema):
+    result = make_evaluator().evaluate_pagination(schema, "SELECT id FROM orders ORDER BY amount LIMIT 10",
+                                                  num_pages=3, num_runs=1)
+    assert not result["success"]
+    assert "ORDER BY column and key column" in result["error"]
@@ -0,0 +1,72 @@
+"""Planner-statistics regimes: plain vs ANALYZEd fixtures (user-028)."""
+
+import sqlite3
+
+import pytest
+
+ORIGINAL = "SELECT * FROM orders WHERE user_id = 42 AND status = 'paid'"
+OPTIMIZED = "CREATE INDEX idx_orders_user_status ON orders(user_id, status); " + ORIGINAL
+
+
+def _stat_rows(path, index=None):
+    conn = sqlite3.connect(path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            return []
+        if index:
+            return conn.execute("SELECT * FROM sqlite_stat1 WHERE idx = ?", (index,)).fetchall()
+        return conn.execute("SELECT * FROM sqlite_stat1").fetchall()
+    finally:
+        conn.close()
+
+
+def test_stats_template_sits_next_to_the_plain_one(make_evaluator, schema):
+    evaluator = make_evaluator()
+    plain = evaluator._fixture_template(schema)
+    with_stats = evaluator._fixture_template(schema, with_stats=True)
+    assert with_stats != plain
+    assert with_stats.parent == plain.parent
+    assert _stat_rows(str(plain)) == []
+    # The UNIQUE index on tags.name and article_tags' primary key get statistics
+    assert {row[0] for row in _stat_rows(str(with_stats))} >= {"tags", "article_tags"}
+
+
+def test_candidate_indexes_are_analyzed_after_setup(make_evaluator, schema, tmp_path):
+    evaluator = make_evaluator()
+    db_path = str(tmp_path / "run.db")
+    conn = evaluator._prepare_db(db_path, schema, with_stats=True)
+    rows, samples, _ = evaluator._run_query(conn, OPTIMIZED, num_runs=1, analyze_after_setup=True)
+    conn.commit()
+    conn.close()
+    assert rows is not None and len(samples) == 1
+    assert _stat_rows(db_path, "idx_orders_user_status")
+
+
+@pytest.mark.parametrize("mode", ["none", "analyze"])
+def test_single_regime(make_evaluator, schema, mode):
+    result = make_evaluator(planner_stats=mode).evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=2)
+    assert result["success"], result.get("error")
+    assert result["planner_stats"] == mode
+    assert "planner_stats_regimes" not in result
+
+
+def test_both_regimes_keep_the_worse(make_evaluator, schema):
+    result = make_evaluator().evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=2, planner_stats="both")
+    assert result["success"], result.get("error")
+    regimes = result["planner_stats_regimes"]
+    assert set(regimes) == {"none", "analyze"}
+    assert result["reward"] == min(regime["reward"] for regime in regimes.values())
+    assert result["reward"] == regimes[result["planner_stats"]]["reward"]
+
+
+def test_failure_names_the_regime(make_evaluator, schema):
+    result = make_evaluator(planner_stats="both").evaluate_query(
+        schema, ORIGINAL, "SELECT * FROM orders WHERE user_id = 43", num_runs=1
+    )
+    assert not result["success"]
+    assert result["error"].endswith("(planner_stats=none)")
+
+
+def test_unknown_mode_is_rejected(make_evaluator):
+    with pytest.raises(ValueError):
+        make_evaluator(planner_stats="sometimes")
@@ -0,0 +1,71 @@
+"""Summary tables kept up to date by triggers, and their maintenance cost (user-031)."""
+
+import pytest
+
+from quill.evaluator import evaluation_record
+from quill.scoring import rescore_records
+
+ORIGINAL = "SELECT user_id, SUM(amount) FROM orders GROUP BY user_id"
+SUMMARY_TABLE = (
+    "CREATE TABLE user_totals (user_id INTEGER PRIMARY KEY, total REAL); "
+    "INSERT INTO user_totals SELECT user_id, SUM(amount) FROM orders GROUP BY user_id; "
+    "CREATE TRIGGER orders_total AFTER INSERT ON orders BEGIN "
+    "INSERT OR IGNORE INTO user_totals VALUES (NEW.user_id, 0); "
+    "UPDATE user_totals SET total = total + NEW.amount WHERE user_id = NEW.user_id; END; "
+    "SELECT user_id, total FROM user_totals"
+)
+# Same summary table, but its trigger recomputes the total with a scan of orders:
+# a per-insert overhead far above timing noise
+RECOMPUTING_SUMMARY_TABLE = SUMMARY_TABLE.replace(
+    "UPDATE user_totals SET total = total + NEW.amount WHERE user_id = NEW.user_id;",
+    "UPDATE user_totals SET total = (SELECT SUM(amount) FROM orders WHERE user_id = NEW.user_id) "
+    "WHERE user_id = NEW.user_id;"
+)
+
+
+def test_trigger_writes_count_as_write_amplification(make_evaluator, schema):
+    result = make_evaluator(measure_maintenance=True).evaluate_query(schema, ORIGINAL, SUMMARY_TABLE, num_runs=2)
+    assert result["success"], result.get("error")
+    assert result["build_time"] > 0
+    assert result["break_even_reads"] is None or result["break_even_reads"] > 0
+    orders = result["maintenance"]["tables"]["orders"]
+    assert orders["write_amplification"] >= 2
+    assert "penalty" not in result["maintenance"]
+
+
+def test_maintenance_weight_lowers_the_reward(make_evaluator, schema):
+    # Write-heavy: trigger overhead outweighs the read saving
+    evaluator = make_evaluator(maintenance_weight=0.5, writes_per_read=1000)
+    result = evaluator.evaluate_query(schema, ORIGINAL, RECOMPUTING_SUMMARY_TABLE, num_runs=3)
+    assert result["success"], result.get("error")
+
+    maintenance = result["maintenance"]
+    assert maintenance["cost_per_read"] > 0
+    assert maintenance["saved_share"] == 1.0
+    assert maintenance["penalty"] == 0.5
+    assert result["reward"] == pytest.approx(max(0, evaluator._speedup_reward(result["speedup"]) - 0.5))
+
+
+def test_read_heavy_workload_pays_little_maintenance(make_evaluator, schema):
+    result = make_evaluator(maintenance_weight=0.5, writes_per_read=0.001).evaluate_query(
+        schema, ORIGINAL, SUMMARY_TABLE, num_runs=3
+    )
+    assert result["success"], result.get("error")
+    maintenance = result["maintenance"]
+    overhead = max(0.0, maintenance["tables"]["orders"]["overhead_per_insert"])
+    assert maintenance["cost_per_read"] == pytest.approx(0.001 * overhead + result["build_time"] / 1000)
+    assert maintenance["penalty"] == pytest.approx(0.5 * maintenance["saved_share"])
+    # A small fraction of what the GROUP BY it replaces costs (the saving itself is
+    # a difference of means, too noisy on a shared machine to assert the share on)
+    assert maintenance["cost_per_read"] < 0.1 * result["original_timing"]["p50"]
+
+
+def test_maintenance_penalty_survives_rescoring(make_evaluator, schema):
+    evaluator = make_evaluator(maintenance_weight=0.5, writes_per_read=1000)
+    candidate = {"schema": schema, "slow_query": ORIGINAL, "fast_query": SUMMARY_TABLE}
+    result = evaluator.evaluate_query(schema, ORIGINAL, SUMMARY_TABLE, num_runs=3)
+    record = evaluation_record(candidate, result, accepted=True)
+    assert record["reward_adjustment"] == pytest.approx(-result["maintenance"]["penalty"])
+
+    rescored = rescore_records([record], reward_threshold=0.0)
+    assert rescored["rewards"][0] == pytest.approx(result["reward"], abs=1e-9)
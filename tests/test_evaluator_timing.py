@@ -0,0 +1,65 @@
+"""Latency percentiles and time-to-first-row metrics (user-026)."""
+
+import pytest
+
+from quill.evaluator import SQLEvaluator
+
+ORIGINAL = "SELECT * FROM orders WHERE user_id = 42"
+OPTIMIZED = "CREATE INDEX idx_orders_user ON orders(user_id); " + ORIGINAL
+
+
+def test_percentile_interpolates():
+    ordered = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert SQLEvaluator._percentile(ordered, 50) == 3.0
+    assert SQLEvaluator._percentile(ordered, 95) == pytest.approx(4.8)
+    assert SQLEvaluator._percentile([2.5], 99) == 2.5
+
+
+def test_timing_stats_keep_samples(make_evaluator):
+    stats = make_evaluator()._timing_stats([0.3, 0.1, 0.2], [0.01, 0.03])
+    assert stats["mean"] == pytest.approx(0.2)
+    assert (stats["min"], stats["p50"], stats["max"]) == (0.1, 0.2, 0.3)
+    assert stats["samples"] == [0.3, 0.1, 0.2]
+    assert stats["first_row"] == pytest.approx(0.02)
+    assert stats["first_row_samples"] == [0.01, 0.03]
+
+
+@pytest.mark.parametrize("metric", ["mean", "p50", "p95", "p99"])
+def test_speedup_uses_the_reward_metric(make_evaluator, schema, metric):
+    result = make_evaluator(reward_metric=metric).evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=5)
+    assert result["success"], result.get("error")
+    assert result["reward_metric"] == metric
+    original, optimized = result["original_timing"], result["optimized_timing"]
+    assert len(original["samples"]) == len(optimized["samples"]) == 5
+    assert original["min"] <= original["p50"] <= original["p95"] <= original["p99"] <= original["max"]
+    assert result["speedup"] == pytest.approx(original[metric] / optimized[metric])
+    # original_time / optimized_time stay the means whatever the metric
+    assert result["original_time"] == pytest.approx(original["mean"])
+
+
+def test_first_row_is_measured_only_when_asked(make_evaluator, schema):
+    plain = make_evaluator().evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=3)
+    assert "first_row" not in plain["original_timing"]
+
+    result = make_evaluator(measure_first_row=True).evaluate_query(schema, ORIGINAL, OPTIMIZED, num_runs=3)
+    timing = result["original_timing"]
+    assert len(timing["first_row_samples"]) == 3
+    assert 0 < timing["first_row"]
+
+
+def test_first_row_reward_metric(make_evaluator, schema):
+    # With an index on the sort key, the first row comes back without sorting the whole table
+    original = "SELECT * FROM orders ORDER BY amount DESC"
+    optimized = "CREATE INDEX idx_orders_amount ON orders(amount); " + original
+    result = make_evaluator().evaluate_query(schema, original, optimized, num_runs=3, reward_metric="first_row")
+    assert result["success"], result.get("error")
+    speedup = result["original_timing"]["first_row"] / result["optimized_timing"]["first_row"]
+    assert result["speedup"] == pytest.approx(speedup)
+    assert result["speedup"] > 1
+
+
+def test_unknown_metric_is_rejected(make_evaluator, schema):
+    with pytest.raises(ValueError):
+        make_evaluator(reward_metric="p42")
+    with pytest.raises(ValueError):
+        make_evaluator().evaluate_query(schema, ORIGINAL, ORIGINAL, reward_metric="median")
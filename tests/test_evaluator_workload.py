@@ -0,0 +1,44 @@
+"""Weighted multi-query workload evaluation of DDL candidates (user-037)."""
+
+WORKLOAD = [
+    {"query": "SELECT article_id FROM article_tags WHERE tag_id = 7", "weight": 10},
+    {"query": "SELECT COUNT(*) FROM article_tags WHERE tag_id BETWEEN 10 AND 20", "weight": 2},
+    "SELECT * FROM tags WHERE name = 'tag42'",
+]
+
+
+def test_index_on_composite_key_table(make_evaluator, schema):
+    result = make_evaluator().evaluate_workload(
+        schema, WORKLOAD, "CREATE INDEX idx_article_tags_tag ON article_tags(tag_id)", num_runs=2
+    )
+    assert result["success"], result.get("error")
+    assert [query["weight"] for query in result["queries"]] == [10, 2, 1.0]
+    assert result["workload_speedup"] > 1
+    assert result["index_storage"]["total_bytes"] > 0
+    maintenance = result["maintenance"]
+    assert "error" not in maintenance
+    assert "error" not in maintenance["tables"]["article_tags"]
+
+
+def test_unique_table_maintenance(make_evaluator, schema):
+    result = make_evaluator().evaluate_workload(
+        schema, ["SELECT id FROM tags WHERE name LIKE 'tag1%'"], "CREATE INDEX idx_tags_name_id ON tags(name, id)",
+        num_runs=2
+    )
+    assert result["success"], result.get("error")
+    assert result["maintenance"]["tables"]["tags"]["rows_written_per_insert"] == 1.0
+
+
+def test_maintenance_can_be_skipped(make_evaluator, schema):
+    result = make_evaluator().evaluate_workload(
+        schema, WORKLOAD, "CREATE INDEX idx_article_tags_tag ON article_tags(tag_id)",
+        num_runs=2, measure_maintenance=False
+    )
+    assert result["success"]
+    assert "maintenance" not in result
+
+
+def test_ddl_that_changes_results_is_rejected(make_evaluator, schema):
+    result = make_evaluator().evaluate_workload(schema, WORKLOAD, "DELETE FROM article_tags WHERE tag_id = 7")
+    assert not result["success"]
+    assert "Results changed after DDL" in result["error"]
@@ -0,0 +1,32 @@
+"""Literal-stripping query fingerprints (user-042)."""
+
+from quill.fingerprint import example_fingerprint, fingerprint, normalize_query
+
+
+def test_literal_and_whitespace_variants_match():
+    variants = [
+        "SELECT * FROM users WHERE age > 30",
+        "select *  from Users\n  where age > 65   -- adults",
+        "SELECT * FROM users WHERE age > ?",
+        "SELECT * FROM users /* c */ WHERE age > -1",
+    ]
+    assert {fingerprint(sql) for sql in variants} == {fingerprint(variants[0])}
+    assert normalize_query(variants[1]) == "SELECT * FROM users WHERE age > ?"
+
+
+def test_in_lists_collapse_and_strings_are_literals():
+    assert fingerprint("SELECT 1 FROM t WHERE id IN (1, 2, 3)") == fingerprint("SELECT 1 FROM t WHERE id IN (7)")
+    assert fingerprint("SELECT 1 FROM t WHERE name = 'a'") == fingerprint("SELECT 1 FROM t WHERE name = 'b b'")
+
+
+def test_structural_changes_differ():
+    assert fingerprint("SELECT * FROM users WHERE age > 30") != fingerprint("SELECT * FROM users WHERE age < 30")
+    assert fingerprint("SELECT a - 1 FROM t") != fingerprint("SELECT a FROM t")
+
+
+def test_example_fingerprint_covers_both_queries():
+    example = {"slow_query": "SELECT * FROM t WHERE a = 1", "fast_query": "SELECT a FROM t WHERE a = 1"}
+    variant = {"slow_query": "select * from T where a = 2", "fast_query": "SELECT a FROM t WHERE a = 9"}
+    other = {"slow_query": example["slow_query"], "fast_query": "SELECT b FROM t WHERE a = 1"}
+    assert example_fingerprint(example) == example_fingerprint(variant)
+    assert example_fingerprint(example) != example_fingerprint(other)
@@ -0,0 +1,59 @@
+"""MinHash/LSH near-duplicate detection (user-048)."""
+
+import random
+
+from quill.minhash import MinHashLSH, shingles
+
+COLUMNS = ["id", "name", "email", "age", "city", "country", "created_at", "status",
+           "score", "plan", "referrer", "last_login", "phone", "zip", "company"]
+
+
+def _query(columns):
+    return (f"SELECT {', '.join(columns)} FROM users WHERE age > 30 AND status = 'active' "
+            f"AND country = 'CA' AND score >= 10 AND plan <> 'free' AND zip LIKE '9%' "
+            f"AND last_login > '2024-01-01' AND referrer IS NOT NULL AND company <> '' "
+            f"GROUP BY city, country HAVING COUNT(*) > 5 ORDER BY created_at DESC, id")
+
+
+def _jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def test_shingles_ignore_formatting_and_literals():
+    assert shingles("select * from Users where age > 30") == shingles("SELECT *\nFROM users WHERE age > 65")
+
+
+def test_recall_on_near_duplicates():
+    rng = random.Random(0)
+    lsh = MinHashLSH(threshold=0.85)
+    pairs = []
+    for key in range(200):
+        columns = rng.sample(COLUMNS, 12)
+        original = _query(columns)
+        # Near-duplicate: one extra selected column
+        extra = next(c for c in COLUMNS if c not in columns)
+        duplicate = _query(columns[:6] + [extra] + columns[6:])
+        lsh.insert(key, original)
+        pairs.append((key, duplicate, _jaccard(original, duplicate)))
+
+    # Clearly above the threshold, so estimation noise rarely drops a pair
+    near = [(key, duplicate) for key, duplicate, similarity in pairs if similarity >= 0.9]
+    assert len(near) >= 100
+    found = sum(1 for key, duplicate in near if key in dict(lsh.query(duplicate)))
+    assert found / len(near) >= 0.9
+
+
+def test_unrelated_queries_do_not_match():
+    lsh = MinHashLSH(threshold=0.85)
+    lsh.insert("users", "SELECT name, email FROM users WHERE age > 30 ORDER BY name")
+    assert lsh.nearest("SELECT SUM(amount) FROM orders o JOIN items i ON i.order_id = o.id GROUP BY o.status") is None
+
+
+def test_exact_duplicate_is_nearest_and_insert_is_idempotent():
+    lsh = MinHashLSH()
+    sql = "SELECT id FROM posts WHERE likes > 10 AND user_id = 3"
+    lsh.insert("a", sql)
+    lsh.insert("a", "SELECT 1")
+    assert len(lsh) == 1
+    assert lsh.nearest(sql.lower()) == ("a", 1.0)
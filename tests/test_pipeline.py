@@ -0,0 +1,68 @@
+"""Pipelined generation and evaluation with per-task slow-query dedup (user-048)."""
+
+from quill.fingerprint import example_fingerprint
+from quill.pipeline import run_pipeline
+
+
+class FakeOptimizer:
+    """The slice of a ReSTEM optimizer that run_pipeline uses, with exact-match slow-query dedup"""
+
+    max_in_flight = 1
+
+    def __init__(self, completions, slow_query="SELECT * FROM orders WHERE user_id = 7"):
+        self.training_examples = [{"slow_query": "SELECT 1", "fast_query": "SELECT 1"}]
+        self.example_fingerprints = set()
+        self.slow_queries = {"SELECT 1"}
+        self.near_duplicates_skipped = 0
+        self.evaluated = []
+        self.batch = [{"slow_query": slow_query, "fast_query": f"{setup}; {slow_query}"} for setup in completions]
+
+    def _candidate_task(self, base):
+        return (lambda: [dict(candidate) for candidate in self.batch],)
+
+    def _check_slow_query(self, candidate):
+        return "Slow query seen" if candidate["slow_query"] in self.slow_queries else None
+
+    def _check_near_duplicate(self, candidate, check_slow_query=True):
+        if check_slow_query and self._check_slow_query(candidate):
+            self.near_duplicates_skipped += 1
+            return "Slow query seen"
+        return None
+
+    def evaluate_candidate(self, candidate, num_runs, timeout_seconds, label=""):
+        self.evaluated.append(candidate["fast_query"])
+        return True
+
+    def augment_training_set(self, examples):
+        for example in examples:
+            self.example_fingerprints.add(example_fingerprint(example))
+            self.slow_queries.add(example["slow_query"])
+
+
+COMPLETIONS = ["CREATE INDEX idx_a ON orders(user_id)", "CREATE INDEX idx_b ON orders(user_id, amount)"]
+
+
+def test_sibling_completions_are_all_evaluated():
+    optimizer = FakeOptimizer(COMPLETIONS)
+    stats = run_pipeline(optimizer, 1, num_runs=1, queue_size=1)
+    assert stats["accepted"] == 2
+    assert stats["near_duplicates"] == 0
+    assert len(optimizer.evaluated) == 2
+
+
+def test_known_slow_query_skips_the_whole_task():
+    optimizer = FakeOptimizer(COMPLETIONS, slow_query="SELECT 1")
+    stats = run_pipeline(optimizer, 1, num_runs=1, queue_size=1)
+    assert stats["near_duplicates"] == 2
+    assert optimizer.near_duplicates_skipped == 2
+    assert optimizer.evaluated == []
+
+
+def test_later_task_with_an_accepted_slow_query_is_skipped():
+    optimizer = FakeOptimizer(COMPLETIONS)
+    run_pipeline(optimizer, 1, num_runs=1, queue_size=1)
+    optimizer.batch = optimizer.batch[:1]
+    optimizer.batch[0]["fast_query"] = "CREATE INDEX idx_c ON orders(user_id, status); " + optimizer.batch[0]["slow_query"]
+    stats = run_pipeline(optimizer, 1, num_runs=1, queue_size=1)
+    assert stats["near_duplicates"] == 1
+    assert len(optimizer.evaluated) == 2
@@ -0,0 +1,85 @@
+"""Query plan diffs and verified optimization types (user-034)."""
+
+import sqlite3
+
+import pytest
+
+from quill.plan_diff import classify_optimization, diff_plans, effective_optimization_type, parse_plan
+
+SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, city TEXT);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, amount REAL, status TEXT);
+CREATE TABLE docs_plain (id INTEGER PRIMARY KEY, body TEXT);
+CREATE TABLE user_totals (user_id INTEGER PRIMARY KEY, total REAL);
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    yield conn
+    conn.close()
+
+
+def _plan(conn, sql):
+    *setup, query = [statement for statement in sql.split(";") if statement.strip()]
+    for statement in setup:
+        conn.execute(statement)
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query)]
+
+
+def _classify(conn, original, optimized):
+    diff = diff_plans(_plan(conn, original), _plan(conn, optimized), original, optimized)
+    return classify_optimization(diff, original, optimized)
+
+
+def test_added_limit_is_limit_not_indexing(conn):
+    assert _classify(conn, "SELECT name FROM users ORDER BY name",
+                     "SELECT name FROM users ORDER BY name LIMIT 10") == "limit"
+
+
+def test_summary_table_is_redundancy(conn):
+    assert _classify(conn, "SELECT user_id, SUM(amount) AS t FROM orders GROUP BY user_id ORDER BY t DESC",
+                     "SELECT user_id, total FROM user_totals") == "redundancy"
+
+
+def test_new_index_is_indexing(conn):
+    assert _classify(conn, "SELECT * FROM users u WHERE u.age > 30",
+                     "CREATE INDEX idx_age ON users(age); SELECT * FROM users WHERE age > 30") == "indexing"
+
+
+def test_fts_rewrite_is_indexing(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE docs USING fts5(body)")
+    except sqlite3.OperationalError:
+        pytest.skip("SQLite built without FTS5")
+    assert _classify(conn, "SELECT * FROM docs_plain WHERE body LIKE '%x%'",
+                     "SELECT * FROM docs WHERE docs MATCH 'x'") == "indexing"
+
+
+def test_subquery_to_join_is_join(conn):
+    assert _classify(conn, "SELECT * FROM users WHERE id IN (SELECT user_id FROM orders WHERE amount > 5)",
+                     "SELECT DISTINCT u.* FROM users u JOIN orders o ON o.user_id = u.id WHERE o.amount > 5") == "join"
+
+
+def test_alias_only_change_is_unknown(conn):
+    assert _classify(conn, "SELECT * FROM users WHERE age > 30",
+                     "SELECT * FROM users u WHERE u.age > 30") == "unknown"
+
+
+@pytest.mark.parametrize("plan", [
+    ["SCAN TABLE users AS u", "SEARCH TABLE orders AS o USING INDEX idx_orders_user (user_id=?)"],
+    ["SCAN u", "SEARCH o USING INDEX idx_orders_user (user_id=?)"],
+])
+def test_parse_plan_old_and_new_formats(plan):
+    parsed = parse_plan(plan, aliases={"u": "users", "o": "orders"})
+    assert parsed["access"] == {"users": "SCAN", "orders": "SEARCH"}
+    assert parsed["indexes"]["idx_orders_user"]["table"] == "orders"
+
+
+def test_unknown_does_not_override_claimed_type():
+    assert effective_optimization_type({"optimization_type": "join", "verified_optimization_type": "unknown"}) == "join"
+    assert effective_optimization_type({"optimization_type": "join", "verified_optimization_type": "limit"}) == "limit"
+    assert effective_optimization_type({"optimization_type": "join"}) == "join"
+    assert effective_optimization_type({}) == "unknown"
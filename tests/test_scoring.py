@@ -0,0 +1,40 @@
+"""Bootstrap speedup intervals (user-039) and offline re-scoring of stored records (user-040)."""
+
+import numpy as np
+
+from quill.scoring import bootstrap_speedup_interval, rescore_records, speedup_rewards
+
+
+def _samples(mean, n, seed):
+    return list(np.random.default_rng(seed).normal(mean, mean * 0.1, n).clip(min=1e-6))
+
+
+def test_lower_bound_below_point_estimate_below_upper_bound():
+    for seed in range(20):
+        original, optimized = _samples(0.02, 10, seed), _samples(0.01, 10, seed + 100)
+        for statistic in ("mean", "p50", "p95"):
+            lower, upper = bootstrap_speedup_interval(original, optimized, statistic=statistic)
+            point = np.mean(original) / np.mean(optimized) if statistic == "mean" else None
+            assert lower <= upper
+            if point is not None:
+                assert lower <= point <= upper
+
+
+def test_lower_bound_tightens_with_more_samples():
+    few = bootstrap_speedup_interval(_samples(0.02, 5, 1), _samples(0.01, 5, 2))
+    many = bootstrap_speedup_interval(_samples(0.02, 200, 1), _samples(0.01, 200, 2))
+    assert many[1] - many[0] < few[1] - few[0]
+
+
+def test_rescore_lower_bound_never_rewards_more_than_point():
+    records = [{"success": True, "accepted": True,
+                "original_samples": _samples(0.02, 10, seed),
+                "optimized_samples": _samples(0.004, 10, seed + 50)} for seed in range(10)]
+    point = rescore_records(records, basis="point")
+    lower = rescore_records(records, basis="lower_bound")
+    assert np.all(lower["rewards"] <= point["rewards"] + 1e-12)
+
+
+def test_speedup_rewards_are_monotonic():
+    rewards = speedup_rewards([0.5, 1.0, 1.5, 2.0, 5.0, 50.0])
+    assert np.all(np.diff(rewards) >= 0)
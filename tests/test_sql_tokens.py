@@ -0,0 +1,46 @@
+"""Shared SQL tokenizer and statement splitter (user-041; added_columns: user-030)."""
+
+from quill.sql_tokens import added_columns, split_statements, table_aliases, tokenize
+
+
+def test_tokenize_round_trips():
+    sql = ("SELECT u.\"Name\", [odd col], `x` -- trailing ; comment\n"
+           "FROM users u /* block; */ WHERE name = 'O''Brien;' AND age >= -3.5e2;")
+    assert "".join(token.value for token in tokenize(sql)) == sql
+
+
+def test_quoted_text_is_one_token():
+    kinds = {token.value: token.kind for token in tokenize("SELECT 'a;b', \"c d\" FROM t")}
+    assert kinds["'a;b'"] == "string"
+    assert kinds['"c d"'] == "quoted_identifier"
+
+
+def test_quoted_identifier_name_unescapes():
+    token = next(t for t in tokenize('SELECT "say ""hi""" FROM t') if t.kind == "quoted_identifier")
+    assert token.name == 'say "hi"'
+
+
+def test_semicolons_in_strings_comments_and_triggers_do_not_split():
+    sql = """
+        CREATE TABLE t (a TEXT);
+        INSERT INTO t VALUES ('x;y'); -- not; a split
+        CREATE TRIGGER tr AFTER INSERT ON t BEGIN
+            UPDATE t SET a = CASE WHEN a = ';' THEN 'z' END;
+            DELETE FROM t WHERE a IS NULL;
+        END;
+        SELECT * FROM t
+    """
+    kinds = [statement.kind for statement in split_statements(sql)]
+    assert kinds == ["CREATE TABLE", "INSERT", "CREATE TRIGGER", "SELECT"]
+
+
+def test_table_aliases():
+    aliases = table_aliases("SELECT * FROM main.users AS u, items i JOIN orders o ON o.user_id = u.id")
+    assert aliases == {"users": "users", "u": "users", "orders": "orders", "o": "orders",
+                       "items": "items", "i": "items"}
+
+
+def test_added_columns():
+    sql = ("ALTER TABLE orders ADD COLUMN day TEXT GENERATED ALWAYS AS (substr(created_at, 9, 2)) VIRTUAL; "
+           "alter table users add \"Name Lower\" TEXT; CREATE INDEX idx ON orders(day)")
+    assert added_columns(sql) == {"day", "name lower"}